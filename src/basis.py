@@ -0,0 +1,169 @@
+import os
+import csv
+import numpy as np
+from sculpt import sculpt
+from matrix import matrix
+from hdr import hdr
+
+
+class basis(object):
+    """
+    Class full of static functions to build and use an image-based contribution basis.
+
+    Light transport is linear in the luminaire output, so an image of any sculpted scene is
+    the sum of one image per control (luminaire and base IES profile) weighted by the scalars
+    that optimize.py produces. The basis renders each control (or group of controls) once for
+    a view and stores the images as a single (channels x height x width x 3) float32 NumPy
+    stack that is memory-mapped when it is used, so a new scene is an array operation instead
+    of a Radiance simulation.
+
+    The stack is saved to results/imageBased/basis/<name>.npy next to a <name>_info.npz file
+    holding the channel names, the matrix column names and the (controls x channels) incidence.
+    """
+
+    @staticmethod
+    def base_profiles(projpath):
+        """
+        List the base IES profiles in the same order genMatrix.py uses for the matrix columns.
+        :param projpath: Root directory for the project
+        :return: list of base IES file names
+        """
+        profiles = []
+        for root, dirs, files in os.walk(os.path.join(projpath, 'ies', 'baseIes'), False):
+            for f in files:
+                if ".ies" in f:
+                    profiles.append(f)
+        return profiles
+
+    @staticmethod
+    def load_luminaires(projpath):
+        """
+        Read the luminaire ids and transforms from the project's luminaires.txt file.
+        :param projpath: Root directory for the project
+        :return: list of (id, xform) tuples
+        """
+        with open(os.path.join(projpath, "luminaires.txt")) as csvfile:
+            return [(row[0], row[1]) for row in csv.reader(csvfile) if len(row) > 1]
+
+    @staticmethod
+    def get_paths(projpath, name):
+        """
+        Get the file paths of a basis stack and its info file.
+        :param projpath: Root directory for the project
+        :param name: Name of the basis
+        :return: [stack path, info path]
+        """
+        root = os.path.join(projpath, 'results', 'imageBased', 'basis')
+        return [os.path.join(root, f'{name}.npy'), os.path.join(root, f'{name}_info.npz')]
+
+    @staticmethod
+    def render(projpath, model, view, name, width, height, qual='high', illum=False, groupPath=None, start=0,
+               show_warnings=False, procs=1, color=(1.0, 0.808, 0.651)):
+        """
+        Render one image per channel of the basis and store them in a memory-mapped stack. Without a
+        grouping spec every control (luminaire and base IES profile) is its own channel; with one, the
+        controls of a group are rendered together as one channel.
+        :param projpath: Root directory for the project
+        :param model: Base octree file path
+        :param view: View file path (relative)
+        :param name: Name of the basis
+        :param width: Image width (before anti-aliasing halves it)
+        :param height: Image height (before anti-aliasing halves it)
+        :param qual: Rendering quality ('high' or not 'high')
+        :param illum: Render irradiance (-i) instead of radiance
+        :param groupPath: [OPTIONAL] Grouping spec CSV file, see matrix.load_groups
+        :param start: Channel to start from, use only if continuing a stopped run
+        :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :param procs: Number of RPICT processes per image
+        :param color: Tuple of the (R,G,B) for the light color temperature, default 4000K
+        :return: The file path for the stack.
+        """
+        profiles = basis.base_profiles(projpath)
+        lums = basis.load_luminaires(projpath)
+        columns = [f'Troffer_{idx}_{f}' for idx, t in lums for f in profiles]
+        if groupPath is not None:
+            names, incidence = matrix.load_groups(groupPath, len(columns), len(profiles))
+        else:
+            names = columns
+            incidence = np.eye(len(columns))
+        incidence = np.asarray(incidence.todense() if hasattr(incidence, 'todense') else incidence)
+
+        stackPath, infoPath = basis.get_paths(projpath, name)
+        os.makedirs(os.path.dirname(stackPath), exist_ok=True)
+        stack = None
+        if start > 0:
+            if not (os.path.exists(stackPath) and os.path.exists(infoPath)):
+                raise ValueError(f"The basis {name} hasn't been started, it can't be continued from channel {start}")
+            # the channels already rendered have to be the same ones
+            with np.load(infoPath) as info:
+                # bases from before the color was recorded were rendered at 4000K
+                started = info['color'] if 'color' in info.files else (1.0, 0.808, 0.651)
+                if list(info['names']) != list(names) or list(info['columns']) != columns or \
+                        not np.array_equal(info['incidence'], incidence) or bool(info['illum']) != illum or \
+                        str(info['view']) != str(view) or not np.allclose(started, color):
+                    raise ValueError(f"The luminaires, profiles, grouping, view, color or mode of the basis {name} "
+                                     f"changed since it was started, it can't be continued")
+            stack = np.load(stackPath, mmap_mode='r+')
+            if stack.shape[0] != len(names):
+                raise ValueError(f"The basis {name} has {stack.shape[0]} channels, not {len(names)}")
+        else:
+            np.savez(infoPath, names=np.array(names), columns=np.array(columns), incidence=incidence,
+                     illum=illum, view=view, color=np.array(color))
+
+        for c in range(start, len(names)):
+            radFiles = []
+            for col in np.flatnonzero(incidence[:, c]):
+                lum, pix = divmod(int(col), len(profiles))
+                radFiles.append(sculpt.process_single_ies(projpath, os.path.join('baseIes', profiles[pix]),
+                                                          lums[lum][1], f'basis_{lums[lum][0]}_{pix}', color))
+            print(f'Rendering...{names[c]} [{c + 1}/{len(names)}]')
+            oct = sculpt.gen_octree(projpath, radFiles, f'basis_{name}.oct', baseOct=model)
+            # every channel is a different octree, so there is no ambient cache to reuse
+            hdrpath = sculpt.render_img(projpath, oct, view, f'{name}_basis_{os.getpid()}', width, height, qual, True,
+                                        illum, show_warnings, procs, ambient=False)
+            img = hdr.read(os.path.join(projpath, hdrpath))
+            if stack is None:
+                stack = np.lib.format.open_memmap(stackPath, mode='w+', dtype=np.float32,
+                                                  shape=(len(names),) + img.shape)
+            stack[c] = img
+            stack.flush()
+            os.remove(os.path.join(projpath, hdrpath))
+        return stackPath
+
+    @staticmethod
+    def load(projpath, name):
+        """
+        Load a basis stack as a read only memory map.
+        :param projpath: Root directory for the project
+        :param name: Name of the basis
+        :return: [0] info dict (names, columns, incidence, illum, view, color)\n[1] (channels x height x width x 3) stack
+        """
+        stackPath, infoPath = basis.get_paths(projpath, name)
+        with np.load(infoPath) as info:
+            info = {k: info[k] for k in info.files}
+        return [info, np.load(stackPath, mmap_mode='r')]
+
+    @staticmethod
+    def channel_scalars(incidence, scalars):
+        """
+        Reduce per control scalars to per channel weights. Controls of a group share one
+        value, so the mean of a group's scalars is used.
+        :param incidence: (controls x channels) incidence array
+        :param scalars: (scenes x controls) array of scalars
+        :return: (scenes x channels) array of weights
+        """
+        return np.atleast_2d(scalars) @ incidence / incidence.sum(axis=0)
+
+    @staticmethod
+    def combine(stack, weights):
+        """
+        Build the image of a scene as the weighted sum of the basis images. The stack is read
+        one channel at a time, so it never has to fit in memory, and unused channels are skipped.
+        :param stack: (channels x height x width x 3) basis stack
+        :param weights: (channels) weights of the scene
+        :return: (height x width x 3) float32 image
+        """
+        img = np.zeros(stack.shape[1:], dtype=np.float32)
+        for c in np.flatnonzero(weights):
+            img += np.float32(weights[c]) * stack[c]
+        return img
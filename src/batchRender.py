@@ -0,0 +1,200 @@
+import sys
+import os
+import csv
+import pathlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from sculpt import sculpt
+from hdr import hdr
+from imgproc import imgproc
+
+
+"""
+Render the cross product of scenes x views x color temperatures in one batch. The luminaires and octree of each
+scene are prepared once, and each scene and view is rendered once with neutral white light. Color is only a per
+channel multiplier of the light, so every color temperature is that rendering tinted in memory instead of another
+Radiance run. The renderings of a scene are scheduled together so they share its ambient cache.
+"""
+
+
+def check_args():
+    if len(sys.argv) <= 1:
+        return False
+    global _name
+    global _model
+    global _height
+    global _width
+    global _illum
+    global _pal
+    global _gif
+    global _show_warnings
+    global _workers
+    for i in range(1, len(sys.argv)):
+        if sys.argv[i] == '-w':
+            _show_warnings = True
+        if sys.argv[i] == '-np':
+            # number of renderings at once
+            _workers = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-gif':
+            _gif = True
+        if sys.argv[i] == '-i':
+            _illum = True
+        if sys.argv[i] == '-x':
+            # Image Width
+            _width = int(sys.argv[i + 1]) * 2
+            i += 1
+        if sys.argv[i] == '-y':
+            # image Height
+            _height = int(sys.argv[i + 1]) * 2
+            i += 1
+        if sys.argv[i] == '-c':
+            # color temp(s)
+            _ccts.append(sys.argv[i + 1].upper().replace('K', '') + 'K')
+            i += 1
+        if sys.argv[i] == '-v':
+            # View file(s)
+            vn = os.path.splitext(sys.argv[i + 1])[0]
+            # check that the view actually exists...
+            vtemp = os.path.join(_projPath, 'views', f"{vn}.vf")
+            if os.path.exists(vtemp):
+                _views.append(os.path.join('views', f"{vn}.vf"))
+            else:
+                print(f'{vtemp} doesnt exist')
+            i += 1
+        if sys.argv[i] == '-m':
+            # Model file
+            oct = os.path.splitext(sys.argv[i + 1])[0]
+            # check that the view actually exists...
+            otemp = os.path.join(_projPath, 'octrees', f"{oct}.oct")
+            if os.path.exists(otemp):
+                _model = os.path.join('octrees', f'{oct}.oct')
+            i += 1
+        if sys.argv[i] == '-n':
+            # name
+            _name = sys.argv[i + 1]
+            i += 1
+        if sys.argv[i] == '-s':
+            # scene(s)
+            sn = sys.argv[i + 1]
+            # check that the scene file actually exists...
+            stemp = os.path.join(_projPath, 'scenarios', f"{sn}.csv")
+            if os.path.exists(stemp):
+                _scenes.append(sn)
+            else:
+                print(f'{stemp} doesnt exist')
+            i += 1
+        if sys.argv[i] == '-p':
+            # palette
+            valid_palettes = ['def', 'pm3d', 'tbo', 'spec', 'hot', 'eco']
+            pal = sys.argv[i + 1]
+            if pal in valid_palettes:
+                _pal = pal
+            i += 1
+
+    return len(_views) > 0 and _model != 'unknown' and _name != 'unknown'
+
+
+def render(task):
+    """
+    Render one scene and view with neutral white light.
+    :param task: (scene, octree, view)
+    :return: The (relative) file path for the image.
+    """
+    scene, oct, view = task
+    print(f'Rendering...{scene} {pathlib.Path(view).stem}')
+    return sculpt.render_img(_projPath, oct, view, f'{_name}_{scene}_{pathlib.Path(view).stem}_white', _width,
+                             _height, qual, True, _illum, _show_warnings)
+
+
+# setup parameters
+_name = 'unknown'
+_scenes = []
+_views = []
+_ccts = []
+_model = 'unknown'
+_pal = 'def'
+_width = 2560   # after anti-aliasing: 1280
+_height = 1440  # after anti-aliasing:  720
+_illum = False
+_show_warnings = False
+_workers = 1
+_gif = False
+_projPath = pathlib.Path(__file__).parent.parent.resolve()
+
+
+if check_args():
+    qual = 'high'
+    if len(_scenes) == 0:
+        _scenes = ['unknown']
+    if len(_ccts) == 0:
+        _ccts = ['4000K']
+
+    # prepare the luminaires and octree of each scene once, with white light
+    tasks = []
+    for scene in _scenes:
+        lum_files = sculpt.process_ies(_projPath, scene, (1.0, 1.0, 1.0), "LUM")
+        oct = sculpt.gen_octree(_projPath, lum_files, f'batch_{_name}_{scene}.oct', baseOct=_model)
+        if len(_views) > 1:
+            # fill the scene's ambient cache once at low resolution for all of the views
+            sculpt.prewarm(_projPath, oct, _views, qual, _illum, show_warnings=_show_warnings)
+        tasks.extend((scene, oct, view) for view in _views)
+
+    # scene by scene, so the renderings running at the same time use the same octree and ambient file
+    with ThreadPoolExecutor(max_workers=_workers) as pool:
+        whites = list(pool.map(render, tasks))
+
+    index = []
+    for (scene, oct, view), white in zip(tasks, whites):
+        img = hdr.read(os.path.join(_projPath, white))
+        for cct in _ccts:
+            base = f'{_name}_{scene}_{pathlib.Path(view).stem}_{cct}'
+            out = hdr.write(os.path.join(_projPath, 'results', 'imageBased', f'{base}.hdr'),
+                            img * np.array(sculpt.cct_to_rgb(cct), dtype=np.float32))
+            fcpath = ''
+            if _illum:
+                fcpath = out.replace('.hdr', '_fc.hdr')
+                if _pal in imgproc.PALETTES:
+                    fc = imgproc.falsecolor(hdr.read(out), 500, _pal, lw=_width * 0.05, lh=_height * 0.2)
+                    fcpath = hdr.write(fcpath, fc)
+                else:
+                    fcpath = sculpt.to_falsecolor(_projPath, out, fcpath, _pal, 500, _width * 0.05, _height * 0.2)
+            gifpath = ''
+            if _gif:
+                src = fcpath if _illum else out
+                gifpath = sculpt.to_gif(_projPath, src, src.replace('.hdr', '.gif'))
+            index.append([scene, pathlib.Path(view).stem, cct] +
+                         [os.path.relpath(p, _projPath) if p else '' for p in (out, fcpath, gifpath)])
+            print(index[-1][3])
+        os.remove(os.path.join(_projPath, white))
+
+    indexPath = os.path.join(_projPath, 'results', 'imageBased', f'{_name}_index.csv')
+    with open(indexPath, 'w', newline='') as ifile:
+        writer = csv.writer(ifile)
+        writer.writerow(['SCENE', 'VIEW', 'CCT', 'HDR', 'FALSECOLOR', 'GIF'])
+        writer.writerows(index)
+    print(indexPath)
+
+else:
+    print('\nThis command will render every combination of scenes, views and color temperatures in one batch.')
+    print('The luminaires and octree of each scene are prepared once and each scene and view is rendered once with')
+    print('white light, then tinted to each color temperature. Renderings run in parallel, scene by scene so they')
+    print('share the ambient cache, and results\\imageBased\\<name>_index.csv lists the file(s) of every combination.')
+    print('If no Scene name is passed it will use the default unsculpted IES file (all pixels at full power).')
+    print('\n\tExample:')
+    print('\t\tpython batchRender.py -n batch -m FullModel -s Scene_300Lux -s Scene_Table@200 -v Camera02 -v Camera03')
+    print('\t\tpython batchRender.py -n batch -m FullModel -s Scene_300Lux -v Camera02 -c 3000K -c 4000K -i -np 4 -gif')
+    print('\n\tArguments')
+    print('\t===================')
+    print('\n\t-m model\tName of the octree model being simulated')
+    print('\n\t-n name\t\tName prefix for the image files')
+    print('\n\t-s scene\tName of a scene being simulated. Can be passed multiple times. [OPTIONAL]')
+    print('\n\t-v name\t\tName of a view file (with/out extension). Can be passed multiple times.')
+    print('\n\t-c clrtemp\tColor temperature in Kevlin, default 4000K. Can be passed multiple times. [OPTIONAL]')
+    print('\n\t-i\t\tRender illuminance and convert to falsecolor. [OPTIONAL]')
+    print('\n\t-p pal\t\tFalse color palette, default "def". [OPTIONAL]')
+    print('\n\t-x xdim\t\tImage width, default 1280 [OPTIONAL]')
+    print('\n\t-y ydim\t\tImage Height, default 720 [OPTIONAL]')
+    print('\n\t-gif\t\tExport the HDR image(s) as a GIF. [OPTIONAL]')
+    print('\n\t-np workers\tNumber of renderings run at once. Default 1 [OPTIONAL]')
+    print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
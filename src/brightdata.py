@@ -0,0 +1,87 @@
+import os
+import numpy as np
+
+
+class brightdata(object):
+    """
+    Class full of static functions to read, write and combine the Radiance data (.dat) files that
+    IES2RAD writes for the brightdata distribution of a luminaire.
+
+    A data file is the number of dimensions, then 'begin end count' for each dimension (or
+    '0 0 count' followed by the angles when they are irregular), then the values with the last
+    dimension varying fastest. The values are the candela data of the IES file times its multipliers,
+    so a sculpted luminaire is a weighted sum of the base profiles' values with the same header, and
+    the IES text and IES2RAD steps can be skipped for it.
+    """
+
+    @staticmethod
+    def read(path):
+        """
+        Read a Radiance data file.
+        :param path: Path to the .dat file
+        :return: [0] header (dimension) tokens #type: list\n[1] (count) float array of the values
+        """
+        with open(path) as dfile:
+            tokens = dfile.read().split()
+        ndim = int(tokens[0])
+        pos = 1
+        size = 1
+        for d in range(ndim):
+            begin, end, count = float(tokens[pos]), float(tokens[pos + 1]), int(tokens[pos + 2])
+            pos += 3
+            if begin == 0 and end == 0:
+                # irregular spacing, the angles follow the count
+                pos += count
+            size *= count
+        values = np.array(tokens[pos:], dtype=float)
+        if len(values) != size:
+            raise ValueError(f"{path} has {len(values)} values, expected {size}")
+        return [tokens[:pos], values]
+
+    @staticmethod
+    def write(path, header, values):
+        """
+        Write a Radiance data file, one line per row of the last dimension.
+        :param path: Path to the resulting .dat file
+        :param header: Header tokens from brightdata.read
+        :param values: (count) array of the values
+        :return: The file path for the data.
+        """
+        ndim = int(header[0])
+        lines = [header[0]]
+        pos = 1
+        count = 1
+        for d in range(ndim):
+            count = int(header[pos + 2])
+            n = 3 + (count if float(header[pos]) == 0 and float(header[pos + 1]) == 0 else 0)
+            lines.append(" ".join(header[pos:pos + n]))
+            pos += n
+        rows = np.asarray(values, dtype=float).reshape(-1, count)
+        lines.extend(" ".join(f"{v:.7g}" for v in row) for row in rows)
+        tmpPath = f"{path}.{os.getpid()}.tmp"
+        with open(tmpPath, 'w') as dfile:
+            dfile.write("\n".join(lines) + "\n")
+        os.replace(tmpPath, path)
+        return path
+
+    @staticmethod
+    def rename(radText, old, new):
+        """
+        Point the rad file of a template luminaire at another data file and give its primitives new names.
+        :param radText: Contents of the template rad file from IES2RAD
+        :param old: Output prefix the template was made with (path without extension)
+        :param new: Output prefix of the new luminaire
+        :return: rad file contents #type: str
+        """
+        radText = radText.replace(old.replace('\\', '/'), new.replace('\\', '/')).replace(old, new)
+        return radText.replace(os.path.basename(old.replace('\\', '/')), os.path.basename(new.replace('\\', '/')))
+
+    @staticmethod
+    def combine(stack, weights):
+        """
+        Get the values of a sculpted luminaire as the weighted sum of the base profiles.
+        :param stack: (profiles x count) array of base values
+        :param weights: (profiles) weights, zero for profiles left out
+        :return: (count) array of values
+        """
+        return np.asarray(weights, dtype=float) @ stack
@@ -0,0 +1,267 @@
+import os
+import time
+import hashlib
+import threading
+import contextlib
+from matrix import matrix
+
+
+class cache(object):
+    """
+    Class full of static functions to manage the project cache directory, where results that
+    can be reused between runs are kept. This holds the Radiance ambient (-af) files so that
+    the indirect irradiance of an octree is only calculated once across renders of different
+    views, resolutions or passes and grid-based simulations, and the converted luminaires so
+    that IES2RAD and XFORM only run when a luminaire has changed.
+
+    Ambient files are keyed by a hash of the octree contents and the ambient parameters, so a
+    changed model or a different quality setting never picks up a stale cache. Luminaires are
+    keyed by a hash of the IES file contents, color and multiplier (IES2RAD) plus the transform
+    (XFORM). In both directories the least recently used entries are removed once the directory is
+    over its size limit.
+    Project
+        - cache
+            - ambient
+                <octree>_<key>.amb
+            - luminaires
+                <ies key>.rad, <ies key>.dat
+                <ies key>_<xform key>.rad
+    """
+
+    # parameters that change the values stored in an ambient file
+    AMBIENT_OPTIONS = ['-aa', '-ab', '-ad', '-ar', '-as', '-av', '-aw', '-lr', '-lw']
+
+    # size limit of the luminaire cache in bytes
+    LUMINAIRE_BYTES = 256 * 1024 * 1024
+
+    # size limit of the ambient cache in bytes
+    AMBIENT_BYTES = 2 * 1024 * 1024 * 1024
+
+    # file hashes by (path, modified time, size), an octree or IES file is often used by several calls
+    _hashes = {}
+
+    @staticmethod
+    def get_dir(projpath, kind='ambient'):
+        """
+        Get (and create) a directory within the project cache.
+        :param projpath: Root directory for the project
+        :param kind: Name of the cache subdirectory
+        :return: The directory path.
+        """
+        path = os.path.join(projpath, 'cache', kind)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @staticmethod
+    def ambient_params(params):
+        """
+        Pull the parameters that affect the ambient calculation out of a Radiance parameter string.
+        :param params: Radiance parameters, ie '-ab 2 -ad 512 -dj 0.0' #type: str
+        :return: The ambient parameters in a fixed order #type: str
+        """
+        parts = params.split()
+        found = {}
+        for i, part in enumerate(parts[:-1]):
+            if part in cache.AMBIENT_OPTIONS:
+                found[part] = parts[i + 1]
+        return " ".join(f"{k} {found[k]}" for k in cache.AMBIENT_OPTIONS if k in found)
+
+    @staticmethod
+    def octree_hash(octpath):
+        """
+        Get the hash of an octree (or any) file, reusing it while the file is unchanged.
+        :param octpath: Octree file path
+        :return: hex digest #type: str
+        """
+        stat = os.stat(octpath)
+        key = (os.path.abspath(octpath), stat.st_mtime, stat.st_size)
+        if key not in cache._hashes:
+            cache._hashes[key] = matrix.file_hash(octpath)
+        return cache._hashes[key]
+
+    @staticmethod
+    def key(*parts):
+        """
+        Build a cache key from the values that determine a cached result.
+        :param parts: Values, turned into strings
+        :return: hex digest #type: str
+        """
+        sha = hashlib.sha1()
+        for part in parts:
+            sha.update(str(part).encode())
+            sha.update(b'\0')
+        return sha.hexdigest()[:16]
+
+    @staticmethod
+    def ambient_path(projpath, oct, params):
+        """
+        Get the managed ambient file for an octree and set of simulation parameters. The file is marked
+        as used and the least recently used ambient files are evicted once the cache is over its size limit.
+        :param projpath: Root directory for the project
+        :param oct: Octree file path (absolute or relative to the project)
+        :param params: Radiance parameters used for the simulation #type: str
+        :return: The ambient file path, which may not exist yet.
+        """
+        octpath = os.path.join(projpath, oct)
+        sha = hashlib.sha1(cache.octree_hash(octpath).encode())
+        sha.update(cache.ambient_params(params).encode())
+        name = os.path.splitext(os.path.basename(octpath))[0]
+        ambpath = os.path.join(cache.get_dir(projpath), f"{name}_{sha.hexdigest()[:16]}.amb")
+        if os.path.exists(ambpath):
+            os.utime(ambpath)
+        cache.evict(projpath, 'ambient', cache.AMBIENT_BYTES, split=None)
+        return ambpath
+
+    @staticmethod
+    @contextlib.contextmanager
+    def lock(path, timeout=3600, stale=86400):
+        """
+        Hold an exclusive lock on a cache entry across processes using a <path>.lock file. The lock
+        file is created atomically, so only one worker at a time can hold it. Locks older than the
+        stale age are assumed to be left over from a killed process and are removed.
+        :param path: File path of the cache entry
+        :param timeout: Seconds to wait for the lock
+        :param stale: Age in seconds after which a lock is considered abandoned
+        """
+        lockpath = f"{path}.lock"
+        start = time.time()
+        while True:
+            try:
+                fd = os.open(lockpath, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lockpath) > stale:
+                        os.remove(lockpath)
+                        continue
+                except OSError:
+                    continue
+                if time.time() - start > timeout:
+                    raise TimeoutError(f"Timed out waiting for the cache lock {lockpath}")
+                time.sleep(0.5)
+        try:
+            yield path
+        finally:
+            if os.path.exists(lockpath):
+                os.remove(lockpath)
+
+    @staticmethod
+    def luminaire(projpath, iespath, color, multiplier, xform, convert, place, iesKey=None):
+        """
+        Get the converted and transformed rad file of a luminaire from the cache, making it if needed.
+        Entries are created under a lock and the transformed file is moved into place once complete,
+        so concurrent runs either wait for an entry or find it finished.
+        :param projpath: Root directory for the project
+        :param iespath: IES file path
+        :param color: (R,G,B) light color passed to IES2RAD
+        :param multiplier: IES2RAD multiplier, None for the default
+        :param xform: radiance transform parameters #type: str
+        :param convert: Function(prefix) running IES2RAD to <prefix>.rad and <prefix>.dat, raising if it fails
+        :param place: Function(input, output) running XFORM, raising if it fails
+        :param iesKey: [OPTIONAL] Key of the converted luminaire, for luminaires without an IES file, in place of
+                       the key of the IES file, color and multiplier
+        :return: The transformed rad file path.
+        """
+        root = cache.get_dir(projpath, 'luminaires')
+        if iesKey is None:
+            iesKey = cache.key(cache.octree_hash(iespath), tuple(color), multiplier)
+        prefix = os.path.join(root, iesKey)
+        radpath = os.path.join(root, f"{iesKey}_{cache.key(xform)}.rad")
+        if not os.path.exists(radpath):
+            with cache.lock(prefix):
+                if not (os.path.exists(f"{prefix}.rad") and os.path.exists(f"{prefix}.dat")):
+                    cache.complete([f"{prefix}.rad", f"{prefix}.dat"], lambda: convert(prefix))
+                if not os.path.exists(radpath):
+                    tmpPath = f"{radpath}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    cache.complete([tmpPath], lambda: place(f"{prefix}.rad", tmpPath))
+                    os.replace(tmpPath, radpath)
+        # mark the entry as used for the LRU eviction, the .dat is read by every transformed copy
+        for path in (radpath, f"{prefix}.rad", f"{prefix}.dat"):
+            os.utime(path)
+        return radpath
+
+    @staticmethod
+    def complete(paths, make):
+        """
+        Make the files of a cache entry, removing them if making them fails or leaves any of them missing
+        or empty, as shell redirection leaves an empty file behind when a command fails.
+        :param paths: Files the function makes
+        :param make: Function making the files
+        :return: None
+        """
+        try:
+            make()
+            empty = [p for p in paths if not os.path.exists(p) or os.path.getsize(p) == 0]
+            if len(empty) > 0:
+                raise RuntimeError(f"{empty[0]} was not written")
+        except BaseException:
+            for p in paths:
+                if os.path.exists(p):
+                    os.remove(p)
+            raise
+
+    @staticmethod
+    def evict(projpath, kind='luminaires', maxBytes=None, minAge=3600, split='_'):
+        """
+        Remove the least recently used entries of a cache directory until it is under its size limit.
+        Files are grouped by the key before the first '_' or '.', so a converted luminaire and all of its
+        transformed copies go together. Locked entries and ones used within the minimum age are kept,
+        as another run may still be rendering with them.
+        :param projpath: Root directory for the project
+        :param kind: Name of the cache subdirectory
+        :param maxBytes: Size limit in bytes, defaults to cache.LUMINAIRE_BYTES
+        :param minAge: Seconds since the last use before an entry can be removed
+        :param split: Separator ending the key within the file name, None to group by the name before the first '.'
+        :return: The number of files removed.
+        """
+        if maxBytes is None:
+            maxBytes = cache.LUMINAIRE_BYTES
+        path = cache.get_dir(projpath, kind)
+        groups = {}
+        for f in os.listdir(path):
+            try:
+                stat = os.stat(os.path.join(path, f))
+            except OSError:
+                continue
+            stem = f.split('.')[0]
+            group = groups.setdefault(stem if split is None else stem.split(split)[0], [0, 0.0, [], False])
+            group[0] += stat.st_size
+            group[1] = max(group[1], stat.st_mtime)
+            group[2].append(f)
+            group[3] = group[3] or f.endswith('.lock') or f.endswith('.tmp')
+        total = sum(g[0] for g in groups.values())
+        removed = 0
+        now = time.time()
+        for size, used, files, locked in sorted(groups.values(), key=lambda g: g[1]):
+            if total <= maxBytes:
+                break
+            if locked or now - used < minAge:
+                continue
+            for f in files:
+                try:
+                    os.remove(os.path.join(path, f))
+                    removed += 1
+                except OSError:
+                    pass
+            total -= size
+        return removed
+
+    @staticmethod
+    def clear(projpath, kind='ambient'):
+        """
+        Remove the unlocked files of a cache directory.
+        :param projpath: Root directory for the project
+        :param kind: Name of the cache subdirectory
+        :return: The number of files removed.
+        """
+        path = cache.get_dir(projpath, kind)
+        removed = 0
+        for f in os.listdir(path):
+            fp = os.path.join(path, f)
+            if f.endswith('.lock') or os.path.exists(f"{fp}.lock"):
+                continue
+            os.remove(fp)
+            removed += 1
+        return removed
@@ -0,0 +1,276 @@
+import os
+import numpy as np
+from sculpt import sculpt
+from cache import cache
+from skyvec import skyvec
+
+
+class daylight(object):
+    """
+    Class full of static functions for annual daylight simulations with daylight coefficients.
+
+    Rather than one CIE sky, octree and RTRACE run per hour, RCONTRIB traces the sensor grid once
+    against a sky divided into Reinhart/Tregenza patches (reinhartb.cal, MF:1 is the 145 Tregenza
+    patches plus the ground), giving a (sensors x patches x 3) daylight coefficient matrix. The
+    illuminance of every hour is then that matrix times the hour's sky vector, the patch radiances
+    of a weather file from the skyvec class, so a whole year is a single matrix multiply. Views work the same way
+    with a stack of per pixel coefficients from the rays of VWRAYS, so a time-lapse is one image per sky vector.
+
+    The coefficients are cached in cache/daylight by the hash of the model, grid and parameters, and
+    the annual results are saved as a (hours x sensors) float32 array
+    results/gridBased/<name>_annual.npy next to a <name>_annual_info.npz file holding the hours.
+    """
+
+    # sky and ground glow sources the patches are binned over
+    SKY = "void glow sky_glow\n0\n0\n4 1 1 1 0\n\nsky_glow source sky\n0\n0\n4 0 0 1 180\n\n" \
+          "sky_glow source ground\n0\n0\n4 0 0 -1 180\n"
+
+    @staticmethod
+    def dc_params(qual='high'):
+        """
+        Get the RCONTRIB parameters for a simulation quality. There is no ambient cache with RCONTRIB,
+        so more ambient divisions are needed than with RTRACE.
+        :param qual: Simulation quality ('high' or not 'high')
+        :return: Radiance parameters #type: str
+        """
+        if qual.lower() == 'high':
+            return '-I -h -ab 6 -ad 16384 -lw 6e-5 -dc 0.75 -dj 1.0 -dp 512 -dr 3 -ds 0.05 -dt 0.15 -lr 8 '\
+                   '-ss 1.0 -st 0.15'
+        return '-I -h -ab 3 -ad 4096 -lw 2.5e-4 -dc 0.25 -dj 0.0 -dp 64 -dr 0 -ds 0.5 -dt 0.5 -lr 4 '\
+               '-ss 0.0 -st 0.85'
+
+    @staticmethod
+    def sky_octree(projpath, model):
+        """
+        Build an octree of the model with the glow sky the daylight coefficients are binned over.
+        :param projpath: Root directory for the project
+        :param model: Base octree file path
+        :return: The octree file path.
+        """
+        skypath = os.path.join(projpath, 'skies', 'dc_sky.rad')
+        if not os.path.exists(skypath):
+            os.makedirs(os.path.dirname(skypath), exist_ok=True)
+            with open(skypath, 'w') as sfile:
+                sfile.write(daylight.SKY)
+        name = os.path.splitext(os.path.basename(model))[0]
+        return sculpt.gen_octree(projpath, [os.path.join('skies', 'dc_sky.rad')], f'dc_{name}.oct', baseOct=model)
+
+    @staticmethod
+    def coefficients(projpath, model, grid, mf=1, qual='high', procs=1, show_warnings=False):
+        """
+        Get the daylight coefficient matrix of a sensor grid, running RCONTRIB only if it isn't cached.
+        :param projpath: Root directory for the project
+        :param model: Base octree file path
+        :param grid: Grid file path
+        :param mf: Reinhart subdivision, 1 is the Tregenza sky
+        :param qual: Simulation quality ('high' or not 'high')
+        :param procs: Number of RCONTRIB processes (-n), not available on Windows
+        :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :return: (sensors x patches x 3) float32 array
+        """
+        params = daylight.dc_params(qual)
+        key = cache.key(cache.octree_hash(os.path.join(projpath, model)),
+                        cache.octree_hash(os.path.join(projpath, grid)), mf, params)
+        dcPath = os.path.join(cache.get_dir(projpath, 'daylight'), f'{key}.npy')
+        if not os.path.exists(dcPath):
+            with cache.lock(dcPath):
+                if not os.path.exists(dcPath):
+                    oct = daylight.sky_octree(projpath, model)
+                    with open(os.path.join(projpath, grid)) as gfile:
+                        sensors = sum(1 for line in gfile if line.strip() != '')
+                    tmpPath = f"{dcPath}.{os.getpid()}.tmp"
+                    opts = params + ('' if show_warnings else ' -w')
+                    if procs > 1 and os.name != 'nt':
+                        opts += f' -n {procs}'
+                    cmd = f'rcontrib {opts} -faf -e MF:{mf} -f reinhartb.cal -b rbin -bn Nrbins -m sky_glow ' \
+                          f'"{oct}" < "{os.path.join(projpath, grid)}" > "{tmpPath}"'
+                    code = sculpt.run_cmd(cmd.replace('\\', '/'), projpath)
+                    patches = len(skyvec.patches(mf)[1])
+                    size = os.path.getsize(tmpPath) // 4 if os.path.exists(tmpPath) else 0
+                    if code != 0 or size != sensors * patches * 3:
+                        if os.path.exists(tmpPath):
+                            os.remove(tmpPath)
+                        raise RuntimeError(f"RCONTRIB returned {size // 3} of {sensors * patches} values "
+                                           f"(return code {code})")
+                    dc = np.fromfile(tmpPath, dtype=np.float32).reshape(sensors, patches, 3)
+                    np.save(tmpPath, dc)
+                    os.replace(f"{tmpPath}.npy", dcPath)
+                    os.remove(tmpPath)
+        return np.load(dcPath)
+
+    @staticmethod
+    def image_coefficients(projpath, model, view, width, height, mf=1, qual='high', procs=1, show_warnings=False):
+        """
+        Get the daylight coefficients of every pixel of a view, running RCONTRIB on the VWRAYS rays of the view
+        only if they aren't cached. The stack is kept as an .npy file in cache/daylight and returned memory-mapped,
+        as it is (pixels x patches x 3) floats, ie 1.6 GB for 1280 x 720 pixels and the Tregenza sky.
+        :param projpath: Root directory for the project
+        :param model: Base octree file path
+        :param view: View file path (relative)
+        :param width: Maximum image width
+        :param height: Maximum image height
+        :param mf: Reinhart subdivision, 1 is the Tregenza sky
+        :param qual: Simulation quality ('high' or not 'high')
+        :param procs: Number of RCONTRIB processes (-n), not available on Windows
+        :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :return: (height x width x patches x 3) read only memory-mapped float32 array
+        """
+        # radiance rather than irradiance
+        params = ' '.join(p for p in daylight.dc_params(qual).split() if p != '-I')
+        x, y = sculpt.view_res(projpath, view, width, height)
+        key = cache.key(cache.octree_hash(os.path.join(projpath, model)),
+                        cache.octree_hash(os.path.join(projpath, view)), x, y, mf, params)
+        dcPath = os.path.join(cache.get_dir(projpath, 'daylight'), f'{key}_img.npy')
+        if not os.path.exists(dcPath):
+            with cache.lock(dcPath):
+                if not os.path.exists(dcPath):
+                    oct = daylight.sky_octree(projpath, model)
+                    tmpPath = f"{dcPath}.{os.getpid()}.tmp"
+                    opts = params + ('' if show_warnings else ' -w')
+                    if procs > 1 and os.name != 'nt':
+                        opts += f' -n {procs}'
+                    cmd = f'vwrays -ff -pj 0.7 -vf "{view}" -x {x} -y {y} | rcontrib {opts} -fff -e MF:{mf} ' \
+                          f'-f reinhartb.cal -b rbin -bn Nrbins -m sky_glow "{oct}" > "{tmpPath}"'
+                    code = sculpt.run_cmd(cmd.replace('\\', '/'), projpath)
+                    patches = len(skyvec.patches(mf)[1])
+                    size = os.path.getsize(tmpPath) // 4 if os.path.exists(tmpPath) else 0
+                    if code != 0 or size != x * y * patches * 3:
+                        if os.path.exists(tmpPath):
+                            os.remove(tmpPath)
+                        raise RuntimeError(f"RCONTRIB returned {size // 3} of {x * y * patches} values for {x * y} "
+                                           f"pixels (return code {code})")
+                    raw = np.memmap(tmpPath, dtype=np.float32, mode='r')
+                    # copied a band of rows at a time so the stack is never fully in memory
+                    stack = np.lib.format.open_memmap(f"{tmpPath}.npy", mode='w+', dtype=np.float32,
+                                                      shape=(y, x, patches, 3))
+                    raw = raw.reshape(y, x, patches, 3)
+                    rows = max(1, (1 << 26) // (x * patches * 3))
+                    for r in range(0, y, rows):
+                        stack[r:r + rows] = raw[r:r + rows]
+                    stack.flush()
+                    del stack, raw
+                    os.replace(f"{tmpPath}.npy", dcPath)
+                    os.remove(tmpPath)
+        return np.load(dcPath, mmap_mode='r')
+
+    @staticmethod
+    def frames(stack, smx, chunk=16384):
+        """
+        Get the images of a view for several hours, each the sum of the view's pixel daylight coefficients times
+        the hour's sky vector. The stack is read once, in chunks of pixels, for all of the hours.
+        :param stack: (height x width x patches x 3) pixel daylight coefficients from daylight.image_coefficients
+        :param smx: (patches x hours x 3) sky vectors
+        :param chunk: Number of pixels per chunk
+        :return: (hours x height x width x 3) float32 array of radiance images
+        """
+        height, width, patches = stack.shape[:3]
+        if patches != smx.shape[0]:
+            raise ValueError(f"The daylight coefficients have {patches} patches, the sky has {smx.shape[0]}")
+        flat = stack.reshape(height * width, patches, 3)
+        sky = np.asarray(smx, dtype=np.float32)
+        out = np.empty((sky.shape[1], height * width, 3), dtype=np.float32)
+        for s in range(0, height * width, chunk):
+            block = np.asarray(flat[s:s + chunk])
+            for c in range(3):
+                out[:, s:s + chunk, c] = (block[:, :, c] @ sky[:, :, c]).T
+        return out.reshape(sky.shape[1], height, width, 3)
+
+    @staticmethod
+    def read_wea(weaPath):
+        """
+        Read the hours of a Radiance weather (.wea) file.
+        :param weaPath: Path to the .wea file
+        :return: [0] hour names ie '0621_1230'\n[1] (hours x 5) array of month, day, hour, direct normal, diffuse horizontal
+        """
+        rows = []
+        with open(weaPath) as wfile:
+            for line in wfile:
+                parts = line.split()
+                if len(parts) == 5 and not parts[0][0].isalpha():
+                    rows.append([float(p) for p in parts])
+        rows = np.array(rows).reshape(-1, 5)
+        names = [f"{int(r[0]):02}{int(r[1]):02}_{sculpt.hourStr(r[2])}" for r in rows]
+        return [names, rows]
+
+    @staticmethod
+    def wea_location(weaPath):
+        """
+        Read the location in the header of a Radiance weather (.wea) file.
+        :param weaPath: Path to the .wea file
+        :return: [0] latitude\n[1] longitude, east positive\n[2] time zone offset in hours
+        """
+        keys = ('latitude', 'longitude', 'time_zone')
+        header = {}
+        with open(weaPath) as wfile:
+            for line in wfile:
+                parts = line.split()
+                # other header lines (ie place <City_Country>) are skipped
+                if len(parts) == 2 and parts[0] in keys:
+                    header[parts[0]] = float(parts[1])
+                if len(header) == len(keys):
+                    break
+        missing = [k for k in keys if k not in header]
+        if len(missing) > 0:
+            raise ValueError(f"{weaPath} has no {', '.join(missing)} in its header")
+        # WEA longitudes and time zone meridians are west positive, in degrees
+        return [header['latitude'], -header['longitude'], -header['time_zone'] / 15]
+
+    @staticmethod
+    def sky_matrix(projpath, weather, mf=1, cie=None):
+        """
+        Get the sky vectors of every hour of a weather file with the skyvec class, as Perez all-weather skies
+        (as GENDAYMTX) or CIE standard general skies. EPW files are converted with EPW2WEA.
+        :param projpath: Root directory for the project
+        :param weather: EPW or WEA file path
+        :param mf: Reinhart subdivision, matching the daylight coefficients
+        :param cie: [OPTIONAL] CIE standard general sky (1 - 15) instead of the Perez skies
+        :return: [0] hour names\n[1] (patches x hours x 3) float32 array of patch radiances
+        """
+        weaPath = weather
+        if weather.lower().endswith('.epw'):
+            weaPath = os.path.join(cache.get_dir(projpath, 'daylight'), f'{cache.key(cache.octree_hash(weather))}.wea')
+            if not os.path.exists(weaPath):
+                tmpPath = f"{weaPath}.{os.getpid()}.tmp"
+                code = sculpt.run_cmd(f'epw2wea "{weather}" "{tmpPath}"'.replace('\\', '/'), projpath)
+                if code != 0 or not os.path.exists(tmpPath):
+                    if os.path.exists(tmpPath):
+                        os.remove(tmpPath)
+                    raise RuntimeError(f"EPW2WEA failed for {weather} (return code {code})")
+                os.replace(tmpPath, weaPath)
+        names, rows = daylight.read_wea(weaPath)
+        lat, lon, tz = daylight.wea_location(weaPath)
+        return [names, skyvec.sky_vectors(lat, lon, tz, rows[:, 0], rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4],
+                                          'perez' if cie is None else cie, mf, projpath=projpath)]
+
+    @staticmethod
+    def illuminance(dc, smx):
+        """
+        Get the illuminance of every sensor for every hour, 179 x the luminous efficacy weighted sum
+        of the daylight coefficients times the sky vectors.
+        :param dc: (sensors x patches x 3) daylight coefficients
+        :param smx: (patches x hours x 3) sky vectors
+        :return: (hours x sensors) float32 array of lux
+        """
+        if dc.shape[1] != smx.shape[0]:
+            raise ValueError(f"The daylight coefficients have {dc.shape[1]} patches, the sky has {smx.shape[0]}")
+        weights = np.array([0.265, 0.670, 0.065], dtype=np.float32) * 179
+        dcw = (dc * weights).reshape(dc.shape[0], -1)
+        sky = smx.transpose(0, 2, 1).reshape(-1, smx.shape[1])
+        return (dcw @ sky).T.astype(np.float32)
+
+    @staticmethod
+    def save(projpath, name, hours, ill):
+        """
+        Save annual results as a (hours x sensors) array and its info file.
+        :param projpath: Root directory for the project
+        :param name: Name for the results
+        :param hours: Hour names
+        :param ill: (hours x sensors) array of lux
+        :return: The file path for the array.
+        """
+        root = os.path.join(projpath, 'results', 'gridBased')
+        os.makedirs(root, exist_ok=True)
+        resPath = os.path.join(root, f'{name}_annual.npy')
+        np.save(resPath, np.asarray(ill, dtype=np.float32))
+        np.savez(os.path.join(root, f'{name}_annual_info.npz'), hours=np.array(hours))
+        return resPath
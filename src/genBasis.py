@@ -0,0 +1,134 @@
+import sys
+import os
+import pathlib
+from basis import basis
+from sculpt import sculpt
+
+
+"""
+Render the image-based contribution basis of a view: one image per control (luminaire and base IES profile), or
+per group of controls, stored as a memory-mapped stack. Any scene sculpted by optimize.py can then be imaged with
+predictImg.py as a weighted sum of the stack instead of a new rendering.
+"""
+
+
+def check_args():
+    if len(sys.argv) <= 1:
+        return False
+    global _name
+    global _model
+    global _view
+    global _height
+    global _width
+    global _illum
+    global _groups
+    global _start
+    global _qual
+    global _show_warnings
+    global _procs
+    global _color
+    for i in range(1, len(sys.argv)):
+        if sys.argv[i] == '-w':
+            _show_warnings = True
+        if sys.argv[i] == '-np':
+            # number of rendering processes
+            _procs = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-i':
+            _illum = True
+        if sys.argv[i] == '-c':
+            # color temp
+            _color = sculpt.cct_to_rgb(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-low':
+            _qual = 'low'
+        if sys.argv[i] == '-x':
+            # Image Width
+            _width = int(sys.argv[i + 1]) * 2
+            i += 1
+        if sys.argv[i] == '-y':
+            # image Height
+            _height = int(sys.argv[i + 1]) * 2
+            i += 1
+        if sys.argv[i] == '-l':
+            # starting channel, use only if continuing a stopped run
+            _start = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-v':
+            # View file
+            vn = os.path.splitext(sys.argv[i + 1])[0]
+            # check that the view actually exists...
+            vtemp = os.path.join(_projPath, 'views', f"{vn}.vf")
+            if os.path.exists(vtemp):
+                _view = os.path.join('views', f"{vn}.vf")
+            i += 1
+        if sys.argv[i] == '-m':
+            # Model file
+            oct = os.path.splitext(sys.argv[i + 1])[0]
+            # check that the view actually exists...
+            otemp = os.path.join(_projPath, 'octrees', f"{oct}.oct")
+            if os.path.exists(otemp):
+                _model = os.path.join('octrees', f'{oct}.oct')
+            i += 1
+        if sys.argv[i] == '-n':
+            # name
+            _name = sys.argv[i + 1]
+            i += 1
+        if sys.argv[i] == '-g':
+            # grouping spec
+            gn = os.path.splitext(sys.argv[i + 1])[0]
+            gtemp = os.path.join(_projPath, 'scenarios', f"{gn}.csv")
+            if os.path.exists(gtemp):
+                _groups = gtemp
+            else:
+                print('g path doesnt exist')
+            i += 1
+
+    return _view != 'unknown' and _model != 'unknown' and _name != 'unknown'
+
+
+# setup parameters
+_name = 'unknown'
+_view = 'unknown'
+_model = 'unknown'
+_groups = None
+_illum = False
+_qual = 'high'
+_start = 0
+_width = 2560   # after pfilt: 1280
+_height = 1440  # after pfilt:  720
+_show_warnings = False
+_procs = 1
+_color = (1.0, 0.808, 0.651)  # 4000K default
+_projPath = pathlib.Path(__file__).parent.parent.resolve()
+
+
+if check_args():
+    stack = basis.render(_projPath, _model, _view, _name, _width, _height, _qual, _illum, _groups, _start,
+                         _show_warnings, _procs, _color)
+    print(stack)
+
+else:
+    print('\nThis command will render an image-based contribution basis for a view, one image per point of')
+    print('control (luminaire and base IES profile) or per group of them. The images are stored as a single')
+    print('stack in results\\imageBased\\basis so that predictImg.py can produce the image of any sculpted scene')
+    print('as a weighted sum of the stack in seconds. With 53 points of control and 8 luminaires this renders')
+    print('424 images, once per view.')
+    print('\n\tExample:')
+    print('\t\tpython genBasis.py -n camera01 -m FullModel -v camera01_fisheye')
+    print('\t\tpython genBasis.py -n camera03_illum -m noChairs.oct -v Camera03.vf -x 960 -y 540 -i -g Zones')
+    print('\n\tArguments')
+    print('\t===================')
+    print('\n\t-m model\tName of the octree model being simulated')
+    print('\n\t-n name\t\tName for the basis')
+    print('\n\t-v name\t\tName of the view file (with/out extension)')
+    print('\n\t-c clrtemp\tColor temperature in Kevlin, default 4000K. [OPTIONAL]')
+    print('\n\t-i\t\tRender illuminance (irradiance) images instead of luminance. [OPTIONAL]')
+    print('\n\t-g groups\tFile name of a grouping spec CSV file in the scenarios directory, the controls of each')
+    print('\t\t\tgroup are rendered together as one image. [OPTIONAL]')
+    print('\n\t-x xdim\t\tImage width, default 1280 [OPTIONAL]')
+    print('\n\t-y ydim\t\tImage Height, default 720 [OPTIONAL]')
+    print('\n\t-low\t\tRender with the low quality settings. [OPTIONAL]')
+    print('\n\t-l idx\t\tStarting channel, use only if continuing a stopped run. [OPTIONAL]')
+    print('\n\t-np procs\tNumber of rendering processes, the image is split into bands. Default 1 [OPTIONAL]')
+    print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
@@ -152,7 +152,7 @@ def sim(idx, profile):
     f = os.path.basename(profile)
 
     res = sculpt.sim_grid(_projPath, oct, os.path.join(_projPath, 'grid', 'SensorGrid.pts'),
-                    'Troffer_{0}_{1}'.format(idx, f.replace('.ies', '')), 'high')
+                    'Troffer_{0}_{1}'.format(idx, f.replace('.ies', '')), 'high', ambient=False)
     return res
 
 
@@ -2,10 +2,12 @@ import sys
 import os
 import pathlib
 from sculpt import sculpt
+from daylight import daylight
 
 
 """
-Perform a grid based simulation using only a CIE sky and no electric lights.
+Perform a grid based simulation using only a CIE sky and no electric lights. With a weather file the simulation
+is annual instead, using daylight coefficients (see the daylight class).
 """
 
 def check_args():
@@ -22,9 +24,35 @@ def check_args():
     global _skytype
     global _timezone
     global _show_warnings
+    global _weather
+    global _mf
+    global _procs
+    global _cie
     for i in range(1, len(sys.argv)):
         if sys.argv[i].lower() == '-w':
             _show_warnings = True
+        if sys.argv[i].lower() == '-a':
+            # weather file for an annual simulation
+            wf = sys.argv[i + 1]
+            if not os.path.exists(wf):
+                wf = os.path.join(_projPath, 'weather', wf)
+            if os.path.exists(wf):
+                _weather = wf
+            else:
+                print(f'{wf} doesnt exist')
+            i += 1
+        if sys.argv[i].lower() == '-mf':
+            # sky subdivision
+            _mf = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i].lower() == '-cie':
+            # CIE standard general sky for the annual simulation
+            _cie = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i].lower() == '-np':
+            # number of rcontrib processes
+            _procs = int(sys.argv[i + 1])
+            i += 1
         if sys.argv[i].lower() == '-m':
             # month
             _month = int(sys.argv[i + 1])
@@ -89,15 +117,26 @@ _day = 21  # 21st (solstice)
 _hour = 12.50  # 12:30pm
 _skytype = 0  # sunny sky with sun
 _show_warnings = False
+_weather = None
+_mf = 1
+_procs = 1
+_cie = None
 _projPath = pathlib.Path(__file__).parent.parent.resolve()
 
 if check_args():
     qual = "high"
-    # perform the simulations.
-    # generate the sky
-    sky = sculpt.gen_cie_sky(_projPath, _lat, _lon, _timezone, _month, _day, _hour, _skytype)
-    oct = sculpt.gen_octree(_projPath, [sky], 'simModel.oct', baseOct=_model)
-    res = sculpt.sim_grid(_projPath, oct, os.path.join(_projPath, _grid), _name, 'high')
+    if _weather is not None:
+        # daylight coefficients once for the grid, then every hour of the weather file as a matrix multiply
+        dc = daylight.coefficients(_projPath, _model, _grid, _mf, qual, _procs, _show_warnings)
+        hours, smx = daylight.sky_matrix(_projPath, _weather, _mf, _cie)
+        res = daylight.save(_projPath, _name, hours, daylight.illuminance(dc, smx))
+        print(res)
+    else:
+        # perform the simulations.
+        # generate the sky
+        sky = sculpt.gen_cie_sky(_projPath, _lat, _lon, _timezone, _month, _day, _hour, _skytype)
+        oct = sculpt.gen_octree(_projPath, [sky], 'simModel.oct', baseOct=_model)
+        res = sculpt.sim_grid(_projPath, oct, os.path.join(_projPath, _grid), _name, 'high')
 
 else:
     print('\nThis command will generate a point-in-time grid-based simulation with HB Radiance commands using a specified ')
@@ -107,6 +146,8 @@ else:
     print('\n\tExample:')
 
     print('\t\tpython gridSky.py -n 0921_1400 -o FullModel -g SensorGrid')
+    print('\t\tpython gridSky.py -n NYC -o FullModel -g SensorGrid -a USA_NY_New.York-Central.Park.epw -np 8')
+    print('\t\tpython gridSky.py -n NYC_clear -o FullModel -g SensorGrid -a USA_NY_New.York-Central.Park.epw -cie 12')
     print(
         '\t\tpython lumSky.py -n 0621_1230 -o FullNoSky.oct -lat 32.78332 -lon -96.79769 -m 6 -d 21 -h 12.50 -tz -6 -g SensorGrid')
     print('\n\tArguments')
@@ -121,4 +162,11 @@ else:
     print('\n\t-m month\tMonth for the point-in-time simulation (1-12)')
     print('\n\t-d day\t\tDay for the point-in-time simulation (1-31)')
     print('\n\t-h hour\t\tHour for the point-in-time simulation (0.0-23.99)')
+    print('\n\t-a weather\tEPW or WEA file (path or name in the weather folder) for an annual simulation with')
+    print('\t\t\tdaylight coefficients. The (hours x sensors) lux are saved to results\\gridBased\\<name>_annual.npy')
+    print('\t\t\tand the location and time arguments are not used. [OPTIONAL]')
+    print('\n\t-mf mf\t\tWith -a, Reinhart sky subdivision, default 1 (Tregenza, 145 patches) [OPTIONAL]')
+    print('\n\t-cie type\tWith -a, CIE standard general sky (1-15, ie 12 for clear) scaled to each hour of the')
+    print('\t\t\tweather file instead of the Perez all-weather skies [OPTIONAL]')
+    print('\n\t-np procs\tWith -a, number of rcontrib processes, not available on Windows. Default 1 [OPTIONAL]')
     print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
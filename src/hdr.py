@@ -0,0 +1,250 @@
+import os
+import numpy as np
+
+
+class hdr(object):
+    """
+    Class full of static functions to read and write Radiance HDR (RGBE) images with NumPy,
+    so that images can be processed in memory rather than through Radiance programs and
+    intermediate files.
+
+    Images are handled as (height x width x 3) float32 arrays with the first row at the top
+    of the picture, ie the standard '-Y height +X width' scanline order. Flat (uncompressed)
+    files are memory-mapped, new-style run-length encoded (RLE) files are decoded scanline by
+    scanline, and old-style RLE is also understood when reading.
+    """
+
+    MAGIC = b'#?RADIANCE'
+
+    @staticmethod
+    def read_header(path):
+        """
+        Read the header and resolution string of an HDR image.
+        :param path: Path to the HDR image
+        :return: [0] header lines #type: list\n[1] resolution string ie '-Y 720 +X 1280'\n[2] Offset of the pixel data
+        """
+        lines = []
+        with open(path, 'rb') as hfile:
+            line = hfile.readline()
+            if not line.startswith(b'#?'):
+                raise ValueError(f"{path} is not a Radiance HDR image")
+            while line.strip() != b'':
+                lines.append(line.decode(errors='replace').rstrip('\n'))
+                line = hfile.readline()
+                if line == b'':
+                    raise ValueError(f"{path} ends before the end of its header")
+            res = hfile.readline().decode().strip()
+            return [lines, res, hfile.tell()]
+
+    @staticmethod
+    def exposure(lines):
+        """
+        Get the total exposure of an image from its header, the product of any EXPOSURE lines.
+        :param lines: Header lines
+        :return: #type: float
+        """
+        exp = 1.0
+        for line in lines:
+            if line.startswith('EXPOSURE='):
+                exp *= float(line.split('=')[1])
+        return exp
+
+    @staticmethod
+    def parse_res(res):
+        """
+        Parse a resolution string into the size of the stored scanlines and how to orient them.
+        :param res: Resolution string ie '-Y 720 +X 1280'
+        :return: [0] Scanline count\n[1] Scanline length\n[2] Function that turns the stored array upright
+        """
+        parts = res.split()
+        if len(parts) != 4:
+            raise ValueError(f"Bad resolution string '{res}'")
+        count, length = int(parts[1]), int(parts[3])
+        ymajor = parts[0][1] == 'Y'
+        ysign, xsign = (parts[0][0], parts[2][0]) if ymajor else (parts[2][0], parts[0][0])
+
+        def orient(img):
+            if not ymajor:
+                img = img.swapaxes(0, 1)
+            if ysign == '+':
+                img = img[::-1]
+            if xsign == '-':
+                img = img[:, ::-1]
+            return img
+
+        return [count, length, orient]
+
+    @staticmethod
+    def rgbe_to_float(rgbe):
+        """
+        Convert RGBE pixels to floating point RGB, as Radiance's colr_color does.
+        :param rgbe: (... x 4) uint8 array
+        :return: (... x 3) float32 array
+        """
+        e = rgbe[..., 3].astype(np.int32)
+        scale = np.where(e > 0, np.ldexp(np.float32(1.0), e - (128 + 8)), 0.0).astype(np.float32)
+        return (rgbe[..., :3].astype(np.float32) + 0.5) * scale[..., None]
+
+    @staticmethod
+    def float_to_rgbe(rgb):
+        """
+        Convert floating point RGB to RGBE pixels, as Radiance's setcolr does.
+        :param rgb: (... x 3) float array
+        :return: (... x 4) uint8 array
+        """
+        rgb = np.asarray(rgb, dtype=np.float64)
+        m = rgb.max(axis=-1)
+        mant, e = np.frexp(m)
+        bright = m > 1e-32
+        scale = np.divide(mant * 256.0, m, out=np.zeros_like(m), where=bright)
+        rgbe = np.zeros(rgb.shape[:-1] + (4,), dtype=np.uint8)
+        rgbe[..., :3] = np.clip(np.floor(rgb * scale[..., None]), 0, 255)
+        rgbe[..., 3] = np.where(bright, e + 128, 0)
+        return rgbe
+
+    @staticmethod
+    def decode_rle(data, count, length):
+        """
+        Decode the run-length encoded (or flat) RGBE scanlines of an image.
+        :param data: Pixel data of the file #type: bytes
+        :param count: Number of scanlines
+        :param length: Scanline length
+        :return: (count x length x 4) uint8 array
+        """
+        rgbe = np.empty((count, length, 4), dtype=np.uint8)
+        pos = 0
+        for row in range(count):
+            head = data[pos:pos + 4]
+            if 8 <= length < 0x8000 and len(head) == 4 and head[0] == 2 and head[1] == 2 and not head[2] & 0x80:
+                if (head[2] << 8 | head[3]) != length:
+                    raise ValueError("Scanline length mismatch in the HDR image")
+                pos += 4
+                for c in range(4):
+                    line = bytearray()
+                    while len(line) < length:
+                        n = data[pos]
+                        if n > 128:
+                            line += data[pos + 1:pos + 2] * (n - 128)
+                            pos += 2
+                        else:
+                            line += data[pos + 1:pos + 1 + n]
+                            pos += n + 1
+                    if len(line) != length:
+                        raise ValueError("Overrun in a run-length encoded scanline of the HDR image")
+                    rgbe[row, :, c] = np.frombuffer(line, dtype=np.uint8)
+            else:
+                # flat or old-style RLE, where (1,1,1,n) repeats the previous pixel
+                col = 0
+                shift = 0
+                while col < length:
+                    px = data[pos:pos + 4]
+                    pos += 4
+                    if px[0] == 1 and px[1] == 1 and px[2] == 1 and col > 0:
+                        n = px[3] << shift
+                        rgbe[row, col:col + n] = rgbe[row, col - 1]
+                        col += n
+                        shift += 8
+                    else:
+                        rgbe[row, col] = np.frombuffer(px, dtype=np.uint8)
+                        col += 1
+                        shift = 0
+        return rgbe
+
+    @staticmethod
+    def read_rgbe(path):
+        """
+        Read the RGBE pixels of an HDR image. Flat files are memory-mapped rather than read.
+        :param path: Path to the HDR image
+        :return: [0] header lines\n[1] (height x width x 4) uint8 array, upright
+        """
+        lines, res, offset = hdr.read_header(path)
+        count, length, orient = hdr.parse_res(res)
+        with open(path, 'rb') as hfile:
+            hfile.seek(offset)
+            head = hfile.read(4)
+        size = os.path.getsize(path) - offset
+        rle = len(head) == 4 and head[0] == 2 and head[1] == 2 and not head[2] & 0x80 and 8 <= length < 0x8000
+        if not rle and size == count * length * 4:
+            rgbe = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(count, length, 4))
+        else:
+            with open(path, 'rb') as hfile:
+                hfile.seek(offset)
+                rgbe = hdr.decode_rle(hfile.read(), count, length)
+        return [lines, orient(rgbe)]
+
+    @staticmethod
+    def read(path, original=True):
+        """
+        Read an HDR image into a floating point array.
+        :param path: Path to the HDR image
+        :param original: Undo any exposure adjustment in the header (as PVALUE -o), returning the simulated values
+        :return: (height x width x 3) float32 array
+        """
+        lines, rgbe = hdr.read_rgbe(path)
+        img = hdr.rgbe_to_float(rgbe)
+        if original:
+            exp = hdr.exposure(lines)
+            if exp != 1.0:
+                img /= np.float32(exp)
+        return img
+
+    @staticmethod
+    def encode_rle(values):
+        """
+        Run-length encode one component of a scanline as in Radiance's fwritecolrs.
+        :param values: (length) uint8 array
+        :return: #type: bytes
+        """
+        out = bytearray()
+        length = len(values)
+        starts = np.flatnonzero(np.diff(values.astype(np.int16)) != 0) + 1
+        starts = np.concatenate(([0], starts, [length]))
+        literal = []
+        for s, e in zip(starts[:-1], starts[1:]):
+            run = int(e - s)
+            if run >= 4:
+                for i in range(0, len(literal), 128):
+                    chunk = literal[i:i + 128]
+                    out.append(len(chunk))
+                    out += bytes(chunk)
+                literal = []
+                v = int(values[s])
+                while run >= 4:
+                    n = min(run, 127)
+                    out += bytes((128 + n, v))
+                    run -= n
+                literal.extend([v] * run)
+            else:
+                literal.extend(values[s:e].tolist())
+        for i in range(0, len(literal), 128):
+            chunk = literal[i:i + 128]
+            out.append(len(chunk))
+            out += bytes(chunk)
+        return bytes(out)
+
+    @staticmethod
+    def write(path, img, rle=True, header=None):
+        """
+        Write a floating point array to an HDR image.
+        :param path: Path to the resulting HDR image
+        :param img: (height x width x 3) array, first row at the top
+        :param rle: Run-length encode the scanlines, otherwise write flat pixels that can be memory-mapped
+        :param header: [OPTIONAL] Extra header lines, ie commands or VIEW= lines
+        :return: The file path for the image.
+        """
+        height, width = img.shape[:2]
+        rgbe = hdr.float_to_rgbe(img)
+        lines = [hdr.MAGIC.decode()] + list(header or []) + ['FORMAT=32-bit_rle_rgbe']
+        tmpPath = f"{path}.{os.getpid()}.tmp"
+        with open(tmpPath, 'wb') as hfile:
+            hfile.write(("\n".join(lines) + f"\n\n-Y {height} +X {width}\n").encode())
+            if not rle or width < 8 or width >= 0x8000:
+                hfile.write(np.ascontiguousarray(rgbe).tobytes())
+            else:
+                head = bytes((2, 2, width >> 8, width & 0xFF))
+                for row in rgbe:
+                    hfile.write(head)
+                    for c in range(4):
+                        hfile.write(hdr.encode_rle(row[:, c]))
+        os.replace(tmpPath, path)
+        return path
@@ -16,6 +16,7 @@ def check_args():
     global _name
     global _model
     global _scene
+    global _row
     global _view
     global _height
     global _width
@@ -25,10 +26,21 @@ def check_args():
     global _pal
     global _unsculpt
     global _show_warnings
+    global _procs
+    global _stream
+    global _progressive
     _unsculpt = True
     for i in range(1, len(sys.argv)):
         if sys.argv[i].lower() == '-w':
             _show_warnings = True
+        if sys.argv[i].lower() == '-prog':
+            _progressive = True
+        if sys.argv[i].lower() == '-pipe':
+            _stream = True
+        if sys.argv[i].lower() == '-np':
+            # number of rendering processes
+            _procs = int(sys.argv[i + 1])
+            i += 1
         if sys.argv[i].lower() == '-gif':
             _gif = True
         if sys.argv[i].lower() == '-t':
@@ -65,6 +77,10 @@ def check_args():
             # name
             _name = sys.argv[i + 1]
             i += 1
+        if sys.argv[i].lower() == '-row':
+            # row of a scalars file with several rows, ie an hour of a daylight schedule
+            _row = sys.argv[i + 1]
+            i += 1
         if sys.argv[i].lower() == '-s':
             # scene
             sn = sys.argv[i + 1]
@@ -88,6 +104,7 @@ def check_args():
 # setup parameters
 _name = 'unknown'
 _scene = 'unknown'
+_row = None
 _view = 'unknown'
 _model = 'unknown'
 _unsculpt = False
@@ -96,6 +113,9 @@ _color = (1.0, 0.808, 0.651)  # 4000K default
 _width = 2560   # after pfilt: 1280
 _height = 1440  # after pfilt:  720
 _show_warnings = False
+_procs = 1
+_stream = False
+_progressive = False
 _gif = False
 _tif = False
 _projPath = pathlib.Path(__file__).parent.parent.resolve()
@@ -104,12 +124,21 @@ _projPath = pathlib.Path(__file__).parent.parent.resolve()
 if check_args():
     qual = "high"
     # perform the simulations.
-    lum_files = sculpt.process_ies(_projPath, _scene, _color, "LUM")
+    lum_files = sculpt.process_ies(_projPath, _scene, _color, "LUM", row=_row)
     #print(lum_files)
     oct = sculpt.gen_octree(_projPath, lum_files, 'simModel.oct', baseOct=_model)
-    lum_hdr = sculpt.render_img(_projPath, oct, _view, _name, _width, _height, qual, True, True, _show_warnings)
-    fcpath = lum_hdr.replace('.hdr', '_fc.hdr')
-    fc_hdr = sculpt.to_falsecolor(_projPath, lum_hdr, fcpath, _pal, 500, _width * 0.1, _height*0.4)
+    fc = {'pal': _pal, 'scale': 500, 'width': _width * 0.1, 'height': _height*0.4}
+    if _progressive:
+        lum_hdr = sculpt.render_progressive(_projPath, oct, _view, _name, _width, _height, qual, True, _show_warnings,
+                                            _procs)
+        fc_hdr = sculpt.to_falsecolor(_projPath, lum_hdr, lum_hdr.replace('.hdr', '_fc.hdr'), **fc)
+    elif _stream:
+        fc_hdr = sculpt.render_img(_projPath, oct, _view, _name, _width, _height, qual, True, True, _show_warnings,
+                                   _procs, stream=True, falsecolor=fc)
+    else:
+        lum_hdr = sculpt.render_img(_projPath, oct, _view, _name, _width, _height, qual, True, True, _show_warnings, _procs)
+        fcpath = lum_hdr.replace('.hdr', '_fc.hdr')
+        fc_hdr = sculpt.to_falsecolor(_projPath, lum_hdr, fcpath, **fc)
     if _gif:
         gif = sculpt.to_gif(_projPath, fc_hdr, fc_hdr.replace('.hdr', '.gif'))
 
@@ -129,10 +158,15 @@ else:
     print('\n\t-m model\tName of the octree model being simulated')
     print('\n\t-n name\t\tName for the luminance image file')
     print('\n\t-s scene\tName of the scene being simulated')
+    print('\n\t-row row\tRow of the scene\'s scalars file to use when it has several, ie an hour of a daylight')
+    print('\t\t\tschedule [OPTIONAL]')
     print('\n\t-v name\t\tName of the view file (with/out extension)')
     print('\n\t-p pal\t\tColor palette for the falsecolor, default "def". [OPTIONAL]')
     print('\n\t-c clrtemp\tColor temperature in Kevlin, default 4000K. [OPTIONAL]')
     print('\n\t-x xdim\t\tImage width, default 1280 [OPTIONAL]')
     print('\n\t-y ydim\t\tImage Height, default 720 [OPTIONAL]')
     print('\n\t-gif\t\tExport the HDR image as a GIF. [OPTIONAL]')
+    print('\n\t-prog\t\tRender progressively, updating results\\imageBased\\<name>_preview.hdr with each pass. [OPTIONAL]')
+    print('\n\t-pipe\t\tStream the rendering through pfilt and falsecolor so only the falsecolor image is written. [OPTIONAL]')
+    print('\n\t-np procs\tNumber of rendering processes, the image is split into bands. Default 1 [OPTIONAL]')
     print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
@@ -27,9 +27,14 @@ def check_args():
     global _skytype
     global _timezone
     global _show_warnings
+    global _procs
     for i in range(1, len(sys.argv)):
         if sys.argv[i].lower() == '-w':
             _show_warnings = True
+        if sys.argv[i].lower() == '-np':
+            # number of rendering processes
+            _procs = int(sys.argv[i + 1])
+            i += 1
         if sys.argv[i].lower() == '-gif':
             _gif = True
         if sys.argv[i].lower() == '-x':
@@ -114,6 +119,7 @@ _day = 21  # 21st (solstice)
 _hour = 12.50  # 12:30pm
 _skytype = 0  # sunny sky with sun
 _show_warnings = False
+_procs = 1
 _gif = False
 _projPath = pathlib.Path(__file__).parent.parent.resolve()
 
@@ -124,7 +130,7 @@ if check_args():
     # generate the sky
     sky = sculpt.gen_cie_sky(_projPath, _lat, _lon, _timezone, _month, _day, _hour, _skytype)
     oct = sculpt.gen_octree(_projPath, [sky], 'simModel.oct', baseOct=_model)
-    lum_hdr = sculpt.render_img(_projPath, oct, _view, _name, _width, _height, qual, True, True, _show_warnings)
+    lum_hdr = sculpt.render_img(_projPath, oct, _view, _name, _width, _height, qual, True, True, _show_warnings, _procs)
     fcpath = lum_hdr.replace('.hdr', '_fc.hdr')
 
     # NOTE: the 5th parameter in the 'to_falsecolor' method is the max scale value. This likely needs adjustment
@@ -159,4 +165,5 @@ else:
     print('\n\t-x xdim\t\tImage width, default 1280 [OPTIONAL]')
     print('\n\t-y ydim\t\tImage Height, default 720 [OPTIONAL]')
     print('\n\t-gif\t\tExport the HDR image as a GIF. [OPTIONAL]')
+    print('\n\t-np procs\tNumber of rendering processes, the image is split into bands. Default 1 [OPTIONAL]')
     print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
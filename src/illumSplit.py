@@ -2,6 +2,7 @@ import sys
 import os
 import pathlib
 from sculpt import sculpt
+from imgproc import imgproc
 
 
 """
@@ -25,16 +26,24 @@ def check_args():
     global _lgpColor
     global _spotColor
     global _gif
+    global _png
     global _tif
     global _pal
     global _unsculpt
     global _show_warnings
+    global _procs
     _unsculpt = True
     for i in range(1, len(sys.argv)):
         if sys.argv[i] == '-w':
             _show_warnings = True
+        if sys.argv[i] == '-np':
+            # number of rendering processes
+            _procs = int(sys.argv[i + 1])
+            i += 1
         if sys.argv[i] == '-gif':
             _gif = True
+        if sys.argv[i] == '-png':
+            _png = True
         if sys.argv[i] == '-t':
             _tif = True
         if sys.argv[i] == '-x':
@@ -105,7 +114,9 @@ _spotColor = (1.0, 0.808, 0.651)  # 4000K default
 _width = 2560   # after pfilt: 1280
 _height = 1440  # after pfilt:  720
 _show_warnings = False
+_procs = 1
 _gif = False
+_png = False
 _tif = False
 _projPath = pathlib.Path(__file__).parent.parent.resolve()
 
@@ -126,27 +137,30 @@ if check_args():
 
     # perform the simulations.
     qual = "high"
-    spot_files = sculpt.process_ies(_projPath, _scene, _spotColor, "Spot")
-    oct = sculpt.gen_octree(_projPath, spot_files, 'simModel.oct', baseOct=_model)
-    spot_hdr = sculpt.render_img(_projPath, oct, _view, f'{_name}_Spot', _width, _height, qual, False, True, _show_warnings)
-    lgp_files = sculpt.process_ies(_projPath, _scene, _lgpColor, "LGP")
-    oct = sculpt.gen_octree(_projPath, lgp_files, 'simModel.oct', baseOct=_model)
-    lgp_hdr = sculpt.render_img(_projPath, oct, _view, f'{_name}_LGP', _width, _height, qual, False, True, _show_warnings)
-
-    # combine the spot and lgp HDR files
-    comb = sculpt.comb_img(_projPath, [os.path.join(_projPath, spot_hdr), os.path.join(_projPath, lgp_hdr)], _name, False)
-
-    # convert to falsecolor
-    fcpath = comb.replace('.hdr', '_fc.hdr')
-    fc = sculpt.to_falsecolor(_projPath, comb, fcpath, _pal, 500, _width * 0.05, _height*0.2)
-    if _gif:
-        gif = sculpt.to_gif(_projPath, fc, fcpath.replace('.hdr', '.gif'))
-
+    # neutral white Spot and LGP passes, rendered concurrently and reused for any color temperatures
+    spot_hdr, lgp_hdr = sculpt.neutral_split(_projPath, _scene, _model, _view, _width, _height, qual, True,
+                                             _show_warnings, _procs)
+
+    # tint, combine, anti-alias and falsecolor the spot and lgp HDR files in memory
+    inputs = [spot_hdr, lgp_hdr]
+    colors = [_spotColor, _lgpColor]
+    export = 'png' if _png else ('gif' if _gif else None)
+    if _pal in imgproc.PALETTES:
+        fc = {'scale': 500, 'pal': _pal, 'lw': _width * 0.05, 'lh': _height * 0.2}
+        comb, fc, exported = imgproc.split_pipeline(_projPath, inputs, _name, colors, aa=True, fc=fc, export=export)
+    else:
+        # palettes without an in-process version use the Radiance falsecolor command
+        comb = imgproc.split_pipeline(_projPath, inputs, _name, colors, aa=True)[0]
+        fcpath = comb.replace('.hdr', '_fc.hdr')
+        fc = sculpt.to_falsecolor(_projPath, comb, fcpath, _pal, 500, _width * 0.05, _height*0.2)
+        if _gif:
+            gif = sculpt.to_gif(_projPath, fc, fcpath.replace('.hdr', '.gif'))
 
 else:
     print('\nThis command will generate an illuminance rendering with HB Radiance commands using split')
     print('IES profiles per luminaire location (spots and light-guide plate). This enables a rendering')
-    print('of a scenario/scene using a varied color temperature for the luminaires.')
+    print('of a scenario/scene using a varied color temperature for the luminaires. The parts are rendered once')
+    print('in neutral white and reused, so running again with other -lgp/-spot values only re-tints the images.')
     print('It is required to pass a baseline Octree model, View file, and a Name. If no Scene name is ')
     print('passed it will use the default unsculpted IES file (all pixels at full power).')
     print('\n\tExample:')
@@ -165,4 +179,6 @@ else:
     print('\n\t-x xdim\t\tImage width, default 1280 [OPTIONAL]')
     print('\n\t-y ydim\t\tImage Height, default 720 [OPTIONAL]')
     print('\n\t-gif\t\tExport the HDR image as a GIF. [OPTIONAL]')
+    print('\n\t-png\t\tExport the HDR image as a PNG. [OPTIONAL]')
+    print('\n\t-np procs\tNumber of rendering processes, the image is split into bands. Default 1 [OPTIONAL]')
     print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
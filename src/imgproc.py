@@ -0,0 +1,471 @@
+import os
+import zlib
+import struct
+import numpy as np
+from hdr import hdr
+
+
+class imgproc(object):
+    """
+    Class full of static functions to post-process rendered images in memory with NumPy,
+    in place of chains of Radiance programs (pcomb, pfilt, pcond, falsecolor, ra_gif) that
+    each write a full size HDR file and start a new process.
+
+    Images are (height x width x 3) float32 arrays as read by the hdr class, so a pipeline
+    only reads its inputs and writes its final artifacts.
+    """
+
+    # RGB weights of the photopic luminance used throughout this project
+    LUMINANCE = np.array([0.265, 0.67, 0.065], dtype=np.float32)
+
+    # default falsecolor palette, an interpolated approximation of Radiance's 'def' scale
+    DEF_RAMP = np.array([
+        [0.00, 0.19, 0.00, 0.27],
+        [0.15, 0.00, 0.03, 0.51],
+        [0.30, 0.00, 0.29, 0.52],
+        [0.45, 0.06, 0.47, 0.19],
+        [0.60, 0.29, 0.62, 0.02],
+        [0.75, 0.61, 0.62, 0.01],
+        [0.90, 0.91, 0.40, 0.00],
+        [1.00, 0.99, 0.16, 0.00],
+    ])
+
+    PALETTES = {
+        'def': lambda x: np.stack([np.interp(x, imgproc.DEF_RAMP[:, 0], imgproc.DEF_RAMP[:, c])
+                                   for c in range(1, 4)], axis=-1),
+        'spec': lambda x: np.stack([1.6 * x - 0.6, np.where(x > 0.375, 1.6 - 1.6 * x, 8.0 / 3.0 * x),
+                                    1.0 - 8.0 / 3.0 * x], axis=-1),
+        'pm3d': lambda x: np.stack([np.sqrt(x), x ** 3, np.clip(np.sin(2 * np.pi * x), 0, 1)], axis=-1),
+        'hot': lambda x: np.stack([3 * x, 3 * x - 1, 3 * x - 2], axis=-1),
+    }
+
+    # 5x7 bitmap glyphs for the falsecolor legend
+    GLYPHS = {
+        '0': ['01110', '10001', '10011', '10101', '11001', '10001', '01110'],
+        '1': ['00100', '01100', '00100', '00100', '00100', '00100', '01110'],
+        '2': ['01110', '10001', '00001', '00010', '00100', '01000', '11111'],
+        '3': ['11110', '00001', '00001', '01110', '00001', '00001', '11110'],
+        '4': ['00010', '00110', '01010', '10010', '11111', '00010', '00010'],
+        '5': ['11111', '10000', '11110', '00001', '00001', '10001', '01110'],
+        '6': ['00110', '01000', '10000', '11110', '10001', '10001', '01110'],
+        '7': ['11111', '00001', '00010', '00100', '01000', '01000', '01000'],
+        '8': ['01110', '10001', '10001', '01110', '10001', '10001', '01110'],
+        '9': ['01110', '10001', '10001', '01111', '00001', '00010', '01100'],
+        '.': ['00000', '00000', '00000', '00000', '00000', '01100', '01100'],
+        '-': ['00000', '00000', '00000', '11111', '00000', '00000', '00000'],
+        '/': ['00001', '00010', '00010', '00100', '01000', '01000', '10000'],
+        'L': ['10000', '10000', '10000', '10000', '10000', '10000', '11111'],
+        'u': ['00000', '00000', '10001', '10001', '10001', '10011', '01101'],
+        'x': ['00000', '00000', '10001', '01010', '00100', '01010', '10001'],
+        'c': ['00000', '00000', '01110', '10000', '10000', '10001', '01110'],
+        'd': ['00001', '00001', '01101', '10011', '10001', '10001', '01111'],
+        'm': ['00000', '00000', '11010', '10101', '10101', '10001', '10001'],
+    }
+
+    @staticmethod
+    def luminance(img, mult=179.0):
+        """
+        Get the luminance (or illuminance for irradiance images) of every pixel.
+        :param img: (height x width x 3) array
+        :param mult: Multiplier from Radiance units, 179 lm/W
+        :return: (height x width) array
+        """
+        return mult * (img @ imgproc.LUMINANCE)
+
+    @staticmethod
+    def combine(imgs, colors=None):
+        """
+        Sum images, optionally scaling each by an RGB color, as pcomb [-c r g b] img ... does.
+        :param imgs: List of (height x width x 3) arrays
+        :param colors: [OPTIONAL] (R,G,B) multiplier per image
+        :return: (height x width x 3) float32 array
+        """
+        out = np.zeros(imgs[0].shape, dtype=np.float32)
+        for i, img in enumerate(imgs):
+            if colors is None:
+                out += img
+            else:
+                out += img * np.asarray(colors[i], dtype=np.float32)
+        return out
+
+    @staticmethod
+    def downsample(img, factor=2, radius=0.6):
+        """
+        Reduce an image by an integer factor with Gaussian filtering, as pfilt -x /2 -y /2 -r 0.6 does.
+        The Gaussian radius is relative to the output pixel size; a radius of 0 averages boxes of pixels.
+        :param img: (height x width x 3) array
+        :param factor: Reduction factor
+        :param radius: Gaussian filter radius in output pixels
+        :return: (height/factor x width/factor x 3) float32 array
+        """
+        for axis in (0, 1):
+            n = img.shape[axis] // factor
+            if radius > 0:
+                s = radius * factor
+                half = int(np.ceil(2 * s))
+                offsets = np.arange(-half, factor + half)
+                weights = np.exp(-((offsets - (factor - 1) / 2.0) / s) ** 2)
+            else:
+                half = 0
+                offsets = np.arange(factor)
+                weights = np.ones(factor)
+            weights = weights / weights.sum()
+            pad = [(0, 0)] * img.ndim
+            pad[axis] = (half, half + factor)
+            padded = np.pad(img, pad, mode='edge')
+            out = np.zeros(img.shape[:axis] + (n,) + img.shape[axis + 1:], dtype=np.float32)
+            for o, w in zip(offsets, weights):
+                idx = [slice(None)] * img.ndim
+                idx[axis] = slice(o + half, o + half + factor * n, factor)
+                out += np.float32(w) * padded[tuple(idx)]
+            img = out
+        return img
+
+    @staticmethod
+    def expose(img, level=0.5):
+        """
+        Scale an image so its average brightness, in Radiance units without the 179 lm/W factor, is the given
+        level, as pfilt does when no exposure is given. In-process results are then exposed like those filtered
+        with pfilt. The exposure should be recorded as an EXPOSURE= header line (see hdr.write), which hdr.read
+        undoes to recover the simulated values.
+        :param img: (height x width x 3) array
+        :param level: Target average brightness, pfilt's is 0.5
+        :return: [0] (height x width x 3) float32 array\n[1] exposure #type: float
+        """
+        avg = float(imgproc.luminance(img, 1.0).mean())
+        if avg <= 1e-9:
+            return [img, 1.0]
+        exposure = level / avg
+        return [(img * np.float32(exposure)).astype(np.float32), exposure]
+
+    @staticmethod
+    def foveal(lw):
+        """
+        Get the log luminances of foveal sized samples of an image, roughly a degree for a typical view.
+        :param lw: (height x width) world luminance array
+        :return: 1D array of log10 luminances
+        """
+        step = max(1, int(round(min(lw.shape[:2]) / 100)))
+        h, w = (lw.shape[0] // step) * step, (lw.shape[1] // step) * step
+        fov = lw[:h, :w].reshape(h // step, step, w // step, step).mean(axis=(1, 3))
+        return np.log10(fov).ravel()
+
+    @staticmethod
+    def histogram_map(lw, logf, ldmin=1.0, ldmax=100.0, bins=100):
+        """
+        Map world luminances to display luminances with Ward Larson's histogram adjustment of the foveal
+        samples, with a linear ceiling so that contrast is never exaggerated.
+        :param lw: World luminance array
+        :param logf: log10 luminances of the foveal samples from imgproc.foveal
+        :param ldmin: Minimum display luminance (cd/m2)
+        :param ldmax: Maximum display luminance (cd/m2)
+        :param bins: Histogram bins
+        :return: Display luminance array
+        """
+        bmin, bmax = logf.min(), logf.max()
+        dlog = np.log10(ldmax) - np.log10(ldmin)
+        logw = np.log10(lw)
+        if bmax - bmin <= dlog:
+            # the scene fits on the display, a linear mapping is used
+            return np.clip(lw * ldmax / (10 ** bmax), ldmin, ldmax)
+        hist, edges = np.histogram(logf, bins=bins, range=(bmin, bmax))
+        hist = hist.astype(float)
+        db = edges[1] - edges[0]
+        total = hist.sum()
+        for _ in range(100):
+            ceiling = total * db / dlog
+            trimmed = np.sum(np.maximum(hist - ceiling, 0))
+            hist = np.minimum(hist, ceiling)
+            total = hist.sum()
+            if trimmed < 0.025 * total:
+                break
+        cdf = np.concatenate(([0.0], np.cumsum(hist) / total))
+        p = np.interp(logw, edges, cdf)
+        return 10 ** (np.log10(ldmin) + dlog * p)
+
+    @staticmethod
+    def tonemap(img, ldmin=1.0, ldmax=100.0, bins=100):
+        """
+        Map a radiance image to a display in the spirit of pcond -h, using Ward Larson's histogram
+        adjustment with a linear ceiling so that contrast is never exaggerated beyond what a viewer
+        of the real scene would see. Veiling glare, acuity and color sensitivity are not modeled.
+        :param img: (height x width x 3) radiance array
+        :param ldmin: Minimum display luminance (cd/m2)
+        :param ldmax: Maximum display luminance (cd/m2)
+        :param bins: Histogram bins
+        :return: (height x width x 3) float32 array where 1.0 is the display maximum
+        """
+        return imgproc.tonemap_frames([img], ldmin, ldmax, bins)[0]
+
+    @staticmethod
+    def tonemap_frames(imgs, ldmin=1.0, ldmax=100.0, bins=100):
+        """
+        Map several radiance images, ie the frames of a time-lapse, to a display with one histogram of all of
+        them (see imgproc.tonemap), so they share one mapping and the changes between them stay visible.
+        :param imgs: List of (height x width x 3) radiance arrays
+        :param ldmin: Minimum display luminance (cd/m2)
+        :param ldmax: Maximum display luminance (cd/m2)
+        :param bins: Histogram bins
+        :return: list of (height x width x 3) float32 arrays where 1.0 is the display maximum
+        """
+        lws = [np.maximum(imgproc.luminance(img), 1e-6) for img in imgs]
+        logf = np.concatenate([imgproc.foveal(lw) for lw in lws])
+        out = []
+        for img, lw in zip(imgs, lws):
+            ld = imgproc.histogram_map(lw, logf, ldmin, ldmax, bins)
+            out.append((img * (ld / lw / ldmax)[..., None] * np.float32(179.0)).astype(np.float32))
+        return out
+
+    @staticmethod
+    def draw_text(canvas, text, x, y, size, color=(1.0, 1.0, 1.0)):
+        """
+        Draw text into an image with the bitmap glyphs, characters without a glyph are left blank.
+        :param canvas: (height x width x 3) array, modified in place
+        :param text: #type: str
+        :param x: Left pixel
+        :param y: Top pixel
+        :param size: Pixel size of a glyph dot
+        :param color: (R,G,B) of the text
+        """
+        for ch in text:
+            glyph = imgproc.GLYPHS.get(ch)
+            if glyph is not None:
+                mask = np.kron(np.array([[c == '1' for c in row] for row in glyph]), np.ones((size, size), dtype=bool))
+                region = canvas[y:y + mask.shape[0], x:x + mask.shape[1]]
+                region[mask[:region.shape[0], :region.shape[1]]] = color
+            x += 6 * size
+
+    @staticmethod
+    def legend(pal, scale, ndivs, width, height, label='Lux'):
+        """
+        Draw a falsecolor legend, the highest values at the top, each division labeled by its middle value.
+        :param pal: Palette name
+        :param scale: Value at the top of the scale
+        :param ndivs: Number of divisions
+        :param width: Legend width
+        :param height: Legend height
+        :param label: Legend title
+        :return: (height x width x 3) float32 array
+        """
+        width, height = int(width), int(height)
+        leg = np.zeros((height, width, 3), dtype=np.float32)
+        top = height // (ndivs + 1)
+        band = (height - top) / ndivs
+        size = max(1, int(min(band * 0.6, width * 0.6 / 6 / 5) // 7))
+        imgproc.draw_text(leg, label, 2, max(0, (top - 7 * size) // 2), size)
+        for i in range(ndivs):
+            v = (ndivs - i - 0.5) / ndivs
+            y0, y1 = int(top + i * band), int(top + (i + 1) * band)
+            leg[y0:y1, int(width * 0.6):] = np.clip(imgproc.PALETTES[pal](np.array(v)), 0, 1)
+            text = f"{scale * v:.0f}" if scale * v >= 10 else f"{scale * v:.1f}"
+            imgproc.draw_text(leg, text, 2, y0 + max(0, (y1 - y0 - 7 * size) // 2), size)
+        return leg
+
+    @staticmethod
+    def falsecolor(img, scale, pal='def', mult=179.0, ndivs=10, lw=100, lh=200, label='Lux'):
+        """
+        Map an image to false colors with a legend on the left, as falsecolor does.
+        :param img: (height x width x 3) array
+        :param scale: Value mapped to the top of the palette
+        :param pal: Palette name, one of imgproc.PALETTES
+        :param mult: Multiplier from Radiance units, 179 lm/W
+        :param ndivs: Number of legend divisions
+        :param lw: Legend width, 0 for no legend
+        :param lh: Legend height
+        :param label: Legend title
+        :return: (height x width + lw x 3) float32 array
+        """
+        v = np.clip(imgproc.luminance(img, mult) / float(scale), 0, 1)
+        fc = np.clip(imgproc.PALETTES[pal](v), 0, 1).astype(np.float32)
+        if int(lw) <= 0:
+            return fc
+        lh = min(int(lh), fc.shape[0])
+        out = np.zeros((fc.shape[0], fc.shape[1] + int(lw), 3), dtype=np.float32)
+        out[:, int(lw):] = fc
+        out[fc.shape[0] - lh:, :int(lw)] = imgproc.legend(pal, scale, ndivs, lw, lh, label)
+        return out
+
+    @staticmethod
+    def to_8bit(img, gamma=2.2):
+        """
+        Convert display values (1.0 is the display maximum) to gamma corrected 8 bit values, as ra_gif does.
+        :param img: (height x width x 3) array
+        :param gamma: Display gamma
+        :return: (height x width x 3) uint8 array
+        """
+        return (np.clip(img, 0, 1) ** (1.0 / gamma) * 255.0 + 0.5).astype(np.uint8)
+
+    @staticmethod
+    def write_png(path, img, gamma=2.2):
+        """
+        Write display values to an 8 bit RGB PNG file.
+        :param path: Path to the resulting PNG file
+        :param img: (height x width x 3) array
+        :param gamma: Display gamma
+        :return: The file path for the image.
+        """
+        rgb = imgproc.to_8bit(img, gamma)
+        height, width = rgb.shape[:2]
+        raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgb.reshape(height, -1)], axis=1).tobytes()
+
+        def chunk(kind, data):
+            return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+        with open(path, 'wb') as pfile:
+            pfile.write(b'\x89PNG\r\n\x1a\n')
+            pfile.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+            pfile.write(chunk(b'IDAT', zlib.compress(raw, 6)))
+            pfile.write(chunk(b'IEND', b''))
+        return path
+
+    @staticmethod
+    def lzw(indices, mincode=8):
+        """
+        LZW compress palette indices for a GIF image.
+        :param indices: Palette indices #type: bytes
+        :param mincode: Minimum code size
+        :return: #type: bytes
+        """
+        clear = 1 << mincode
+        eoi = clear + 1
+        out = bytearray()
+        state = [0, 0, mincode + 1]  # bit buffer, bit count, code size
+
+        def emit(code):
+            state[0] |= code << state[1]
+            state[1] += state[2]
+            while state[1] >= 8:
+                out.append(state[0] & 0xFF)
+                state[0] >>= 8
+                state[1] -= 8
+
+        table = {}
+        running = eoi + 1
+        emit(clear)
+        prefix = indices[0]
+        for b in indices[1:]:
+            key = (prefix << 8) | b
+            code = table.get(key)
+            if code is not None:
+                prefix = code
+                continue
+            emit(prefix)
+            if running >= (1 << state[2]) and state[2] < 12:
+                state[2] += 1
+            if running >= 4095:
+                emit(clear)
+                table = {}
+                running = eoi + 1
+                state[2] = mincode + 1
+            else:
+                table[key] = running
+                running += 1
+            prefix = b
+        emit(prefix)
+        if running >= (1 << state[2]) and state[2] < 12:
+            state[2] += 1
+        emit(eoi)
+        if state[1] > 0:
+            out.append(state[0] & 0xFF)
+        return bytes(out)
+
+    @staticmethod
+    def write_gif(path, img, gamma=2.2):
+        """
+        Write display values to a GIF file with a fixed 6x7x6 color palette.
+        :param path: Path to the resulting GIF file
+        :param img: (height x width x 3) array
+        :param gamma: Display gamma
+        :return: The file path for the image.
+        """
+        return imgproc.write_animation(path, [img], gamma=gamma)
+
+    @staticmethod
+    def write_animation(path, imgs, delay=50, gamma=2.2):
+        """
+        Write display values to a GIF file with a fixed 6x7x6 color palette, as a looping animation when
+        there is more than one image.
+        :param path: Path to the resulting GIF file
+        :param imgs: List of (height x width x 3) arrays of the same size
+        :param delay: Time each image is shown, in hundredths of a second
+        :param gamma: Display gamma
+        :return: The file path for the image.
+        """
+        levels = np.array([6, 7, 6])
+        r, g, b = np.meshgrid(np.arange(6), np.arange(7), np.arange(6), indexing='ij')
+        palette = np.zeros((256, 3), dtype=np.uint8)
+        palette[:252] = np.round(np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1) * 255.0 / (levels - 1))
+        height, width = imgs[0].shape[:2]
+
+        with open(path, 'wb') as gfile:
+            gfile.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF7, 0, 0))
+            gfile.write(palette.tobytes())
+            if len(imgs) > 1:
+                # loop forever
+                gfile.write(b'!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+            for img in imgs:
+                rgb = imgproc.to_8bit(img, gamma).astype(np.int32)
+                q = (rgb * (levels - 1) + 127) // 255
+                indices = (q[..., 0] * 42 + q[..., 1] * 6 + q[..., 2]).astype(np.uint8)
+                if len(imgs) > 1:
+                    gfile.write(b'!\xf9\x04' + struct.pack('<BHBB', 0, delay, 0, 0))
+                gfile.write(b',' + struct.pack('<HHHHB', 0, 0, width, height, 0))
+                gfile.write(bytes([8]))
+                data = imgproc.lzw(indices.tobytes())
+                for i in range(0, len(data), 255):
+                    block = data[i:i + 255]
+                    gfile.write(bytes([len(block)]) + block)
+                gfile.write(b'\x00')
+            gfile.write(b';')
+        return path
+
+    @staticmethod
+    def export(path, img, gamma=2.2):
+        """
+        Write display values to a GIF or PNG file, chosen by the file extension.
+        :param path: Path to the resulting .gif or .png file
+        :param img: (height x width x 3) array
+        :param gamma: Display gamma
+        :return: The file path for the image.
+        """
+        if os.path.splitext(path)[1].lower() == '.png':
+            return imgproc.write_png(path, img, gamma)
+        return imgproc.write_gif(path, img, gamma)
+
+    @staticmethod
+    def split_pipeline(projpath, inputs, name, colors=None, aa=True, cond=False, fc=None, export=None):
+        """
+        Combine the passes of a split rendering and produce its artifacts in a single in-process
+        pipeline: sum (pcomb), optional tone mapping (pcond -h), anti-aliasing and exposure (pfilt -x /2 -y /2 -r 0.6),
+        optional falsecolor and GIF/PNG export. Only the final images are written.
+        :param projpath: Root directory for the currently running project
+        :param inputs: List of HDR image paths to combine
+        :param name: Name for the resulting images
+        :param colors: [OPTIONAL] (R,G,B) multiplier per input image
+        :param aa: Anti-alias (and halve the size of) the image
+        :param cond: Tone map the image for human visual response
+        :param fc: [OPTIONAL] dict of imgproc.falsecolor keyword arguments, produces <name>_fc.hdr
+        :param export: [OPTIONAL] 'gif' or 'png' to export the final image
+        :return: [combined HDR path, falsecolor HDR path or None, exported path or None]
+        """
+        root = os.path.join(projpath, 'results', 'imageBased')
+        img = imgproc.combine([hdr.read(os.path.join(projpath, i)) for i in inputs], colors)
+        if cond:
+            img = imgproc.tonemap(img)
+        header = []
+        shown = img
+        if aa:
+            img = imgproc.downsample(img)
+            # pfilt exposes the image to an average of 0.5, the falsecolor still uses the simulated values
+            shown, exposure = imgproc.expose(img)
+            header = [f'EXPOSURE={exposure:e}']
+        comb = hdr.write(os.path.join(root, f'{name}.hdr'), shown, header=header)
+        final = shown
+        fcpath = None
+        if fc is not None:
+            final = imgproc.falsecolor(img, **fc)
+            fcpath = hdr.write(os.path.join(root, f'{name}_fc.hdr'), final)
+        exported = None
+        if export is not None:
+            exported = imgproc.export(os.path.join(root, f'{name}{"_fc" if fc else ""}.{export}'), final)
+        return [comb, fcpath, exported]
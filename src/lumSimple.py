@@ -16,6 +16,7 @@ def check_args():
     global _name
     global _model
     global _scene
+    global _row
     global _view
     global _height
     global _width
@@ -24,10 +25,21 @@ def check_args():
     global _tif
     global _unsculpt
     global _show_warnings
+    global _procs
+    global _stream
+    global _progressive
     _unsculpt = True
     for i in range(1, len(sys.argv)):
         if sys.argv[i] == '-w':
             _show_warnings = True
+        if sys.argv[i] == '-prog':
+            _progressive = True
+        if sys.argv[i] == '-pipe':
+            _stream = True
+        if sys.argv[i] == '-np':
+            # number of rendering processes
+            _procs = int(sys.argv[i + 1])
+            i += 1
         if sys.argv[i] == '-gif':
             _gif = True
         if sys.argv[i] == '-t':
@@ -64,6 +76,10 @@ def check_args():
             # name
             _name = sys.argv[i + 1]
             i += 1
+        if sys.argv[i] == '-row':
+            # row of a scalars file with several rows, ie an hour of a daylight schedule
+            _row = sys.argv[i + 1]
+            i += 1
         if sys.argv[i] == '-s':
             # scene
             sn = sys.argv[i + 1]
@@ -80,6 +96,7 @@ def check_args():
 # setup parameters
 _name = 'unknown'
 _scene = 'unknown'
+_row = None
 _view = 'unknown'
 _model = 'unknown'
 _unsculpt = False
@@ -87,6 +104,9 @@ _color = (1.0, 0.808, 0.651)  # 4000K default
 _width = 2560   # after pfilt: 1280
 _height = 1440  # after pfilt:  720
 _show_warnings = False
+_procs = 1
+_stream = False
+_progressive = False
 _gif = False
 _tif = False
 _projPath = pathlib.Path(__file__).parent.parent.resolve()
@@ -108,10 +128,15 @@ if check_args():
     """
     # perform the simulations.
     qual = 'high'
-    lum_files = sculpt.process_ies(_projPath, _scene, _color, "LUM")
+    lum_files = sculpt.process_ies(_projPath, _scene, _color, "LUM", row=_row)
     #print(lum_files)
     oct = sculpt.gen_octree(_projPath, lum_files, 'simModel.oct', baseOct=_model)
-    lum_hdr = sculpt.render_img(_projPath, oct, _view, _name, _width, _height, qual, True, False, _show_warnings)
+    if _progressive:
+        lum_hdr = sculpt.render_progressive(_projPath, oct, _view, _name, _width, _height, qual, False, _show_warnings,
+                                            _procs)
+    else:
+        lum_hdr = sculpt.render_img(_projPath, oct, _view, _name, _width, _height, qual, True, False, _show_warnings,
+                                    _procs, stream=_stream)
     if _gif:
         gif = sculpt.to_gif(_projPath, lum_hdr, os.path.join('results', 'imageBased', f'{_name}.gif'))
 
@@ -131,9 +156,14 @@ else:
     print('\n\t-m model\tName of the octree model being simulated')
     print('\n\t-n name\t\tName for the luminance image file')
     print('\n\t-s scene\tName of the scene being simulated')
+    print('\n\t-row row\tRow of the scene\'s scalars file to use when it has several, ie an hour of a daylight')
+    print('\t\t\tschedule [OPTIONAL]')
     print('\n\t-v name\t\tName of the view file (with/out extension)')
     print('\n\t-c clrtemp\tColor temperature in Kevlin, default 4000K. [OPTIONAL]')
     print('\n\t-x xdim\t\tImage width, default 1280 [OPTIONAL]')
     print('\n\t-y ydim\t\tImage Height, default 720 [OPTIONAL]')
     print('\n\t-gif\t\tExport the HDR image as a GIF. [OPTIONAL]')
+    print('\n\t-prog\t\tRender progressively, updating results\\imageBased\\<name>_preview.hdr with each pass. [OPTIONAL]')
+    print('\n\t-pipe\t\tStream the rendering through pfilt so only the final image is written. [OPTIONAL]')
+    print('\n\t-np procs\tNumber of rendering processes, the image is split into bands. Default 1 [OPTIONAL]')
     print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
@@ -2,10 +2,14 @@ import sys
 import os
 import pathlib
 from sculpt import sculpt
+from daylight import daylight
+from imgproc import imgproc
+from hdr import hdr
 
 
 """
-Perform an Luminance rendering with a CIE sky and no electrical lighting.
+Perform an Luminance rendering with a CIE sky and no electrical lighting. With a weather file it renders a time-lapse
+of a day instead, from the per pixel daylight coefficients of the view (see the daylight class).
 """
 
 
@@ -26,9 +30,38 @@ def check_args():
     global _skytype
     global _timezone
     global _show_warnings
+    global _procs
+    global _weather
+    global _mf
+    global _cie
+    global _png
     for i in range(1, len(sys.argv)):
         if sys.argv[i].lower() == '-w':
             _show_warnings = True
+        if sys.argv[i].lower() == '-np':
+            # number of rendering processes
+            _procs = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i].lower() == '-a':
+            # weather file for a time-lapse
+            wf = sys.argv[i + 1]
+            if not os.path.exists(wf):
+                wf = os.path.join(_projPath, 'weather', wf)
+            if os.path.exists(wf):
+                _weather = wf
+            else:
+                print(f'{wf} doesnt exist')
+            i += 1
+        if sys.argv[i].lower() == '-mf':
+            # sky subdivision
+            _mf = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i].lower() == '-cie':
+            # CIE standard general sky for the time-lapse
+            _cie = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i].lower() == '-png':
+            _png = True
         if sys.argv[i].lower() == '-gif':
             _gif = True
         if sys.argv[i].lower() == '-x':
@@ -106,19 +139,44 @@ _day = 21  # 21st (solstice)
 _hour = 12.50  # 12:30pm
 _skytype = 0  # sunny sky with sun
 _show_warnings = False
+_procs = 1
 _gif = False
+_weather = None
+_mf = 1
+_cie = None
+_png = False
 _projPath = pathlib.Path(__file__).parent.parent.resolve()
 
 
 if check_args():
     qual = "high"
-    # perform the simulations.
-    # generate the sky
-    sky = sculpt.gen_cie_sky(_projPath, _lat, _lon, _timezone, _month, _day, _hour, _skytype)
-    oct = sculpt.gen_octree(_projPath, [sky], 'simModel.oct', baseOct=_model)
-    lum_hdr = sculpt.render_img(_projPath, oct, _view, _name, _width, _height, qual, True, False, _show_warnings)
-    if _gif:
-        gif = sculpt.to_gif(_projPath, lum_hdr, os.path.join('results', 'imageBased', f'{_name}.gif'))
+    if _weather is not None:
+        # the view's daylight coefficients once, then every hour of the day as a weighted sum of them
+        hours, smx = daylight.sky_matrix(_projPath, _weather, _mf, _cie)
+        day = [t for t, h in enumerate(hours) if h.startswith(f"{_month:02}{_day:02}_") and smx[:, t].max() > 0]
+        stack = daylight.image_coefficients(_projPath, _model, _view, _width // 2, _height // 2, _mf, qual, _procs,
+                                            _show_warnings)
+        frames = daylight.frames(stack, smx[:, day])
+        root = os.path.join(_projPath, 'results', 'imageBased')
+        for f, t in enumerate(day):
+            print(hdr.write(os.path.join(root, f'{_name}_{hours[t]}.hdr'), frames[f]))
+        # one mapping for the whole day, so the frames don't flicker and the change in daylight stays visible
+        display = imgproc.tonemap_frames(list(frames)) if _gif or _png else []
+        if _png:
+            for f, img in enumerate(display):
+                # numbered for video encoders, ie ffmpeg -i <name>_%04d.png
+                imgproc.write_png(os.path.join(root, f'{_name}_{f:04}.png'), img)
+        if _gif and len(display) > 0:
+            print(imgproc.write_animation(os.path.join(root, f'{_name}.gif'), display))
+    else:
+        # perform the simulations.
+        # generate the sky
+        sky = sculpt.gen_cie_sky(_projPath, _lat, _lon, _timezone, _month, _day, _hour, _skytype)
+        oct = sculpt.gen_octree(_projPath, [sky], 'simModel.oct', baseOct=_model)
+        lum_hdr = sculpt.render_img(_projPath, oct, _view, _name, _width, _height, qual, True, False, _show_warnings,
+                                    _procs)
+        if _gif:
+            gif = sculpt.to_gif(_projPath, lum_hdr, os.path.join('results', 'imageBased', f'{_name}.gif'))
 
 
 else:
@@ -131,6 +189,7 @@ else:
     print('\t\tpython lumSky.py -n 300lux_3000k -o FullModel -v camera01_fisheye')
     print(
         '\t\tpython lumSky.py -n 0621_1230 -o FullNoSky.oct -lat 32.78332 -lon -96.79769 -m 6 -d 21 -h 12.50 -tz -6 -v Camera03.vf -x 1920 -y 1080 -gif')
+    print('\t\tpython lumSky.py -n solstice -o FullModel -v Camera03 -a USA_NY_New.York-Central.Park.epw -m 6 -d 21 -gif -np 8')
     print('\n\tArguments')
     print('\t===================')
     print('\n\t-o model\tName of the octree model being simulated')
@@ -145,5 +204,12 @@ else:
     print('\n\t-h hour\t\tHour for the point-in-time simulation (0.0-23.99)')
     print('\n\t-x xdim\t\tImage width, default 1280 [OPTIONAL]')
     print('\n\t-y ydim\t\tImage Height, default 720 [OPTIONAL]')
-    print('\n\t-gif\t\tExport the HDR image as a GIF. [OPTIONAL]')
+    print('\n\t-gif\t\tExport the HDR image as a GIF, with -a an animated GIF of the tone mapped frames. [OPTIONAL]')
+    print('\n\t-a weather\tEPW or WEA file (path or name in the weather folder) to render a time-lapse of the daylit hours')
+    print('\t\t\tof the -m month and -d day instead. Per pixel daylight coefficients of the view are computed once')
+    print('\t\t\t(cached in cache\\daylight), then each hour is saved as <name>_<MMDD_HHMM>.hdr. [OPTIONAL]')
+    print('\n\t-cie type\tWith -a, CIE standard general sky (1-15) instead of the Perez all-weather skies [OPTIONAL]')
+    print('\n\t-mf mf\t\tWith -a, Reinhart sky subdivision, default 1 (Tregenza, 145 patches) [OPTIONAL]')
+    print('\n\t-png\t\tWith -a, export the tone mapped frames as <name>_0000.png, ... for video encoding [OPTIONAL]')
+    print('\n\t-np procs\tNumber of rendering processes, the image is split into bands. Default 1 [OPTIONAL]')
     print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
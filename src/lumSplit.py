@@ -2,6 +2,7 @@ import sys
 import os
 import pathlib
 from sculpt import sculpt
+from imgproc import imgproc
 
 
 """
@@ -25,15 +26,23 @@ def check_args():
     global _lgpColor
     global _spotColor
     global _gif
+    global _png
     global _tif
     global _unsculpt
-    global _show_warning
+    global _show_warnings
+    global _procs
     _unsculpt = True
     for i in range(1, len(sys.argv)):
         if sys.argv[i] == '-w':
             _show_warnings = True
+        if sys.argv[i] == '-np':
+            # number of rendering processes
+            _procs = int(sys.argv[i + 1])
+            i += 1
         if sys.argv[i] == '-gif':
             _gif = True
+        if sys.argv[i] == '-png':
+            _png = True
         if sys.argv[i] == '-t':
             _tif = True
         if sys.argv[i] == '-x':
@@ -96,7 +105,9 @@ _spotColor = (1.0, 0.808, 0.651)  # 4000K default
 _width = 2560   # after pfilt: 1280
 _height = 1440  # after pfilt:  720
 _show_warnings = False
+_procs = 1
 _gif = False
+_png = False
 _tif = False
 _projPath = pathlib.Path(__file__).parent.parent.resolve()
 
@@ -117,23 +128,20 @@ if check_args():
 
     # perform the simulations.
     qual = "low"
-    spot_files = sculpt.process_ies(_projPath, _scene, _spotColor, "Spot")
-    oct = sculpt.gen_octree(_projPath, spot_files, 'simModel.oct', baseOct=_model)
-    spot_hdr = sculpt.render_img(_projPath, oct, _view, f'{_name}_Spot', _width, _height, qual, False, False, _show_warnings)
-    lgp_files = sculpt.process_ies(_projPath, _scene, _lgpColor, "LGP")
-    oct = sculpt.gen_octree(_projPath, lgp_files, 'simModel.oct', baseOct=_model)
-    lgp_hdr = sculpt.render_img(_projPath, oct, _view, f'{_name}_LGP', _width, _height, qual, False, False, _show_warnings)
-
-    # combine the spot and lgp HDR files
-    comb = sculpt.comb_img(_projPath, [os.path.join(_projPath, spot_hdr), os.path.join(_projPath, lgp_hdr)], _name, cond=True, aa=True)
-    if _gif:
-        gif = sculpt.to_gif(_projPath, comb, os.path.join('results', 'imageBased', f'{_name}.gif'))
+    # neutral white Spot and LGP passes, rendered concurrently and reused for any color temperatures
+    spot_hdr, lgp_hdr = sculpt.neutral_split(_projPath, _scene, _model, _view, _width, _height, qual, False,
+                                             _show_warnings, _procs)
 
+    # tint, combine, tone map and anti-alias the spot and lgp HDR files in memory
+    export = 'png' if _png else ('gif' if _gif else None)
+    comb = imgproc.split_pipeline(_projPath, [spot_hdr, lgp_hdr], _name, [_spotColor, _lgpColor], aa=True, cond=True,
+                                  export=export)[0]
 
 else:
     print('\nThis command will generate an luminance rendering with HB Radiance commands using split')
     print('IES profiles per luminaire location (spots and light-guide plate). This enables a rendering')
-    print('of a scenario/scene using a varied color temperature for the luminaires.')
+    print('of a scenario/scene using a varied color temperature for the luminaires. The parts are rendered once')
+    print('in neutral white and reused, so running again with other -lgp/-spot values only re-tints the images.')
     print('It is required to pass a baseline Octree model, View file, and a Name. If no Scene name is ')
     print('passed it will use the default unsculpted IES file (all pixels at full power).')
     print('\n\tExample:')
@@ -152,4 +160,6 @@ else:
     print('\n\t-x xdim\t\tImage width, default 1280 [OPTIONAL]')
     print('\n\t-y ydim\t\tImage Height, default 720 [OPTIONAL]')
     print('\n\t-gif\t\tExport the HDR image as a GIF. [OPTIONAL]')
+    print('\n\t-png\t\tExport the HDR image as a PNG. [OPTIONAL]')
+    print('\n\t-np procs\tNumber of rendering processes, the image is split into bands. Default 1 [OPTIONAL]')
     print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
@@ -0,0 +1,239 @@
+import os
+import csv
+import hashlib
+import pathlib
+import numpy as np
+from scipy import sparse
+
+
+class matrix(object):
+    """
+    Class full of static functions to load and save the numeric data used by the
+    sculpting process as NumPy arrays. This covers the contribution matrix, scene
+    definitions, grid-based (RTRACE) results and the resulting scalar schedules.
+
+    Working on arrays rather than lists lets many scenes or hours be handled with
+    a single vectorized operation.
+    """
+
+    @staticmethod
+    def load(matrixPath):
+        """
+        Load a contribution matrix CSV file as produced by genMatrix.py
+        :param matrixPath: File path to the Matrix.csv contribution matrix.
+        :return: [0] The column (control) names\n[1] The matrix as a (sensors x controls) array.
+        """
+        with open(matrixPath) as mtxfile:
+            header = mtxfile.readline().strip().split(',')[1:]
+        mtx = np.genfromtxt(matrixPath, dtype=float, delimiter=",", skip_header=1)[:, 1:]
+        return [header, mtx]
+
+    @staticmethod
+    def load_ids(matrixPath):
+        """
+        Load the sensor ids (first column) of a contribution matrix CSV file.
+        :param matrixPath: File path to the Matrix.csv contribution matrix.
+        :return: list of sensor ids
+        """
+        return list(np.atleast_1d(np.genfromtxt(matrixPath, dtype=str, delimiter=",", skip_header=1, usecols=0)))
+
+    @staticmethod
+    def load_scene(scenarioPath):
+        """
+        Load a scene definition, the desired lux values per the sensor grid.
+        :param scenarioPath: File path to the scenario CSV file.
+        :return: The target illuminance per sensor #type: np.ndarray
+        """
+        return np.genfromtxt(scenarioPath, dtype=float, delimiter=',', skip_header=1)[:, 1:].ravel()
+
+    @staticmethod
+    def read_res(resPath):
+        """
+        Read a grid-based (RTRACE) results file and convert the RGB irradiance values to illuminance.
+        :param resPath: Path to the .res file
+        :return: Illuminance per sensor #type: np.ndarray
+        """
+        rgb = np.loadtxt(resPath, dtype=float, usecols=(0, 1, 2), ndmin=2)
+        return 179.0 * (rgb @ np.array([0.265, 0.67, 0.065]))
+
+    @staticmethod
+    def load_daylight(resPaths):
+        """
+        Read a set of daylight (gridSky) results into a single array. Directories are expanded
+        to every .res file they contain, sorted by name so a day of results stays in time order.
+        Annual results (<name>_annual.npy) add all of their hours.
+        :param resPaths: List of .res file, annual .npy file and/or directory paths
+        :return: [0] The result names\n[1] Illuminance as a (hours x sensors) array.
+        """
+        files = []
+        for path in resPaths:
+            if os.path.isdir(path):
+                for f in sorted(os.listdir(path)):
+                    if f.endswith('.res'):
+                        files.append(os.path.join(path, f))
+            else:
+                files.append(path)
+
+        names = []
+        rows = []
+        for f in files:
+            if f.endswith('.npy'):
+                with np.load(f.replace('.npy', '_info.npz')) as info:
+                    names.extend(str(h) for h in info['hours'])
+                rows.append(np.load(f))
+            else:
+                names.append(os.path.splitext(os.path.basename(f))[0])
+                rows.append(matrix.read_res(f))
+        daylight = np.vstack(rows)
+        return [names, daylight]
+
+    @staticmethod
+    def save_scalars(scalarPath, names, columns, scalars):
+        """
+        Write a set of scalars to a CSV file, one row per scene (or hour).
+        :param scalarPath: Path to the resulting CSV file
+        :param names: Row names, ie the scene or hour #type: list
+        :param columns: Control names from the contribution matrix header #type: list
+        :param scalars: (rows x controls) array of scalars #type: np.ndarray
+        :return: The file path for the scalars.
+        """
+        scalars = np.atleast_2d(scalars)
+        os.makedirs(os.path.dirname(scalarPath), exist_ok=True)
+        with open(scalarPath, 'w') as sfile:
+            sfile.write(",".join(["SCENE"] + list(columns)))
+            for name, row in zip(names, scalars):
+                sfile.write("\n" + ",".join([str(name)] + [f"{v:.6f}" for v in row]))
+        return scalarPath
+
+    @staticmethod
+    def load_scalars(scalarPath):
+        """
+        Read a scalars CSV file written by save_scalars.
+        :param scalarPath: Path to the scalars CSV file
+        :return: [0] Row names\n[1] Control names\n[2] (rows x controls) array of scalars
+        """
+        with open(scalarPath) as sfile:
+            columns = sfile.readline().strip().split(',')[1:]
+        names = list(np.atleast_1d(np.genfromtxt(scalarPath, dtype=str, delimiter=",", skip_header=1, usecols=0)))
+        scalars = np.genfromtxt(scalarPath, dtype=float, delimiter=",", skip_header=1, ndmin=2)[:, 1:]
+        return [names, columns, scalars]
+
+    @staticmethod
+    def parse_indices(text):
+        """
+        Parse a space separated list of indices and inclusive ranges, ie "1-4 7" -> [1, 2, 3, 4, 7]
+        :param text: #type: str
+        :return: #type: list
+        """
+        indices = []
+        for part in text.split():
+            if '-' in part:
+                start, end = part.split('-')
+                indices.extend(range(int(start), int(end) + 1))
+            else:
+                indices.append(int(part))
+        return indices
+
+    @staticmethod
+    def load_groups(groupPath, controls, profiles):
+        """
+        Load a grouping spec that ties luminaires, or subsets of their pixels, to shared control
+        variables. The spec is a CSV file with a header and one row per group:
+            GROUP,LUMINAIRES,PIXELS
+            Zone_A,1-4 7,all
+            Zone_A_Edge,1-4,lgp
+        Luminaires are numbered from 1, as in the sculpted IES file names. Pixels are base profile
+        indices from 0, or 'all', 'lgp' (0-3) or 'spot' (4 and up). Controls that are not in any
+        group keep their own variable.
+        :param groupPath: Path to the grouping spec CSV file
+        :param controls: Number of controls (columns) in the contribution matrix
+        :param profiles: Number of base IES profiles per luminaire
+        :return: [0] The variable names\n[1] The (controls x variables) incidence matrix #type: sparse.csr_matrix
+        """
+        assigned = np.full(controls, -1)
+        names = []
+        with open(groupPath) as gfile:
+            reader = csv.reader(gfile)
+            next(reader)
+            for row in reader:
+                if len(row) == 0 or row[0].strip() == '':
+                    continue
+                pixels = row[2].strip().lower() if len(row) > 2 else 'all'
+                if pixels == 'all':
+                    pixels = range(profiles)
+                elif pixels == 'lgp':
+                    pixels = range(4)
+                elif pixels == 'spot':
+                    pixels = range(4, profiles)
+                else:
+                    pixels = matrix.parse_indices(pixels)
+
+                for lum in matrix.parse_indices(row[1]):
+                    for pix in pixels:
+                        col = (lum - 1) * profiles + pix
+                        if col < 0 or col >= controls or pix >= profiles:
+                            raise ValueError(f"Group {row[0]}: luminaire {lum}, pixel {pix} is not in the matrix")
+                        if assigned[col] >= 0:
+                            raise ValueError(f"Group {row[0]}: luminaire {lum}, pixel {pix} is already in "
+                                             f"group {names[assigned[col]]}")
+                        assigned[col] = len(names)
+                names.append(row[0].strip())
+
+        # every control outside of a group is its own variable
+        for col in np.flatnonzero(assigned < 0):
+            assigned[col] = len(names)
+            names.append(f"L{col // profiles + 1}_P{col % profiles}")
+
+        incidence = sparse.csr_matrix((np.ones(controls), (np.arange(controls), assigned)),
+                                      shape=(controls, len(names)))
+        return [names, incidence]
+
+    @staticmethod
+    def file_hash(path):
+        """
+        Get a SHA-1 hash of a file's contents, used to tell when cached data is out of date.
+        :param path: File path
+        :return: hex digest #type: str
+        """
+        sha = hashlib.sha1()
+        with open(path, 'rb') as hfile:
+            for chunk in iter(lambda: hfile.read(1 << 20), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    @staticmethod
+    def compress(matrixPath, mtx, energy=0.999, groupPath=None, profiles=None):
+        """
+        Compress a contribution matrix with a truncated SVD, A ~ U * diag(s) * Vt, keeping the
+        fewest singular values that hold the requested fraction of the matrix energy (the sum of
+        the squared singular values). The factors are cached next to the matrix file as
+        <matrix>_svd.npz and reused until the matrix or the energy fraction changes.
+        :param matrixPath: File path to the Matrix.csv contribution matrix.
+        :param mtx: The matrix as a (sensors x controls) array.
+        :param energy: Fraction of the energy to keep (0.0 - 1.0)
+        :param groupPath: [OPTIONAL] Grouping spec the matrix was reduced with, cached separately
+        :param profiles: [OPTIONAL] Number of base profiles per luminaire the grouping spec was applied with
+        :return: [0] U (sensors x rank)\n[1] s (rank)\n[2] Vt (rank x controls)\n[3] Relative approximation error
+        """
+        cachePath = os.path.splitext(str(matrixPath))[0] + '_svd.npz'
+        key = matrix.file_hash(matrixPath)
+        if groupPath is not None:
+            cachePath = cachePath.replace('_svd.npz', f'_{pathlib.Path(groupPath).stem}_svd.npz')
+            key += matrix.file_hash(groupPath) + f'_{profiles}'
+        if os.path.exists(cachePath):
+            with np.load(cachePath) as cached:
+                if str(cached['key']) == key and float(cached['energy']) == energy:
+                    return [cached['U'], cached['s'], cached['Vt'], float(cached['error'])]
+
+        U, s, Vt = np.linalg.svd(mtx, full_matrices=False)
+        kept = np.cumsum(s ** 2) / np.sum(s ** 2)
+        rank = min(int(np.searchsorted(kept, energy)) + 1, len(s))
+        # relative Frobenius norm of the discarded part of the matrix
+        error = float(np.sqrt(max(1.0 - kept[rank - 1], 0.0)))
+        U, s, Vt = U[:, :rank], s[:rank], Vt[:rank]
+
+        tmpPath = f"{cachePath}.{os.getpid()}.tmp"
+        with open(tmpPath, 'wb') as cfile:
+            np.savez(cfile, U=U, s=s, Vt=Vt, error=error, key=key, energy=energy)
+        os.replace(tmpPath, cachePath)
+        return [U, s, Vt, error]
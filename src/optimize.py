@@ -1,6 +1,8 @@
 import numpy as np
-from scipy.optimize import lsq_linear, nnls
+from scipy import sparse
+from scipy.optimize import lsq_linear, nnls, linprog
 from ies import ies
+from matrix import matrix
 import os
 import math
 import time
@@ -23,6 +25,79 @@ def time_convert(sec):
     mins = mins % 60
     return "{0}:{1}:{2}".format(int(hours), int(mins), sec)
 
+def solve(mtx, vec, factors=None):
+    """
+    Solve for the scalars that best match a target illuminance using a bounded linear least squares.
+    When the truncated SVD factors of the matrix are given the problem is solved in the reduced
+    space, min ||diag(s) Vt x - Ut b||, which has one row per kept singular value instead of one
+    per sensor. The bounds still apply to the scalars themselves.
+    :param mtx: Contribution matrix as a (sensors x controls) array.
+    :param vec: Target illuminance per sensor.
+    :param factors: [OPTIONAL] [U, s, Vt, error] from matrix.compress
+    :return: The scipy OptimizeResult.
+    """
+    if factors is not None:
+        U, s, Vt = factors[:3]
+        return lsq_linear(s[:, np.newaxis] * Vt, U.T @ vec, bounds=(_minScalar, 1.0), tol=1e-10, max_iter=400)
+    return lsq_linear(mtx, vec, bounds=(_minScalar, 1.0), tol=1e-10, max_iter=400)
+
+def read_matrix(matrixPath):
+    """
+    Read the contribution matrix CSV file, once for all of the scenes.
+    :param matrixPath: File path to the Matrix.csv contribution matrix.
+    :return: [0] The column (control) names\n[1] The matrix as a (sensors x controls) array.
+    """
+    key = ('matrix', str(matrixPath))
+    if key not in _loaded:
+        _loaded[key] = matrix.load(matrixPath)
+    return _loaded[key]
+
+def load_matrix(matrixPath):
+    """
+    Load the contribution matrix. When a grouping spec is used the matrix is reduced to the shared
+    control variables, A x G where G is the (controls x variables) group incidence matrix.
+    :param matrixPath: File path to the Matrix.csv contribution matrix.
+    :return: [0] The (sensors x variables) matrix\n[1] The group incidence matrix or None
+    """
+    key = ('grouped', str(matrixPath))
+    if key in _loaded:
+        return _loaded[key]
+    mtx = read_matrix(matrixPath)[1]
+    if _groups is None:
+        _loaded[key] = [mtx, None]
+        return _loaded[key]
+    groups = matrix.load_groups(_groups, mtx.shape[1], _profiles)[1]
+    print(f"Grouped {groups.shape[0]} controls into {groups.shape[1]} variables")
+    _loaded[key] = [np.asarray(groups.T.dot(mtx.T)).T, groups]
+    return _loaded[key]
+
+def expand(groups, scalars):
+    """
+    Expand scalars solved for grouped control variables back to one scalar per control.
+    :param groups: The group incidence matrix or None
+    :param scalars: (variables) or (rows x variables) array of scalars
+    :return: (controls) or (rows x controls) array of scalars
+    """
+    if groups is None:
+        return scalars
+    return np.asarray(groups.dot(np.asarray(scalars).T)).T
+
+def get_factors(matrixPath, mtx):
+    """
+    Get the compressed matrix factors when a compression energy fraction was requested.
+    :param matrixPath: File path to the Matrix.csv contribution matrix.
+    :param mtx: The matrix as a (sensors x controls) array.
+    :return: [U, s, Vt, error] or None
+    """
+    if _compress is None:
+        return None
+    key = ('factors', str(matrixPath))
+    if key not in _loaded:
+        factors = matrix.compress(matrixPath, mtx, _compress, _groups, _profiles)
+        print(f"Compressed matrix rank: {len(factors[1])} of {min(mtx.shape)} (approximation error {factors[3]:.2e})")
+        _loaded[key] = factors
+    return _loaded[key]
+
 def optimize(matrixPath, scenarioPath):
     """
     Perform the optimization to retrieve the sculpting multipliers
@@ -31,17 +106,20 @@ def optimize(matrixPath, scenarioPath):
     :return: [0] The name of the secene\n[1] The multipliers.
     """
     # load base contribution matrix data
-    mtx = np.genfromtxt(matrixPath, dtype=float, delimiter=",", skip_header=1)[:, 1:]
+    mtx, groups = load_matrix(matrixPath)
     #print(mtx)
 
     # load scene, desired lux values per the sensor grid
     scene = os.path.basename(scenarioPath).replace(".csv", "")
-    vec = np.genfromtxt(scenarioPath, dtype=float, delimiter=',', skip_header=1)[:, 1:].flat
+    vec = matrix.load_scene(scenarioPath)
 
     # optimize using a linear least squares.
-    res = lsq_linear(mtx, vec, bounds=(0.001, 1.0), tol=1e-10, max_iter=400)
+    factors = get_factors(matrixPath, mtx)
+    res = solve(mtx, vec, factors)
+    if factors is not None:
+        print(f"Relative residual: {np.linalg.norm(mtx @ res.x - vec) / np.linalg.norm(vec):.4f}")
     #res = nnls(mtx, vec)
-    scalars = res.x
+    scalars = expand(groups, res.x)
     print(f"nit: {res.cost}")
     #print(f"residual: {res[1]}")
 
@@ -57,6 +135,122 @@ def optimize(matrixPath, scenarioPath):
 
     return [scene, scalars]
 
+def optimize_daylight(matrixPath, scenarioPath, daylightPaths, watts=None):
+    """
+    Perform the optimization for the electric lighting needed to make up the daylight deficit
+    of a scene, once per gridSky result. The deficit is the target minus the daylight, clamped
+    at zero, so sensors already lit by daylight do not ask for any electric light.
+    :param matrixPath: File path to the Matrix.csv contribution matrix.
+    :param scenarioPath: File path to the scenario CSV file this optimization is for
+    :param daylightPaths: List of gridSky .res files and/or directories of them (ie a whole day)
+    :param watts: [OPTIONAL] Input watts per control (see get_watts) to weight the savings by, otherwise every
+                  control counts the same
+    :return: [0] The name of the scene\n[1] The daylight result names\n[2] (hours x controls) scalars
+             \n[3] The scalars without daylight
+    """
+    mtx, groups = load_matrix(matrixPath)
+    scene = os.path.basename(scenarioPath).replace(".csv", "")
+    vec = matrix.load_scene(scenarioPath)
+    hours, daylight = matrix.load_daylight(daylightPaths)
+    if daylight.shape[1] != len(vec):
+        raise ValueError(f"Daylight results have {daylight.shape[1]} sensors, the scene has {len(vec)}")
+
+    # vectorized subtraction and clamping across all hours
+    deficit = np.clip(vec[np.newaxis, :] - daylight, 0.0, None)
+
+    # hours with an identical deficit (ie every night hour) only need to be solved once
+    unique, inverse = np.unique(deficit, axis=0, return_inverse=True)
+    factors = get_factors(matrixPath, mtx)
+    solved = np.empty((len(unique), mtx.shape[1]))
+    for i in range(len(unique)):
+        if unique[i].any():
+            solved[i] = solve(mtx, unique[i], factors).x
+        else:
+            solved[i] = _minScalar
+    scalars = expand(groups, solved[inverse.ravel()])
+
+    full = expand(groups, solve(mtx, vec, factors).x)
+    # power per hour, so luminaires and profiles of different wattage count as much as they draw
+    if watts is None:
+        watts = np.ones(scalars.shape[1])
+    power = scalars @ watts
+    fullPower = full @ watts
+    print(f"Solved {len(hours)} hours with {len(unique)} unique daylight deficits")
+    for name, row, p in zip(hours, scalars, power):
+        print(f"\t{name}\tAverage Scalar: {row.mean():.4f}\tSavings: {1.0 - p / fullPower:.1%}")
+    print(f"Overall Dimming Savings: {1.0 - power.sum() / (fullPower * len(hours)):.1%}")
+
+    return [scene, hours, scalars, full]
+
+def optimize_energy(matrixPath, scenarioPath, watts, maxFactor=None, uniformity=None):
+    """
+    Perform an optimization that minimizes the total luminaire power, the sum of scalar x watts
+    per pixel, while every sensor receives at least the scene illuminance. This is solved as a
+    sparse linear program.
+    :param matrixPath: File path to the Matrix.csv contribution matrix.
+    :param scenarioPath: File path to the scenario CSV file, used as the per sensor minimum
+    :param watts: Input watts per control (column of the matrix), summed per group when grouped #type: np.ndarray
+    :param maxFactor: [OPTIONAL] Sensors may not exceed maxFactor x their target illuminance
+    :param uniformity: [OPTIONAL] Minimum uniformity (min/avg) over the sensors with a target
+    :return: [0] The name of the scene\n[1] The multipliers, None if the problem is infeasible.
+    """
+    mtx, groups = load_matrix(matrixPath)
+    scene = os.path.basename(scenarioPath).replace(".csv", "")
+    vec = matrix.load_scene(scenarioPath)
+    if groups is not None:
+        watts = groups.T.dot(watts)
+    A = sparse.csr_matrix(mtx)
+    lit = vec > 0
+    sensors, controls = A.shape
+
+    # A x >= vec, written as -A x <= -vec
+    A_ub = [-A]
+    b_ub = [-vec]
+    if maxFactor is not None:
+        A_ub.append(A[lit])
+        b_ub.append(vec[lit] * maxFactor)
+
+    # the uniformity constraint uses an extra variable for the average illuminance so that
+    # the constraint rows stay sparse: U * avg - A_i x <= 0 and mean(A x) - avg = 0
+    c = np.asarray(watts, dtype=float)
+    bounds = [(_minScalar, 1.0)] * controls
+    A_eq = None
+    b_eq = None
+    if uniformity is not None:
+        A_ub = [sparse.hstack([a, sparse.csr_matrix((a.shape[0], 1))]) for a in A_ub]
+        A_ub.append(sparse.hstack([-A[lit], sparse.csr_matrix(np.full((lit.sum(), 1), uniformity))]))
+        b_ub.append(np.zeros(lit.sum()))
+        A_eq = sparse.hstack([sparse.csr_matrix(A[lit].mean(axis=0)), sparse.csr_matrix([[-1.0]])])
+        b_eq = np.zeros(1)
+        c = np.append(c, 0.0)
+        bounds.append((0.0, None))
+
+    res = linprog(c, A_ub=sparse.vstack(A_ub, format='csr'), b_ub=np.concatenate(b_ub),
+                  A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs')
+    if res.status != 0:
+        print(f"{scene}: {res.message}")
+        return [scene, None]
+
+    scalars = res.x[:controls]
+    if _verbose:
+        achieved = mtx @ scalars
+        print(f"Min: {achieved[lit].min():.2f}  Avg: {achieved[lit].mean():.2f}  Max: {achieved[lit].max():.2f}")
+    return [scene, expand(groups, scalars)]
+
+def get_watts(baseIes, controls):
+    """
+    Get the input watts for each control (column of the matrix) from the base IES profiles.
+    Profiles without an input watts value are treated as 1 watt.
+    :param baseIes: Array of ies
+    :param controls: Number of controls in the contribution matrix
+    :return: Input watts per control #type: np.ndarray
+    """
+    watts = np.array([b.inputWatts for b in baseIes], dtype=float)
+    if np.isnan(watts).any():
+        print("Warning: base IES profile(s) missing input watts, using 1.0W")
+        watts = np.nan_to_num(watts, nan=1.0)
+    return np.tile(watts, controls // len(baseIes))
+
 def get_base_ies(iesPath):
     """
     Read in the default IES files and convert them to an array of Ies class objects
@@ -187,8 +381,8 @@ def sculpt(baseIes, scalars, scene, sculptPath):
 def check_args():
     if len(sys.argv) <= 1:
         return False
-    global _scene
     global _matrix
+    global _ies
 
     for i in range(1, len(sys.argv)):
         if sys.argv[i] == '-m':
@@ -209,45 +403,146 @@ def check_args():
             sn = os.path.splitext(sys.argv[i + 1])[0]
 
             # check that the scene file actually exists...
-            #stemp = os.path.join(_projPath, 'scenarios', f"{sn}.csv")
-            print(stemp)
+            stemp = os.path.join(_projPath, 'scenarios', f"{sn}.csv")
             if os.path.exists(stemp):
-                _scene = os.path.join('scenarios', f'{sn}.csv')
+                _scenes.append(os.path.join('scenarios', f'{sn}.csv'))
             else:
                 print('s path doesnt exist')
             i += 1
+        if sys.argv[i] == '-d':
+            # daylight results, a gridSky .res file or a directory of them
+            dl = sys.argv[i + 1]
+            if not os.path.exists(dl):
+                dl = os.path.join(_projPath, 'results', 'gridBased', dl)
+                if not os.path.isdir(dl) and not dl.endswith('.res') and not dl.endswith('.npy'):
+                    dl += '.res'
+            if os.path.exists(dl):
+                _daylight.append(dl)
+            else:
+                print('d path doesnt exist')
+            i += 1
+        if sys.argv[i] == '-ies':
+            _ies = True
+        if sys.argv[i] == '-noies':
+            global _noIes
+            _noIes = True
+        if sys.argv[i] == '-g':
+            # grouping spec
+            gn = os.path.splitext(sys.argv[i + 1])[0]
+            gtemp = os.path.join(_projPath, 'scenarios', f"{gn}.csv")
+            if os.path.exists(gtemp):
+                global _groups
+                _groups = gtemp
+            else:
+                print('g path doesnt exist')
+            i += 1
+        if sys.argv[i] == '-r':
+            global _compress
+            _compress = float(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-e':
+            global _energy
+            _energy = True
+        if sys.argv[i] == '-max':
+            global _maxFactor
+            _maxFactor = float(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-u':
+            global _uniformity
+            _uniformity = float(sys.argv[i + 1])
+            i += 1
         if sys.argv[i] == "-v":
             global _verbose
             _verbose = True
-    return _scene != None and _matrix != None
+    return len(_scenes) > 0 and _matrix != None
 
-_scene = None
+_scenes = []
 _matrix = None
 _verbose = False
+_daylight = []
+_ies = False
+_noIes = False
+_energy = False
+_maxFactor = None
+_compress = None
+_groups = None
+_profiles = 0
+_uniformity = None
+_minScalar = 0.001
+# contribution matrices, grouped matrices and compressed factors by matrix path, loaded once for all of the scenes
+_loaded = {}
 _projPath = pathlib.Path(__file__).parent.parent.resolve()
 
 if check_args():
     matrixPath = pathlib.PurePath(_projPath, _matrix)
-    scenePath = pathlib.PurePath(_projPath, _scene)
     baseIesPath = pathlib.PurePath(_projPath, "ies/baseIes")
     sculptIesPath = pathlib.PurePath(_projPath, "ies/sculpted")
-
-    if os.path.exists(matrixPath) and os.path.exists(scenePath) and os.path.exists(baseIesPath):
-        opt_res = optimize(matrixPath, scenePath)
-        baseIes = get_base_ies(baseIesPath)
-        sculpt(baseIes, opt_res[1], opt_res[0], sculptIesPath)
-    else:
-        print(matrixPath)
-        print(scenePath)
-        print(baseIesPath)
+    baseIes = get_base_ies(baseIesPath) if os.path.exists(baseIesPath) else []
+    _profiles = len(baseIes)
+    power = {}
+
+    for _scene in _scenes:
+        scenePath = pathlib.PurePath(_projPath, _scene)
+        if len(_daylight) > 0 and os.path.exists(matrixPath) and os.path.exists(scenePath):
+            columns = read_matrix(matrixPath)[0]
+            watts = get_watts(baseIes, len(columns)) if len(baseIes) > 0 else None
+            scene, hours, scalars, full = optimize_daylight(matrixPath, scenePath, _daylight, watts)
+            schedPath = os.path.join(os.path.dirname(matrixPath), 'scalars', f'{scene}_daylight.csv')
+            matrix.save_scalars(schedPath, [scene] + hours, columns, np.vstack([full, scalars]))
+            print(schedPath)
+            if _ies:
+                for h in range(len(hours)):
+                    sculpt(baseIes, scalars[h], f'{scene}_{hours[h]}', sculptIesPath)
+        elif os.path.exists(matrixPath) and os.path.exists(scenePath) and len(baseIes) > 0:
+            watts = get_watts(baseIes, len(read_matrix(matrixPath)[0]))
+            if _energy:
+                opt_res = optimize_energy(matrixPath, scenePath, watts, _maxFactor, _uniformity)
+                if opt_res[1] is None:
+                    continue
+            else:
+                opt_res = optimize(matrixPath, scenePath)
+            power[opt_res[0]] = float(watts @ opt_res[1])
+            scalarPath = os.path.join(os.path.dirname(matrixPath), 'scalars', f'{opt_res[0]}.csv')
+            matrix.save_scalars(scalarPath, [opt_res[0]], read_matrix(matrixPath)[0], opt_res[1])
+            if not _noIes:
+                sculpt(baseIes, opt_res[1], opt_res[0], sculptIesPath)
+        else:
+            print(matrixPath)
+            print(scenePath)
+            print(baseIesPath)
+
+    if len(power) > 0:
+        print("\nLuminaire Power")
+        for scene in power:
+            print(f"\t{scene}\t{power[scene]:.2f}W")
 else:
     print('\nThis command will sculpt lighting per a specified scene, resulting in new IES files')
+    print('and a scenarios\\scalars\\<scene>.csv file of the multipliers for predict.py')
     print('\n\tMake sure you pass the contribution matrix to this function using the "-m" flag')
     print('\tand the scene using the -s flag.')
     print('\n\tExample:')
     print('\t\tpython optimize.py -m Matrix -s Scene_300lux')
+    print('\t\tpython optimize.py -m Matrix -s Scene_300lux -d 0621_1230 -d June21')
+    print('\t\tpython optimize.py -m Matrix -s Scene_300lux -s Scene_Table@200 -e -max 1.5 -u 0.7')
+    print('\t\tpython optimize.py -m Matrix -s Scene_300lux -g Zones')
     print('\n\tArguments')
     print('\t===============')
     print('\n\t-m matrix\tFile name, with or without extension, for an existing contribution matrix CSV file')
-    print('\n\t-s scene\tFile name, with or without extension, for an existing scene defintion CSV file')
+    print('\n\t-s scene\tFile name, with or without extension, for an existing scene defintion CSV file.')
+    print('\t\t\tCan be passed multiple times to sculpt several scenes in one run.')
+    print('\n\t-d daylight\tgridSky .res file, directory of them (ie a whole day) or annual .npy file. The electric lights are')
+    print('\t\t\tsolved for the daylight deficit of each result and the schedule is saved to')
+    print('\t\t\tscenarios\\scalars\\<scene>_daylight.csv. Can be passed multiple times. [OPTIONAL]')
+    print('\n\t-e\t\tMinimize the total luminaire power (scalar x IES input watts) with the scene as the')
+    print('\t\t\tminimum illuminance per sensor instead of matching the scene. [OPTIONAL]')
+    print('\n\t-max factor\tWith -e, limit each sensor to factor x its scene illuminance. [OPTIONAL]')
+    print('\n\t-u ratio\tWith -e, minimum uniformity (min/avg) of the lit sensors. [OPTIONAL]')
+    print('\n\t-g groups\tFile name of a grouping spec CSV file in the scenarios directory that ties')
+    print('\t\t\tluminaires or pixel subsets to shared control variables, one row per group:')
+    print('\t\t\tGROUP,LUMINAIRES,PIXELS  ie  Zone_A,1-4 7,all  or  Zone_A_Edge,1-4,lgp [OPTIONAL]')
+    print('\n\t-r energy\tSolve using a truncated SVD of the matrix that keeps this fraction of its energy,')
+    print('\t\t\tie 0.999. The factors are cached next to the matrix. Not used with -e. [OPTIONAL]')
+    print('\n\t-ies\t\tWith -d, also write sculpted IES files for each daylight result. [OPTIONAL]')
+    print('\n\t-noies\t\tOnly save the scalars, without writing sculpted IES files. The render scripts build')
+    print('\t\t\tthe luminaires straight from scenarios\\scalars\\<scene>.csv either way. [OPTIONAL]')
 
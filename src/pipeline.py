@@ -0,0 +1,342 @@
+import os
+import sys
+import glob
+import json
+import fnmatch
+import hashlib
+import pathlib
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from cache import cache
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        # Python < 3.11
+        import tomli as tomllib
+    except ImportError as e:
+        raise ImportError('\nFailed to import a TOML parser, install tomli for Python < 3.11:\n\t{}'.format(e))
+
+
+class pipeline(object):
+    """
+    Class full of static functions to run the Sculpt scripts as a make-like pipeline described in a TOML file.
+
+    Each stage runs one of the scripts in this directory with its arguments and lists the project files it
+    reads and writes (paths relative to the project, glob patterns allowed):
+
+        [stages.octree]
+        script = "genOctree.py"
+        args = ["-n", "FullModel"]
+        inputs = ["model.rad", "materials.rad", "objects/*.rad", "skies/0_Lux.sky"]
+        outputs = ["octrees/FullModel.oct"]
+
+        [stages.scene]
+        script = "optimize.py"
+        args = ["-m", "ContributionMatrix", "-s", "Scene_300Lux"]
+        inputs = ["scenarios/ContributionMatrix.csv", "scenarios/Scene_300Lux.csv"]
+        outputs = ["scenarios/scalars/Scene_300Lux.csv"]
+        after = ["matrix"]
+
+    A stage depends on the stages listed in 'after' and on any stage with an output that one of its inputs
+    matches. A stage is stale when an output is missing or the hash of its script, arguments and input file
+    contents differs from its last successful run, which is kept in cache/pipeline/<spec>.json. Only stale
+    stages and the stages after them run, and stages that don't depend on each other run in parallel. A run
+    only succeeds when it writes every output again, and a stage with a missing input fails.
+    """
+
+    @staticmethod
+    def load(specPath):
+        """
+        Read the stages of a pipeline spec.
+        :param specPath: Path to the TOML spec
+        :return: dict of stage name: stage dict (script, args, inputs, outputs, after)
+        """
+        with open(specPath, 'rb') as sfile:
+            spec = tomllib.load(sfile)
+        stages = {}
+        for name, stage in spec.get('stages', {}).items():
+            if 'script' not in stage:
+                raise ValueError(f"Stage '{name}' has no script")
+            stages[name] = {'script': stage['script'],
+                            'args': [str(a) for a in stage.get('args', [])],
+                            'inputs': list(stage.get('inputs', [])),
+                            'outputs': list(stage.get('outputs', [])),
+                            'after': list(stage.get('after', []))}
+            for dep in stages[name]['after']:
+                if dep not in spec['stages']:
+                    raise ValueError(f"Stage '{name}' is after an unknown stage '{dep}'")
+        return stages
+
+    @staticmethod
+    def dependencies(stages):
+        """
+        Find the stages each stage has to wait for.
+        :param stages: Stages from pipeline.load
+        :return: dict of stage name: set of stage names
+        """
+        deps = {}
+        for name, stage in stages.items():
+            deps[name] = set(stage['after'])
+            for other, prev in stages.items():
+                if other == name:
+                    continue
+                for out in prev['outputs']:
+                    if any(out == inp or fnmatch.fnmatch(out, inp) or fnmatch.fnmatch(inp, out)
+                           for inp in stage['inputs']):
+                        deps[name].add(other)
+        return deps
+
+    @staticmethod
+    def order(stages, deps, targets=None):
+        """
+        Sort the stages so that each comes after the stages it depends on.
+        :param stages: Stages from pipeline.load
+        :param deps: Dependencies from pipeline.dependencies
+        :param targets: [OPTIONAL] Only the stages needed for these stages
+        :return: list of stage names
+        """
+        result = []
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"The pipeline has a cycle: {' -> '.join(path + [name])}")
+            state[name] = 'visiting'
+            for dep in sorted(deps[name]):
+                visit(dep, path + [name])
+            state[name] = 'done'
+            result.append(name)
+
+        for name in (targets if targets else stages):
+            if name not in stages:
+                raise ValueError(f"Unknown stage '{name}'")
+            visit(name, [])
+        return result
+
+    @staticmethod
+    def expand(projpath, patterns):
+        """
+        Get the project files matching a list of paths or glob patterns.
+        :param projpath: Root directory for the project
+        :param patterns: Paths relative to the project, glob patterns allowed
+        :return: Sorted list of relative file paths, and the patterns that didn't match anything
+        """
+        files = set()
+        missing = []
+        for pattern in patterns:
+            found = [os.path.relpath(f, projpath) for f in glob.glob(os.path.join(projpath, pattern), recursive=True)
+                     if os.path.isfile(f)]
+            if len(found) == 0:
+                missing.append(pattern)
+            files.update(found)
+        return [sorted(files), missing]
+
+    @staticmethod
+    def command(stage):
+        """
+        Get the command line of a stage.
+        :param stage: Stage dict
+        :return: list of command arguments
+        """
+        script = os.path.join(pathlib.Path(__file__).parent.resolve(), stage['script'])
+        return [sys.executable, script] + stage['args']
+
+    @staticmethod
+    def stage_key(projpath, stage):
+        """
+        Hash a stage's script, arguments and input file contents.
+        :param projpath: Root directory for the project
+        :param stage: Stage dict
+        :return: hex digest #type: str
+        """
+        sha = hashlib.sha1()
+        script = pipeline.command(stage)[1]
+        sha.update(cache.octree_hash(script).encode() if os.path.exists(script) else script.encode())
+        sha.update(json.dumps(stage['args']).encode())
+        files = pipeline.expand(projpath, stage['inputs'])[0]
+        for f in files:
+            sha.update(f.replace('\\', '/').encode())
+            sha.update(cache.octree_hash(os.path.join(projpath, f)).encode())
+        return sha.hexdigest()
+
+    @staticmethod
+    def stale(projpath, name, stage, state):
+        """
+        Check whether a stage needs to run. A stage can't run without its inputs, so a missing input is an error.
+        :param projpath: Root directory for the project
+        :param name: Stage name
+        :param stage: Stage dict
+        :param state: Stage keys of the last successful runs
+        :return: The reason it needs to run, or None when it is up to date.
+        """
+        missing = pipeline.expand(projpath, stage['inputs'])[1]
+        if len(missing) > 0:
+            raise FileNotFoundError(f"missing input {missing[0]}")
+        missing = pipeline.expand(projpath, stage['outputs'])[1]
+        if len(missing) > 0:
+            return f"missing output {missing[0]}"
+        if name not in state:
+            return "never run"
+        if state[name] != pipeline.stage_key(projpath, stage):
+            return "inputs changed"
+        return None
+
+    @staticmethod
+    def not_updated(projpath, stage, start):
+        """
+        Find an output a run of a stage didn't write. The scripts don't report failures with their return code,
+        so a failed run is only seen in outputs left over from an earlier run.
+        :param projpath: Root directory for the project
+        :param stage: Stage dict
+        :param start: Time the run started
+        :return: The first output pattern without a file written since the start, or None.
+        """
+        for pattern in stage['outputs']:
+            files = pipeline.expand(projpath, [pattern])[0]
+            # allow for file systems with a coarse modification time
+            if len(files) == 0 or max(os.path.getmtime(os.path.join(projpath, f)) for f in files) < start - 2:
+                return pattern
+        return None
+
+    @staticmethod
+    def state_path(projpath, specPath):
+        """
+        Get the file path of the stage keys of a pipeline.
+        :param projpath: Root directory for the project
+        :param specPath: Path to the TOML spec
+        :return: The state file path.
+        """
+        return os.path.join(cache.get_dir(projpath, 'pipeline'), f"{pathlib.Path(specPath).stem}.json")
+
+    @staticmethod
+    def load_state(statePath):
+        """
+        Read the stage keys of the last successful runs.
+        :param statePath: State file path
+        :return: dict of stage name: key
+        """
+        if not os.path.exists(statePath):
+            return {}
+        with open(statePath) as sfile:
+            return json.load(sfile)
+
+    @staticmethod
+    def save_state(statePath, name, key):
+        """
+        Record a successful run of a stage, merging with any other runs of the pipeline.
+        :param statePath: State file path
+        :param name: Stage name
+        :param key: Stage key from pipeline.stage_key
+        """
+        with cache.lock(statePath):
+            state = pipeline.load_state(statePath)
+            state[name] = key
+            tmpPath = f"{statePath}.{os.getpid()}.tmp"
+            with open(tmpPath, 'w') as sfile:
+                json.dump(state, sfile, indent=2)
+            os.replace(tmpPath, statePath)
+
+    @staticmethod
+    def run(projpath, specPath, targets=None, jobs=1, dry=False, force=False):
+        """
+        Run the stale stages of a pipeline.
+        :param projpath: Root directory for the project
+        :param specPath: Path to the TOML spec
+        :param targets: [OPTIONAL] Only run the stages needed for these stages
+        :param jobs: Number of stages run at once
+        :param dry: Only print the stages that would run and their commands
+        :param force: Run every stage, stale or not
+        :return: True when every stage is up to date or ran successfully.
+        """
+        stages = pipeline.load(specPath)
+        deps = pipeline.dependencies(stages)
+        names = pipeline.order(stages, deps, targets)
+        statePath = pipeline.state_path(projpath, specPath)
+        state = {} if force else pipeline.load_state(statePath)
+
+        if dry:
+            # a stage after one that runs will see new inputs, so it runs too
+            will = set()
+            ok = True
+            for name in names:
+                after = sorted(deps[name] & will)
+                if force:
+                    reason = "forced"
+                elif len(after) > 0:
+                    # its inputs may not exist until the stages before it run
+                    reason = f"after {', '.join(after)}"
+                else:
+                    try:
+                        reason = pipeline.stale(projpath, name, stages[name], state)
+                    except FileNotFoundError as e:
+                        print(f"[failed] {name}, {e}")
+                        ok = False
+                        continue
+                if reason is None:
+                    print(f"[up to date] {name}")
+                    continue
+                will.add(name)
+                print(f"[run] {name} ({reason})")
+                print("\t" + subprocess.list2cmdline(pipeline.command(stages[name])))
+            return ok
+
+        done = set()
+        ran = set()
+        failed = set()
+        running = {}
+        starts = {}
+        pending = list(names)
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            while len(pending) > 0 or len(running) > 0:
+                for name in list(pending):
+                    if len(deps[name] - done - failed) > 0:
+                        continue
+                    pending.remove(name)
+                    if deps[name] & failed:
+                        print(f"[skipped] {name}, after failed {', '.join(sorted(deps[name] & failed))}")
+                        failed.add(name)
+                        continue
+                    # checked now, after the stages it depends on have written its inputs
+                    try:
+                        reason = pipeline.stale(projpath, name, stages[name], state)
+                    except FileNotFoundError as e:
+                        print(f"[failed] {name}, {e}")
+                        failed.add(name)
+                        continue
+                    if force:
+                        reason = "forced"
+                    after = sorted(deps[name] & ran)
+                    if reason is None and len(after) > 0:
+                        reason = f"after {', '.join(after)}"
+                    if reason is None:
+                        print(f"[up to date] {name}")
+                        done.add(name)
+                        continue
+                    print(f"[run] {name} ({reason})")
+                    ran.add(name)
+                    cmd = pipeline.command(stages[name])
+                    starts[name] = time.time()
+                    running[pool.submit(subprocess.run, cmd, cwd=projpath)] = name
+                if len(running) == 0:
+                    continue
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if future.result().returncode != 0:
+                        print(f"[failed] {name}, return code {future.result().returncode}")
+                        failed.add(name)
+                        continue
+                    missing = pipeline.not_updated(projpath, stages[name], starts[name])
+                    if missing is not None:
+                        print(f"[failed] {name}, output {missing} not written")
+                        failed.add(name)
+                        continue
+                    pipeline.save_state(statePath, name, pipeline.stage_key(projpath, stages[name]))
+                    print(f"[done] {name}")
+                    done.add(name)
+        return len(failed) == 0
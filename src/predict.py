@@ -0,0 +1,182 @@
+import numpy as np
+from matrix import matrix
+import os
+import sys
+import warnings
+import pathlib
+
+
+"""
+Predict the illuminance on the sensor grid for one or more sculpted scenes directly from the contribution
+matrix and the scalars saved by optimize.py (matrix @ scalars). This validates many scenes in a fraction of a
+second, leaving the Radiance simulations (illum*/lum* scripts) for the final confirmation.
+"""
+
+
+def predict(mtx, scalars):
+    """
+    Compute the illuminance for a set of scalars.
+    :param mtx: Contribution matrix as a (sensors x controls) array.
+    :param scalars: (scenes x controls) array of scalars
+    :return: (scenes x sensors) array of illuminance
+    """
+    return np.atleast_2d(scalars) @ mtx.T
+
+
+def summarize(lux, targets, tolerance):
+    """
+    Summarize the predicted illuminance per scene, vectorized across all of the scenes.
+    Sensors with a target of zero are excluded from the uniformity and tolerance statistics.
+    The error statistics are NaN for scenes without a target.
+    :param lux: (scenes x sensors) array of predicted illuminance
+    :param targets: (scenes x sensors) array of target illuminance, NaN when the target is unknown
+    :param tolerance: Fraction of the target a sensor can be off by and still count as within tolerance
+    :return: dict of statistic name to a (scenes) array
+    """
+    lit = targets > 0
+    # scenes without a scene definition use every sensor for the uniformity
+    known = ~np.isnan(targets).all(axis=1, keepdims=True)
+    litLux = np.where(lit | ~known, lux, np.nan)
+    avg = lux.mean(axis=1)
+    error = lux - targets
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        within = np.where(lit, np.abs(error) <= tolerance * targets, np.nan)
+        stats = {
+            'MIN': lux.min(axis=1),
+            'AVG': avg,
+            'MAX': lux.max(axis=1),
+            'UNIFORMITY': np.nanmin(litLux, axis=1) / np.nanmean(litLux, axis=1),
+            'RMSE': np.sqrt(np.mean(error ** 2, axis=1)),
+            'WITHIN_TOL': 100.0 * np.nanmean(within, axis=1),
+        }
+    return stats
+
+
+def get_targets(names, sensors):
+    """
+    Find the target illuminance for each scene from its scene definition CSV file.
+    :param names: Scene names #type: list
+    :param sensors: Number of sensors in the matrix
+    :return: (scenes x sensors) array, NaN where no scene definition exists
+    """
+    targets = np.full((len(names), sensors), np.nan)
+    for i, name in enumerate(names):
+        scenePath = os.path.join(_projPath, 'scenarios', f'{name}.csv')
+        if os.path.exists(scenePath):
+            targets[i] = matrix.load_scene(scenePath)
+    return targets
+
+
+def check_args():
+    if len(sys.argv) <= 1:
+        return False
+    global _matrix
+    global _name
+    global _tolerance
+    global _binary
+
+    for i in range(1, len(sys.argv)):
+        if sys.argv[i] == '-m':
+            # Matrix file
+            mtx = os.path.splitext(sys.argv[i + 1])[0]
+            mtemp = os.path.join(_projPath, 'scenarios', f"{mtx}.csv")
+            if os.path.exists(mtemp):
+                _matrix = mtemp
+            else:
+                print('m path doesnt exist')
+            i += 1
+        if sys.argv[i] == '-s':
+            # scalars saved by optimize.py
+            sn = os.path.splitext(sys.argv[i + 1])[0]
+            stemp = os.path.join(_projPath, 'scenarios', 'scalars', f"{sn}.csv")
+            if os.path.exists(stemp):
+                _scalars.append(stemp)
+            else:
+                print(f'{stemp} doesnt exist')
+            i += 1
+        if sys.argv[i] == '-n':
+            _name = sys.argv[i + 1]
+            i += 1
+        if sys.argv[i] == '-t':
+            _tolerance = float(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-b':
+            _binary = True
+    return _matrix is not None and len(_scalars) > 0
+
+
+_matrix = None
+_scalars = []
+_name = 'predict'
+_tolerance = 0.1
+_binary = False
+_projPath = pathlib.Path(__file__).parent.parent.resolve()
+
+if check_args():
+    columns, mtx = matrix.load(_matrix)
+    ids = matrix.load_ids(_matrix)
+
+    names = []
+    scalars = []
+    for scalarPath in _scalars:
+        rows, cols, values = matrix.load_scalars(scalarPath)
+        if cols != columns:
+            print(f'{scalarPath} does not match the columns of the matrix, skipping')
+            continue
+        names.extend(rows)
+        scalars.append(values)
+    if len(scalars) == 0:
+        print(f'None of the scalars files match the columns of {_matrix}, nothing to predict')
+        sys.exit(1)
+    scalars = np.vstack(scalars)
+
+    lux = predict(mtx, scalars)
+    targets = get_targets(names, len(ids))
+    stats = summarize(lux, targets, _tolerance)
+
+    resDir = os.path.join(_projPath, 'results', 'gridBased')
+    os.makedirs(resDir, exist_ok=True)
+    if _binary:
+        outPath = os.path.join(resDir, f'{_name}_predict.npz')
+        np.savez(outPath, scenes=np.array(names), sensors=np.array(ids), lux=lux, error=lux - targets,
+                 **{k.lower(): v for k, v in stats.items()})
+    else:
+        outPath = os.path.join(resDir, f'{_name}_predict.csv')
+        header = ['SENSOR_ID']
+        for name in names:
+            header.extend([f'{name}_LUX', f'{name}_ERR'])
+        data = np.empty((len(ids), 2 * len(names)))
+        data[:, 0::2] = lux.T
+        data[:, 1::2] = (lux - targets).T
+        with open(outPath, 'w') as pfile:
+            pfile.write(",".join(header))
+            for sensor, row in zip(ids, data):
+                pfile.write("\n" + ",".join([sensor] + [f"{v:.2f}" for v in row]))
+
+        sumPath = os.path.join(resDir, f'{_name}_summary.csv')
+        with open(sumPath, 'w') as sfile:
+            sfile.write(",".join(['SCENE'] + list(stats.keys())))
+            for i, name in enumerate(names):
+                sfile.write("\n" + ",".join([name] + [f"{stats[k][i]:.4f}" for k in stats]))
+        print(sumPath)
+    print(outPath)
+
+    print(f"\n{'SCENE':<32}{'MIN':>10}{'AVG':>10}{'MAX':>10}{'U0':>8}{'RMSE':>10}{'IN TOL':>9}")
+    for i, name in enumerate(names):
+        print(f"{name:<32}{stats['MIN'][i]:>10.1f}{stats['AVG'][i]:>10.1f}{stats['MAX'][i]:>10.1f}"
+              f"{stats['UNIFORMITY'][i]:>8.2f}{stats['RMSE'][i]:>10.1f}{stats['WITHIN_TOL'][i]:>8.1f}%")
+else:
+    print('\nThis command will predict the sensor grid illuminance of sculpted scenes from the contribution matrix')
+    print('and the scalars saved by optimize.py, without running a Radiance simulation. It reports per sensor')
+    print('illuminance and error plus min/avg/max, uniformity (min/avg) and the percent of sensors within tolerance.')
+    print('\n\tExample:')
+    print('\t\tpython predict.py -m Matrix -s Scene_300lux -s Scene_Table@200')
+    print('\t\tpython predict.py -m Matrix -s Scene_300lux_daylight -n June21 -t 0.05 -b')
+    print('\n\tArguments')
+    print('\t===============')
+    print('\n\t-m matrix\tFile name, with or without extension, for an existing contribution matrix CSV file')
+    print('\n\t-s scalars\tFile name of a scalars CSV file in scenarios\\scalars. Can be passed multiple times.')
+    print('\n\t-n name\t\tName for the results files, default "predict" [OPTIONAL]')
+    print('\n\t-t tol\t\tFraction of the target illuminance counted as within tolerance, default 0.1 [OPTIONAL]')
+    print('\n\t-b\t\tSave the results as a binary NumPy (.npz) file instead of CSV [OPTIONAL]')
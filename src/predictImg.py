@@ -0,0 +1,100 @@
+import sys
+import os
+import pathlib
+import numpy as np
+from basis import basis
+from hdr import hdr
+from matrix import matrix
+from sculpt import sculpt
+
+
+"""
+Produce the image of one or more sculpted scenes from an image-based contribution basis (genBasis.py) and the
+scalars saved by optimize.py. Each image is a weighted sum of the basis images, so no Radiance simulation is run.
+"""
+
+
+def check_args():
+    if len(sys.argv) <= 1:
+        return False
+    global _basis
+    global _pal
+    global _gif
+    global _scale
+    for i in range(1, len(sys.argv)):
+        if sys.argv[i] == '-b':
+            # basis name
+            bn = sys.argv[i + 1]
+            if os.path.exists(basis.get_paths(_projPath, bn)[0]):
+                _basis = bn
+            else:
+                print('b path doesnt exist')
+            i += 1
+        if sys.argv[i] == '-s':
+            # scalars saved by optimize.py
+            sn = os.path.splitext(sys.argv[i + 1])[0]
+            stemp = os.path.join(_projPath, 'scenarios', 'scalars', f"{sn}.csv")
+            if os.path.exists(stemp):
+                _scalars.append(stemp)
+            else:
+                print(f'{stemp} doesnt exist')
+            i += 1
+        if sys.argv[i] == '-gif':
+            _gif = True
+        if sys.argv[i] == '-fs':
+            _scale = float(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-p':
+            # palette
+            valid_palettes = ['def', 'pm3d', 'tbo', 'spec', 'hot', 'eco']
+            pal = sys.argv[i + 1]
+            if pal in valid_palettes:
+                _pal = pal
+            i += 1
+    return _basis is not None and len(_scalars) > 0
+
+
+_basis = None
+_scalars = []
+_pal = 'def'
+_gif = False
+_scale = 500
+_projPath = pathlib.Path(__file__).parent.parent.resolve()
+
+if check_args():
+    info, stack = basis.load(_projPath, _basis)
+    columns = [str(c) for c in info['columns']]
+    illum = bool(info['illum'])
+
+    for scalarPath in _scalars:
+        names, cols, scalars = matrix.load_scalars(scalarPath)
+        if cols != columns:
+            print(f'{scalarPath} does not match the controls of the basis, skipping')
+            continue
+        weights = basis.channel_scalars(info['incidence'], scalars)
+        for name, w in zip(names, weights):
+            img = basis.combine(stack, w)
+            hdrpath = os.path.join(_projPath, 'results', 'imageBased', f'{name}_{_basis}.hdr')
+            hdr.write(hdrpath, img)
+            print(hdrpath)
+            if illum:
+                fcpath = hdrpath.replace('.hdr', '_fc.hdr')
+                sculpt.to_falsecolor(_projPath, hdrpath, fcpath, _pal, _scale, img.shape[1] * 0.05, img.shape[0] * 0.2)
+                hdrpath = fcpath
+            if _gif:
+                sculpt.to_gif(_projPath, hdrpath, hdrpath.replace('.hdr', '.gif'))
+else:
+    print('\nThis command will produce the images of sculpted scenes from an image-based contribution basis')
+    print('rendered by genBasis.py and the scalars saved by optimize.py. Each image is a weighted sum of the')
+    print('basis images, so it takes seconds rather than a new rendering. Every row of a scalars file (ie each')
+    print('hour of a daylight schedule) produces an image. Illuminance bases are also converted to falsecolor.')
+    print('\n\tExample:')
+    print('\t\tpython predictImg.py -b camera01 -s Scene_300lux -s Scene_Table@200')
+    print('\t\tpython predictImg.py -b camera03_illum -s Scene_300lux_daylight -p spec -fs 1000 -gif')
+    print('\n\tArguments')
+    print('\t===============')
+    print('\n\t-b basis\tName of a basis rendered by genBasis.py')
+    print('\n\t-s scalars\tFile name of a scalars CSV file in scenarios\\scalars. Can be passed multiple times.')
+    print('\n\t-p pal\t\tFalse color palette, default "def". [OPTIONAL]')
+    print('\n\t-fs scale\tMax legend value of the falsecolor image, default 500 [OPTIONAL]')
+    print('\n\t-gif\t\tExport the HDR image as a GIF. [OPTIONAL]')
@@ -0,0 +1,92 @@
+import sys
+import os
+import pathlib
+from sculpt import sculpt
+
+
+"""
+Prewarm the managed ambient cache (cache\\ambient) of an octree for a set of views. The later renders of those views,
+and of any other view or resolution of the same octree, reuse the indirect irradiance instead of recalculating it.
+"""
+
+
+def check_args():
+    if len(sys.argv) <= 1:
+        return False
+    global _model
+    global _qual
+    global _illum
+    global _width
+    global _height
+    global _clear
+    global _show_warnings
+    for i in range(1, len(sys.argv)):
+        if sys.argv[i] == '-w':
+            _show_warnings = True
+        if sys.argv[i] == '-i':
+            _illum = True
+        if sys.argv[i] == '-low':
+            _qual = 'low'
+        if sys.argv[i] == '-clear':
+            _clear = True
+        if sys.argv[i] == '-x':
+            _width = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-y':
+            _height = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-v':
+            # View file
+            vn = os.path.splitext(sys.argv[i + 1])[0]
+            # check that the view actually exists...
+            vtemp = os.path.join(_projPath, 'views', f"{vn}.vf")
+            if os.path.exists(vtemp):
+                _views.append(os.path.join('views', f"{vn}.vf"))
+            else:
+                print(f'{vtemp} doesnt exist')
+            i += 1
+        if sys.argv[i] == '-m':
+            # octree file
+            oct = os.path.splitext(sys.argv[i + 1])[0]
+            otemp = os.path.join(_projPath, 'octrees', f"{oct}.oct")
+            if os.path.exists(otemp):
+                _model = os.path.join('octrees', f'{oct}.oct')
+            i += 1
+    return _clear or (_model != 'unknown' and len(_views) > 0)
+
+
+_model = 'unknown'
+_views = []
+_qual = 'high'
+_illum = False
+_clear = False
+_width = 320
+_height = 180
+_show_warnings = False
+_projPath = pathlib.Path(__file__).parent.parent.resolve()
+
+if check_args():
+    if _clear:
+        from cache import cache
+        print(f"Removed {cache.clear(_projPath)} ambient files")
+    if _model != 'unknown' and len(_views) > 0:
+        amb = sculpt.prewarm(_projPath, _model, _views, _qual, _illum, _width, _height, _show_warnings)
+        print(amb)
+else:
+    print('\nThis command will prewarm the shared ambient cache of an octree for a set of views. The octree')
+    print('is rendered at a low resolution from every view, concurrently, to fill in the indirect irradiance')
+    print('that later renders and grid-based sims of the same octree and quality will reuse. The cache is keyed')
+    print('by the octree contents and ambient parameters, so a changed model gets a new cache.')
+    print('\n\tExample:')
+    print('\t\tpython prewarm.py -m simModel -v camera01_fisheye -v Camera03')
+    print('\t\tpython prewarm.py -clear')
+    print('\n\tArguments')
+    print('\t===================')
+    print('\n\t-m model\tName of the octree being rendered')
+    print('\n\t-v name\t\tName of a view file (with/out extension). Can be passed multiple times.')
+    print('\n\t-low\t\tPrewarm for the low quality settings. [OPTIONAL]')
+    print('\n\t-i\t\tPrewarm with illuminance (irradiance) renders. [OPTIONAL]')
+    print('\n\t-x xdim\t\tPrewarm image width, default 320 [OPTIONAL]')
+    print('\n\t-y ydim\t\tPrewarm image Height, default 180 [OPTIONAL]')
+    print('\n\t-clear\t\tRemove the unlocked ambient files from the cache. [OPTIONAL]')
+    print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
@@ -0,0 +1,160 @@
+import sys
+import os
+import pathlib
+from sculpt import sculpt
+from hdr import hdr
+from imgproc import imgproc
+
+
+"""
+Render several views of a scene in one batch. The rays of every view are generated with VWRAYS and traced by a single
+RTRACE process, so the octree is loaded once and all of the views share the same ambient cache, instead of a separate
+RPICT run (and ambient calculation) per view.
+"""
+
+
+def check_args():
+    if len(sys.argv) <= 1:
+        return False
+    global _name
+    global _model
+    global _scene
+    global _row
+    global _height
+    global _width
+    global _color
+    global _illum
+    global _pal
+    global _gif
+    global _show_warnings
+    global _procs
+    for i in range(1, len(sys.argv)):
+        if sys.argv[i] == '-w':
+            _show_warnings = True
+        if sys.argv[i] == '-np':
+            # number of rtrace processes
+            _procs = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-gif':
+            _gif = True
+        if sys.argv[i] == '-i':
+            _illum = True
+        if sys.argv[i] == '-x':
+            # Image Width
+            _width = int(sys.argv[i + 1]) * 2
+            i += 1
+        if sys.argv[i] == '-y':
+            # image Height
+            _height = int(sys.argv[i + 1]) * 2
+            i += 1
+        if sys.argv[i] == '-c':
+            # color temp
+            _color = sculpt.cct_to_rgb(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-v':
+            # View file(s)
+            vn = os.path.splitext(sys.argv[i + 1])[0]
+            # check that the view actually exists...
+            vtemp = os.path.join(_projPath, 'views', f"{vn}.vf")
+            if os.path.exists(vtemp):
+                _views.append(os.path.join('views', f"{vn}.vf"))
+            else:
+                print(f'{vtemp} doesnt exist')
+            i += 1
+        if sys.argv[i] == '-m':
+            # Model file
+            oct = os.path.splitext(sys.argv[i + 1])[0]
+            # check that the view actually exists...
+            otemp = os.path.join(_projPath, 'octrees', f"{oct}.oct")
+            if os.path.exists(otemp):
+                _model = os.path.join('octrees', f'{oct}.oct')
+            i += 1
+        if sys.argv[i] == '-n':
+            # name
+            _name = sys.argv[i + 1]
+            i += 1
+        if sys.argv[i] == '-row':
+            # row of a scalars file with several rows, ie an hour of a daylight schedule
+            _row = sys.argv[i + 1]
+            i += 1
+        if sys.argv[i] == '-s':
+            # scene
+            sn = sys.argv[i + 1]
+            # check that the scene file actually exists...
+            stemp = os.path.join(_projPath, 'scenarios', f"{sn}.csv")
+            if os.path.exists(stemp):
+                _scene = sn
+            i += 1
+        if sys.argv[i] == '-p':
+            # palette
+            valid_palettes = ['def', 'pm3d', 'tbo', 'spec', 'hot', 'eco']
+            pal = sys.argv[i + 1]
+            if pal in valid_palettes:
+                _pal = pal
+            i += 1
+
+    return len(_views) > 0 and _model != 'unknown' and _name != 'unknown'
+
+
+# setup parameters
+_name = 'unknown'
+_scene = 'unknown'
+_row = None
+_views = []
+_model = 'unknown'
+_pal = 'def'
+_color = (1.0, 0.808, 0.651)  # 4000K default
+_width = 2560   # after anti-aliasing: 1280
+_height = 1440  # after anti-aliasing:  720
+_illum = False
+_show_warnings = False
+_procs = 1
+_gif = False
+_projPath = pathlib.Path(__file__).parent.parent.resolve()
+
+
+if check_args():
+    qual = 'high'
+    lum_files = sculpt.process_ies(_projPath, _scene, _color, "LUM", row=_row)
+    oct = sculpt.gen_octree(_projPath, lum_files, f'simModel_{_name}.oct', baseOct=_model)
+    names = [f'{_name}_{pathlib.Path(v).stem}' for v in _views]
+    images = sculpt.render_views(_projPath, oct, _views, names, _width, _height, qual, _illum, _show_warnings, _procs)
+
+    for img in images:
+        print(img)
+        out = img
+        if _illum:
+            if _pal in imgproc.PALETTES:
+                data = hdr.read(os.path.join(_projPath, img))
+                fc = imgproc.falsecolor(data, 500, _pal, lw=_width * 0.05, lh=_height * 0.2)
+                out = hdr.write(os.path.join(_projPath, img.replace('.hdr', '_fc.hdr')), fc)
+            else:
+                out = sculpt.to_falsecolor(_projPath, img, img.replace('.hdr', '_fc.hdr'), _pal, 500,
+                                           _width * 0.05, _height * 0.2)
+        if _gif:
+            sculpt.to_gif(_projPath, out, out.replace('.hdr', '.gif'))
+
+else:
+    print('\nThis command will render several views of a scene in a single batch. Rays for every view are generated')
+    print('with vwrays and traced by one rtrace process, so the octree is loaded once and the views share the same')
+    print('ambient cache. The results are split back into one image per view, named <name>_<view>.hdr.')
+    print('If no Scene name is passed it will use the default unsculpted IES file (all pixels at full power).')
+    print('\n\tExample:')
+    print('\t\tpython renderViews.py -n 300lux -m FullModel -s Scene_300Lux -v camera01_fisheye -v Camera02 -v Camera03')
+    print('\t\tpython renderViews.py -n 300lux -m FullModel -s Scene_300Lux -v Camera02 -v Camera03 -i -np 8 -gif')
+    print('\n\tArguments')
+    print('\t===================')
+    print('\n\t-m model\tName of the octree model being simulated')
+    print('\n\t-n name\t\tName prefix for the image files')
+    print('\n\t-s scene\tName of the scene being simulated')
+    print('\n\t-row row\tRow of the scene\'s scalars file to use when it has several, ie an hour of a daylight')
+    print('\t\t\tschedule [OPTIONAL]')
+    print('\n\t-v name\t\tName of a view file (with/out extension). Can be passed multiple times.')
+    print('\n\t-c clrtemp\tColor temperature in Kevlin, default 4000K. [OPTIONAL]')
+    print('\n\t-i\t\tRender illuminance and convert to falsecolor. [OPTIONAL]')
+    print('\n\t-p pal\t\tFalse color palette, default "def". [OPTIONAL]')
+    print('\n\t-x xdim\t\tImage width, default 1280 [OPTIONAL]')
+    print('\n\t-y ydim\t\tImage Height, default 720 [OPTIONAL]')
+    print('\n\t-gif\t\tExport the HDR image(s) as a GIF. [OPTIONAL]')
+    print('\n\t-np procs\tNumber of rtrace processes (-n), not available on Windows. Default 1 [OPTIONAL]')
+    print('\n\t-w\t\tTurn on warning messages. [OPTIONAL]')
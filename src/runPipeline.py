@@ -0,0 +1,91 @@
+import sys
+import os
+import pathlib
+from pipeline import pipeline
+
+
+"""
+Run the Sculpt scripts as a pipeline described in a TOML spec. Stages only run when their inputs, script or
+arguments changed since their last successful run (or an output is missing), and stages that don't depend on
+each other run in parallel. See the pipeline class for the spec format.
+"""
+
+
+def check_args():
+    if len(sys.argv) <= 1:
+        return False
+    global _spec
+    global _targets
+    global _jobs
+    global _dry
+    global _force
+    for i in range(1, len(sys.argv)):
+        if sys.argv[i] == '-f':
+            # pipeline spec
+            sp = sys.argv[i + 1]
+            if not os.path.exists(sp):
+                sp = os.path.join(_projPath, sp)
+                if not sp.endswith('.toml'):
+                    sp += '.toml'
+            if os.path.exists(sp):
+                _spec = sp
+            else:
+                print(f'{sp} doesnt exist')
+            i += 1
+        if sys.argv[i] == '-t':
+            # target stage(s)
+            _targets.append(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-j':
+            # parallel stages
+            _jobs = int(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-n':
+            _dry = True
+        if sys.argv[i] == '-force':
+            _force = True
+
+    return _spec is not None
+
+
+# setup parameters
+_spec = None
+_targets = []
+_jobs = 1
+_dry = False
+_force = False
+_projPath = pathlib.Path(__file__).parent.parent.resolve()
+
+
+if check_args():
+    if not pipeline.run(_projPath, _spec, _targets, _jobs, _dry, _force):
+        sys.exit(1)
+else:
+    print('\nThis command will run the Sculpt scripts as a pipeline described in a TOML spec, rebuilding only')
+    print('the stages that are out of date. Each stage names a script, its arguments, and the project files it reads')
+    print('and writes. A stage runs when an output is missing, when its script, arguments or input file contents')
+    print('changed since its last successful run (tracked in cache\\pipeline\\<spec>.json), or when a stage it')
+    print('depends on runs. Stages depend on the stages in their "after" list and on any stage writing their inputs.')
+    print('A run only succeeds when it writes every output again, and a stage with a missing input fails.')
+    print('\n\tSpec Example (pipeline.toml in the project directory):')
+    print('\t\t[stages.octree]')
+    print('\t\tscript = "genOctree.py"')
+    print('\t\targs = ["-n", "FullModel"]')
+    print('\t\tinputs = ["model.rad", "materials.rad", "objects/*.rad"]')
+    print('\t\toutputs = ["octrees/FullModel.oct"]')
+    print('\n\t\t[stages.render]')
+    print('\t\tscript = "lumSimple.py"')
+    print('\t\targs = ["-n", "300lux", "-m", "FullModel", "-s", "Scene_300Lux", "-v", "Camera02"]')
+    print('\t\tinputs = ["octrees/FullModel.oct", "scenarios/scalars/Scene_300Lux.csv", "views/Camera02.vf"]')
+    print('\t\toutputs = ["results/imageBased/300lux.hdr"]')
+    print('\n\tExample:')
+    print('\t\tpython runPipeline.py -f pipeline -n')
+    print('\t\tpython runPipeline.py -f pipeline -j 4')
+    print('\t\tpython runPipeline.py -f pipeline -t render -force')
+    print('\n\tArguments')
+    print('\t===================')
+    print('\n\t-f spec\t\tPipeline spec, a TOML file path or name in the project directory')
+    print('\n\t-t stage\tOnly run this stage and the stages it depends on. Can be passed multiple times. [OPTIONAL]')
+    print('\n\t-j jobs\t\tNumber of stages run at once, default 1 [OPTIONAL]')
+    print('\n\t-n\t\tDry run, print the stages that would run and their commands. [OPTIONAL]')
+    print('\n\t-force\t\tRun every stage, whether it is up to date or not. [OPTIONAL]')
@@ -2,6 +2,18 @@ import os
 import csv
 import math
 import pathlib
+import subprocess
+import contextlib
+import uuid
+import shutil
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from cache import cache
+from hdr import hdr
+from ies import ies
+from matrix import matrix
+from brightdata import brightdata
+from imgproc import imgproc
 
 """ Setup the Honeybee imports """
 try:
@@ -15,6 +27,7 @@ try:
     from honeybee_radiance_command.rpict import Rpict
     from honeybee_radiance_command.rtrace import Rtrace
     from honeybee_radiance_command.pcomb import Pcomb
+    from honeybee_radiance_command.pcompos import Pcompos
     from honeybee_radiance_command.pfilt import Pfilt
     from honeybee_radiance_command.ra_gif import Ra_GIF
     from honeybee_radiance_command.pcond import Pcond
@@ -51,6 +64,9 @@ class sculpt(object):
             - Pre-built Radiance Octree(s)
         - python
             - this 'Sculpt' python library
+        - cache
+            - ambient
+                Shared Radiance ambient files, see the cache class
         - results
             - gridBased
                 - grid based (RTRACE) simulation results
@@ -68,6 +84,9 @@ class sculpt(object):
         - luminaires.txt (text file of luminaire ids and transform operations)
     """
 
+    # composed luminaire transforms by xform string, luminaires.txt is read for every scene
+    _xforms = {}
+
     @staticmethod
     def split_xforms(xform):
         """
@@ -96,107 +115,329 @@ class sculpt(object):
         return xforms
 
     @staticmethod
-    def process_ies(projPath, scene, color, subtype, multiplier=1.0):
+    def xform_matrix(xform):
+        """
+        Compose the transforms of an xform parameter string into a single 4x4 matrix. XFORM applies
+        the transforms in the order they are given, so each one is multiplied on the left.
+        Only the geometric transforms (-t, -rx, -ry, -rz, -s, -mx, -my, -mz) are understood.
+        :param xform: radiance parameters as a string, ie '-rz 90 -t 1.2 -3.4 2.7' #type: str
+        :return: 4x4 numpy array
+        """
+        parts = xform.split()
+        mat = np.eye(4)
+        i = 0
+        while i < len(parts):
+            op = parts[i]
+            step = np.eye(4)
+            if op == '-t':
+                step[:3, 3] = [float(v) for v in parts[i + 1:i + 4]]
+                i += 3
+            elif op in ('-rx', '-ry', '-rz'):
+                a = math.radians(float(parts[i + 1]))
+                c, s = math.cos(a), math.sin(a)
+                j, k = {'-rx': (1, 2), '-ry': (2, 0), '-rz': (0, 1)}[op]
+                step[j, j] = c
+                step[j, k] = -s
+                step[k, j] = s
+                step[k, k] = c
+                i += 1
+            elif op == '-s':
+                step[:3, :3] *= float(parts[i + 1])
+                i += 1
+            elif op in ('-mx', '-my', '-mz'):
+                axis = 'xyz'.index(op[2])
+                step[axis, axis] = -1.0
+            else:
+                raise ValueError(f"Unsupported xform option '{op}' in '{xform}'")
+            mat = step @ mat
+            i += 1
+        return mat
+
+    @staticmethod
+    def matrix_xform(mat):
+        """
+        Turn a composed transform matrix back into xform parameters for a single XFORM call,
+        as an optional mirror, a uniform scale, rotations about X, Y then Z, and a translation.
+        :param mat: 4x4 transform matrix from sculpt.xform_matrix
+        :return: radiance parameters as a string #type: str
+        """
+        rot = np.array(mat[:3, :3], dtype=float)
+        det = np.linalg.det(rot)
+        scale = abs(det) ** (1.0 / 3.0)
+        rot /= scale
+        args = []
+        if det < 0:
+            # mirror the luminaire in X first, leaving a pure rotation
+            args.append('-mx')
+            rot[:, 0] *= -1.0
+        if abs(scale - 1.0) > 1e-9:
+            args.append(f'-s {scale:.10g}')
+        # rot = Rz(c) @ Ry(b) @ Rx(a)
+        b = math.asin(max(-1.0, min(1.0, -rot[2, 0])))
+        if abs(math.cos(b)) > 1e-9:
+            a = math.atan2(rot[2, 1], rot[2, 2])
+            c = math.atan2(rot[1, 0], rot[0, 0])
+        else:
+            a = 0.0
+            c = math.atan2(-rot[0, 1], rot[1, 1])
+        for op, angle in (('-rx', a), ('-ry', b), ('-rz', c)):
+            deg = math.degrees(angle)
+            if abs(deg) > 1e-9:
+                args.append(f'{op} {deg:.10g}')
+        t = mat[:3, 3]
+        if np.any(np.abs(t) > 1e-12):
+            args.append('-t {:.10g} {:.10g} {:.10g}'.format(*t))
+        return " ".join(args)
+
+    @staticmethod
+    def lum_xform(xform):
+        """
+        Get the single set of xform parameters equivalent to a luminaire transform string.
+        Results are cached, so each transform of luminaires.txt is only composed once per run.
+        Transforms that can't be composed (ie arrays or renaming) are passed through as they are,
+        which XFORM itself still applies in order.
+        :param xform: radiance parameters as a string #type: str
+        :return: radiance parameters as a string #type: str
+        """
+        if xform not in sculpt._xforms:
+            try:
+                sculpt._xforms[xform] = sculpt.matrix_xform(sculpt.xform_matrix(xform))
+            except (ValueError, IndexError):
+                sculpt._xforms[xform] = xform
+        return sculpt._xforms[xform]
+
+    @staticmethod
+    def apply_xform(inpath, outpath, xform, env=None):
+        """
+        Position a luminaire with one XFORM call using the composed transform.
+        :param inpath: Rad file from IES2RAD
+        :param outpath: Transformed rad file
+        :param xform: radiance parameters as a string #type: str
+        :param env: [OPTIONAL] Radiance environment, defaults to sculpt.get_env()
+        :return: The transformed rad file path.
+        """
+        cmd = f'xform {sculpt.lum_xform(xform)} "{inpath}" > "{outpath}"'.replace('\\', '/')
+        code = sculpt.run_cmd(cmd, None, env)
+        if code != 0:
+            raise RuntimeError(f"XFORM of {inpath} failed (return code {code})")
+        return outpath
+
+    @staticmethod
+    def process_ies(projPath, scene, color, subtype, multiplier=1.0, procs=None, row=None):
         """
         This will process IES luminaires for a radiance simulation
         and return a list of the processed and transformed Rad files.
+        The luminaires are converted concurrently and kept in the luminaire cache, so
+        a luminaire whose IES file, color, multiplier and transform are unchanged is reused.
+        When the scene has a scenarios/scalars/<scene>.csv file the luminaires are built straight
+        from its scalars (see process_scalars) and the sculpted IES files aren't needed.
         :param projPath: Root path for the radiance project
         :param scene: Name of the scene, prefix of IES profiles to select.
         :param color: Tuple of the (R,G,B) for the light color temperature.
         :param subtype: LUM, SPOT, or LGP
-        :return: [ies file paths]
+        :param multiplier: [OPTIONAL] IES2RAD multiplier (-m)
+        :param procs: [OPTIONAL] Number of luminaires converted at once, defaults to the thread pool default
+        :param row: [OPTIONAL] Row name or index of a scalars file with several rows, ie an hour of a daylight schedule
+        :return: [ies file paths] in the order of luminaires.txt
         """
 
         # Get the Radiance Environment
         env = sculpt.get_env()
 
-        # Iterate through the luminaires.txt file and set up unsculpted ies2rads
-        lumfile = os.path.join(projPath, "luminaires.txt")
-        lumFiles = []
         if color is None:
             color = (1.0, 0.808, 0.651)
+        scalarPath = os.path.join(projPath, 'scenarios', 'scalars', f'{scene}.csv')
+        if scene != "unknown" and os.path.exists(scalarPath):
+            names, columns, scalars = matrix.load_scalars(scalarPath)
+            if row is None:
+                if len(names) > 1:
+                    raise ValueError(f"{scalarPath} has {len(names)} rows ({names[0]} ... {names[-1]}), "
+                                     f"the row to use has to be given")
+                row = 0
+            elif not isinstance(row, int):
+                if row not in names:
+                    raise ValueError(f"{scalarPath} has no row '{row}'")
+                row = names.index(row)
+            return sculpt.process_scalars(projPath, scene, scalars[row], color, subtype, multiplier, procs)
+
+        # Read the luminaires.txt file and set up unsculpted ies2rads
+        lumfile = os.path.join(projPath, "luminaires.txt")
         with open(lumfile) as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                idx = row[0]
-                t = row[1]
-
-                # new method to separate the transforms
-                xforms = sculpt.split_xforms(t)
-
-                iespath = os.path.join(projPath, 'ies', 'sculpted')
-                initpath = os.path.join(projPath, 'ies', 'temp') + '\\'
-                if scene == "unknown":
-                    iespath = os.path.join(iespath, "unsculpted.ies")
-                    initpath += f"_lum{idx}"
-                else:
-                    iespath = os.path.join(iespath, f'{scene}_{subtype}_{idx}.ies')
-                    initpath += pathlib.Path(iespath).stem
-                ies2rad = Ies2rad(None, initpath, iespath)  # type: Ies2rad
-                ies2rad.options.c = color
-                ies2rad.options.m = multiplier
-                ies2rad.run(env, cwd=os.path.dirname(iespath))
-
-                xformPath = os.path.join(projPath, 'ies', 'temp', f"lum_{idx}.rad")
-
-                # Build and chain the xforms together
-                all_xforms = []
-                for i in range(len(xforms) - 1, -1, -1):
-                    ipath = "" if i > 0 else f"{initpath}.rad"
-                    opath = None if i < len(xforms) - 1 else xformPath
-                    x = Xform(None, opath, ipath)
-                    x.options.update_from_string(xforms[i])
-                    if i < len(xforms) - 1:
-                        x.pipe_to = all_xforms[-1]
-                    all_xforms.append(x)
-                lx = all_xforms[-1]
-                lx.run(env)
-                lumFiles.append(str(xformPath))
+            rows = [row for row in csv.reader(csvfile) if len(row) > 1]
+
+        def process_lum(row):
+            idx = row[0]
+            t = row[1]
+
+            iespath = os.path.join(projPath, 'ies', 'sculpted')
+            if scene == "unknown":
+                iespath = os.path.join(iespath, "unsculpted.ies")
+            else:
+                iespath = os.path.join(iespath, f'{scene}_{subtype}_{idx}.ies')
+            return sculpt.cached_lum(projPath, iespath, color, multiplier, t, env)
+
+        # map keeps the luminaires.txt order, so the octree is the same however the work is scheduled
+        with ThreadPoolExecutor(max_workers=procs) as pool:
+            lumFiles = list(pool.map(process_lum, rows))
+        cache.evict(projPath)
         return lumFiles
 
+    @staticmethod
+    def base_brightdata(projPath, color, multiplier=1.0, env=None):
+        """
+        Convert the base IES profiles with IES2RAD once and keep their data values as a single stack in
+        cache/brightdata, along with the rad files, which are the templates for sculpted luminaires.
+        The profiles are in the same order genMatrix.py uses for the matrix columns.
+        :param projPath: Root directory of the project
+        :param color: Tuple of the (R,G,B) for the light color temperature.
+        :param multiplier: IES2RAD multiplier (-m)
+        :param env: [OPTIONAL] Radiance environment, defaults to sculpt.get_env()
+        :return: [0] (profiles x count) stack of values\n[1] data file header tokens
+                 \n[2] (profiles) IES multiplier x ballast factor\n[3] template rad file paths
+        """
+        if env is None:
+            env = sculpt.get_env()
+        baseDir = os.path.join(projPath, 'ies', 'baseIes')
+        paths = []
+        for root, dirs, files in os.walk(baseDir, False):
+            for f in files:
+                if ".ies" in f:
+                    paths.append(os.path.join(baseDir, f))
+
+        key = cache.key(*[cache.octree_hash(p) for p in paths], tuple(color), multiplier)
+        root = os.path.join(cache.get_dir(projPath, 'brightdata'), key)
+        stackPath = os.path.join(root, 'stack.npz')
+        templates = [os.path.join(root, f'__tmpl__{i}.rad') for i in range(len(paths))]
+        if not os.path.exists(stackPath):
+            with cache.lock(root):
+                if not os.path.exists(stackPath):
+                    os.makedirs(root, exist_ok=True)
+
+                    def convert(i):
+                        ies2rad = Ies2rad(None, os.path.splitext(templates[i])[0], paths[i])  # type: Ies2rad
+                        ies2rad.options.c = color
+                        ies2rad.options.m = multiplier
+                        sculpt.run_cmd(ies2rad, baseDir, env)
+                        return brightdata.read(os.path.splitext(templates[i])[0] + '.dat')
+
+                    with ThreadPoolExecutor() as pool:
+                        data = list(pool.map(convert, range(len(paths))))
+                    if any(d[0] != data[0][0] for d in data):
+                        raise ValueError("The base IES profiles don't share the same angles")
+                    factors = []
+                    for p in paths:
+                        base = ies(p)
+                        factors.append(base.multiplier * base.ballastFactor)
+                    tmpPath = f"{stackPath}.{os.getpid()}.tmp"
+                    with open(tmpPath, 'wb') as sfile:
+                        np.savez(sfile, values=np.vstack([d[1] for d in data]), header=np.array(data[0][0]),
+                                 factors=np.nan_to_num(np.array(factors, dtype=float), nan=1.0))
+                    os.replace(tmpPath, stackPath)
+        with np.load(stackPath) as stack:
+            return [stack['values'], list(stack['header']), stack['factors'], templates]
+
+    @staticmethod
+    def process_scalars(projPath, scene, scalars, color, subtype, multiplier=1.0, procs=None):
+        """
+        Build the transformed Rad files of a sculpted scene straight from its scalars. Each luminaire's
+        data file is the weighted sum of the cached base profile values and its rad file is the first
+        included base profile's, the same result as ies.combine, toFileSpec and IES2RAD without the
+        text round trips. The files are kept in the luminaire cache by the key of the base profiles,
+        color, multiplier and weights, so runs with other colors or scalars don't share them.
+        :param projPath: Root path for the radiance project
+        :param scene: Name of the scene, unused as the files are named by their luminaire cache key
+        :param scalars: Scalar per control (luminaire and base IES profile) as saved by optimize.py
+        :param color: Tuple of the (R,G,B) for the light color temperature.
+        :param subtype: LUM, SPOT, or LGP
+        :param multiplier: [OPTIONAL] IES2RAD multiplier (-m)
+        :param procs: [OPTIONAL] Number of luminaires transformed at once, defaults to the thread pool default
+        :return: [rad file paths] in the order of luminaires.txt
+        """
+        env = sculpt.get_env()
+        if color is None:
+            color = (1.0, 0.808, 0.651)
+        stack, header, factors, templates = sculpt.base_brightdata(projPath, color, multiplier, env)
+        with open(os.path.join(projPath, "luminaires.txt")) as csvfile:
+            rows = [row for row in csv.reader(csvfile) if len(row) > 1]
+
+        # the first 4 base profiles are the LGP, the rest are the Spots
+        profiles = len(factors)
+        mask = np.ones(profiles)
+        if subtype.upper() == 'LGP':
+            mask[4:] = 0
+        elif subtype.upper() == 'SPOT':
+            mask[:4] = 0
+        first = int(np.flatnonzero(mask)[0])
+        tmplPrefix = os.path.splitext(templates[first])[0]
+        with open(templates[first]) as tfile:
+            tmpl = tfile.read()
+
+        # ies.combine keeps the first profile's multipliers for the summed candela values
+        mask *= factors[first] / factors
+
+        # the base profiles' cache entry already holds the color and multiplier
+        baseKey = os.path.basename(os.path.dirname(templates[0]))
+
+        def process_lum(r):
+            weights = np.asarray(scalars[r * profiles:(r + 1) * profiles], dtype=float) * mask
+
+            def convert(prefix):
+                brightdata.write(f'{prefix}.dat', header, brightdata.combine(stack, weights))
+                with open(f'{prefix}.rad', 'w') as rfile:
+                    rfile.write(brightdata.rename(tmpl, tmplPrefix, prefix))
+
+            return cache.luminaire(projPath, None, color, multiplier, rows[r][1], convert,
+                                   lambda i, o: sculpt.apply_xform(i, o, rows[r][1], env),
+                                   cache.key(baseKey, first, weights.tobytes().hex()))
+
+        with ThreadPoolExecutor(max_workers=procs) as pool:
+            lumFiles = list(pool.map(process_lum, range(len(rows))))
+        cache.evict(projPath)
+        return lumFiles
 
     @staticmethod
-    def process_single_ies(projPath, profile, xform, name):
+    def cached_lum(projPath, iespath, color, multiplier, xform, env=None):
+        """
+        Convert (IES2RAD) and position (XFORM) a luminaire through the luminaire cache.
+        :param projPath: Root directory of the project
+        :param iespath: IES file path
+        :param color: Tuple of the (R,G,B) for the light color temperature.
+        :param multiplier: IES2RAD multiplier (-m), None for the default
+        :param xform: XFORM to position the luminaire
+        :param env: [OPTIONAL] Radiance environment, defaults to sculpt.get_env()
+        :return: the xform'd luminaire path.
+        """
+        if env is None:
+            env = sculpt.get_env()
+
+        def convert(prefix):
+            ies2rad = Ies2rad(None, prefix, iespath)  # type: Ies2rad
+            ies2rad.options.c = color
+            if multiplier is not None:
+                ies2rad.options.m = multiplier
+            code = sculpt.run_cmd(ies2rad, os.path.dirname(iespath), env)
+            if code != 0:
+                raise RuntimeError(f"IES2RAD of {iespath} failed (return code {code})")
+
+        return cache.luminaire(projPath, iespath, color, multiplier, xform, convert,
+                               lambda i, o: sculpt.apply_xform(i, o, xform, env))
+
+
+    @staticmethod
+    def process_single_ies(projPath, profile, xform, name, color=(1.0, 0.808, 0.651)):
         """
         This will process and return a single IES Radiance file based on
         a specified IES file and transform.
         :param projPath: Root directory of the project
         :param profile: IES Profile to be used
         :param xform: XFORM to position the luminaire
-        :param name: Luminaire name
+        :param name: Luminaire name, unused as the file is named by its luminaire cache key
+        :param color: Tuple of the (R,G,B) for the light color temperature, default 4000K
         :return: the xform'd luminaire path.
         """
 
-        # Get the Radiance Environment
-        env = sculpt.get_env()
-
         iespath = os.path.join(projPath, 'ies', profile)
-        initpath = os.path.join(projPath, 'ies', 'temp') + '\\'
-
-        ies2rad = Ies2rad(None, initpath, iespath)  # type: Ies2rad
-        ies2rad.options.c = (1.0, 0.808, 0.651)
-        ies2rad.run(env, cwd=os.path.dirname(iespath))
-
-        xformPath = os.path.join(projPath, 'ies', 'temp', f"{name}.rad")
-        xforms = sculpt.split_xforms(xform)
-        all_xforms = []
-        for i in range(len(xforms) - 1, -1, -1):
-            ipath = "" if i > 0 else f"{initpath}.rad"
-            opath = None if i < len(xforms) - 1 else xformPath
-            x = Xform(None, opath, ipath)
-            x.options.update_from_string(xforms[i])
-            if i < len(xforms) - 1:
-                x.pipe_to = all_xforms[-1]
-            all_xforms.append(x)
-        rxform = all_xforms[-1]
-        rxform.run(env)
-        # rxform = Xform(None, xformPath, initpath + '.rad')
-        #
-        # rxform.options.update_from_string(xform)
-        #
-        # # run the command
-        # rxform.run(env, cwd=os.path.dirname(iespath))
-        return xformPath
+        return sculpt.cached_lum(projPath, iespath, color, None, xform)
 
 
     @staticmethod
@@ -213,6 +454,24 @@ class sculpt(object):
         return env
 
 
+    @staticmethod
+    def run_cmd(command, cwd, env=None):
+        """
+        Run a HB command (or a command string) as a subprocess in the given working directory.
+        Unlike Command.run this doesn't change the working directory of the python process,
+        so it is safe to call from multiple threads at once.
+        :param command: HB Command or a Radiance command string
+        :param cwd: Working directory for the command
+        :param env: [OPTIONAL] Radiance environment, defaults to sculpt.get_env()
+        :return: The command return code.
+        """
+        if not isinstance(command, str):
+            command = command.to_radiance().replace('\\', '/')
+        if env is None:
+            env = sculpt.get_env()
+        return subprocess.run(command, shell=True, cwd=cwd, env=env).returncode
+
+
     @staticmethod
     def gen_octree(projpath, inputs, name, baseOct='unknown', show_warnings=False):
         """
@@ -234,7 +493,7 @@ class sculpt(object):
 
         # run the command
         env = sculpt.get_env()
-        oconv.run(env, cwd=projpath)
+        sculpt.run_cmd(oconv, projpath, env)
         return octpath
 
 
@@ -296,34 +555,333 @@ class sculpt(object):
 
 
     @staticmethod
-    def render_img(projpath, oct, view, name, width, height, qual='high', aa=True, illum=False, show_warnings=False):
+    def read_view(viewpath):
+        """
+        Read the view options from a Radiance view file.
+        :param viewpath: Path to the .vf file
+        :return: dict of view option (ie 'vt', 'vp', 'vh') to its value(s) as strings
+        """
+        with open(viewpath) as vfile:
+            parts = vfile.read().split()
+        view = {'vt': 'v', 'vh': '45', 'vv': '45', 'vs': '0', 'vl': '0'}
+        i = 0
+        while i < len(parts):
+            part = parts[i]
+            if part.startswith('-vt'):
+                view['vt'] = part[3:]
+            elif part in ('-vp', '-vd', '-vu'):
+                view[part[1:]] = parts[i + 1:i + 4]
+                i += 3
+            elif part in ('-vh', '-vv', '-vo', '-va', '-vs', '-vl'):
+                view[part[1:]] = parts[i + 1]
+                i += 1
+            i += 1
+        return view
 
-        rpict_low = '-aa 0.25 -ab 2 -ad 512 -ar 16 -as 128 -dc 0.25 -dj 0.0 -dp 64 -dr 0 -ds 0.5 -dt 0.5 '\
-                    '-lr 4 -lw 0.05 -pj 0.6 -ps 8 -pt 0.15 -ss 0.0 -st 0.85'
-        # -as 4096
-        rpict_high = '-aa 10.0 -ab 6 -ad 4096 -ar 128 -dc 0.75 -dj 1.0 -dp 512 -dr 3 -ds 0.05 '\
-                     '-dt 0.15 -lr 8 -lw 0.005 -pj 0.9 -ps 2 -pt 0.05 -ss 1.0 -st 0.15'
 
-        name = os.path.splitext(name)[0]
-        part = name.split('_')[0]
-        hdrpath = os.path.join('results', 'imageBased', f'{part}_temp.hdr')
-        rpict = Rpict(None, hdrpath, oct, view)
-        if qual.lower() == 'high':
-            rpict.options.update_from_string(rpict_high)
+    @staticmethod
+    def write_view(viewpath, view):
+        """
+        Write a set of view options, as returned by read_view, to a Radiance view file.
+        :param viewpath: Path to the .vf file
+        :param view: dict of view options
+        :return: The view file path.
+        """
+        opts = [f"-vt{view['vt']}"]
+        for key in ('vp', 'vd', 'vu', 'vh', 'vv', 'vo', 'va', 'vs', 'vl'):
+            if key in view:
+                value = view[key]
+                opts.append(f"-{key} {' '.join(value) if isinstance(value, list) else value}")
+        with open(viewpath, 'w') as vfile:
+            vfile.write(f"rview {' '.join(opts)}\n")
+        return viewpath
+
+
+    @staticmethod
+    def view_size(vt, angle, vertical=False):
+        """
+        Size of a view on the image plane (as Radiance's setview computes it) so that image rows
+        map linearly onto it. Also used in reverse to get the view angle for an image plane size.
+        :param vt: View type ('v', 'l', 'a', 'h', 'c')
+        :param angle: View angle (or width for parallel views)
+        :param vertical: True for the vertical size (only matters for cylindrical views)
+        :return: Image plane size
+        """
+        if vt == 'v' or (vt == 'c' and vertical):
+            return 2.0 * math.tan(math.radians(angle) / 2.0)
+        elif vt == 'h':
+            return 2.0 * math.sin(math.radians(angle) / 2.0)
+        elif vt in ('a', 'c'):
+            return math.radians(angle)
+        return angle
+
+
+    @staticmethod
+    def view_angle(vt, size, vertical=False):
+        """
+        Inverse of view_size, the view angle for an image plane size.
+        """
+        if vt == 'v' or (vt == 'c' and vertical):
+            return math.degrees(2.0 * math.atan(size / 2.0))
+        elif vt == 'h':
+            return math.degrees(2.0 * math.asin(min(size / 2.0, 1.0)))
+        elif vt in ('a', 'c'):
+            return math.degrees(size)
+        return size
+
+
+    @staticmethod
+    def tile_views(projpath, view, name, width, height, procs):
+        """
+        Split a view into horizontal scanline bands that can be rendered as separate pictures and
+        stacked back together, the same way rpiece splits a view. The resolution is first reduced to
+        the view's aspect ratio (as rpict does with -pa 1) so the stacked bands match a single render.
+        :param projpath: Root directory for the project
+        :param view: View file path (relative)
+        :param name: Name of the rendering, used for the band view files
+        :param width: Image width
+        :param height: Image height
+        :param procs: Number of bands
+        :return: list of (band view path, width, height), top to bottom. None if the view type can't be split.
+        """
+        vw = sculpt.read_view(os.path.join(projpath, view))
+        vt = vw['vt']
+        if vt not in ('v', 'l', 'a', 'h', 'c'):
+            return None
+
+        hsize = sculpt.view_size(vt, float(vw['vh']))
+        vsize = sculpt.view_size(vt, float(vw['vv']), True)
+        aspect = vsize / hsize
+        if aspect * width > height:
+            width = int(height / aspect + 0.5)
         else:
-            rpict.options.update_from_string(rpict_low)
-        rpict.options.x = width
-        rpict.options.y = height
-        rpict.options.t = 30
-        if illum:
-            rpict.options.i = True
-        if not show_warnings:
-            rpict.options.w = show_warnings
+            height = int(width * aspect + 0.5)
+
+        procs = max(1, min(procs, height))
+        rows = [round(b * height / procs) for b in range(procs + 1)]
+        lift = float(vw['vl']) * vsize
+        tiles = []
+        for b in range(procs):
+            r0, r1 = rows[b], rows[b + 1]
+            size = vsize * (r1 - r0) / height
+            center = lift + vsize * (0.5 - (r0 + r1) / (2.0 * height))
+            band = dict(vw)
+            band['vv'] = f"{sculpt.view_angle(vt, size, True):.8f}"
+            band['vl'] = f"{center / size:.8f}"
+            bandpath = os.path.join('results', 'imageBased', f'{name}_band{b:02}.vf')
+            sculpt.write_view(os.path.join(projpath, bandpath), band)
+            tiles.append((bandpath, width, r1 - r0))
+        return tiles
+
+
+    @staticmethod
+    def rpict_params(qual='high'):
+        """
+        Get the RPICT parameters for a rendering quality.
+        :param qual: Rendering quality ('high' or not 'high')
+        :return: Radiance parameters #type: str
+        """
+        if qual.lower() == 'high':
+            # -as 4096
+            return '-aa 10.0 -ab 6 -ad 4096 -ar 128 -dc 0.75 -dj 1.0 -dp 512 -dr 3 -ds 0.05 '\
+                   '-dt 0.15 -lr 8 -lw 0.005 -pj 0.9 -ps 2 -pt 0.05 -ss 1.0 -st 0.15'
+        return '-aa 0.25 -ab 2 -ad 512 -ar 16 -as 128 -dc 0.25 -dj 0.0 -dp 64 -dr 0 -ds 0.5 -dt 0.5 '\
+               '-lr 4 -lw 0.05 -pj 0.6 -ps 8 -pt 0.15 -ss 0.0 -st 0.85'
+
+    @staticmethod
+    def rtrace_params(qual='high'):
+        """
+        Get the RTRACE parameters for a simulation quality.
+        :param qual: Simulation quality ('high' or not 'high')
+        :return: Radiance parameters #type: str
+        """
+        if qual.lower() == 'high':
+            return '-I -h -aa 0.1 -ab 6 -ad 4096 -ar 128 -as 4096 -dc 0.75 -dj 1.0 -dp 512 -dr 3 -ds 0.05 -dt 0.15 '\
+                   '-lr 8 -lw 0.005 -ss 1.0 -st 0.15'
+        return '-I -h -aa 0.25 -ab 2 -ad 512 -ar 16 -as 128 -dc 0.25 -dj 0.0 -dp 64 -dr 0 -ds 0.5 -dt 0.5 '\
+               '-lr 4 -lw 0.05 -ss 0.0 -st 0.85'
+
+    @staticmethod
+    def ambient_lock(ambpath):
+        """
+        Guard the use of a shared ambient file. Radiance locks ambient files itself while it writes
+        to them, except on Windows, where runs that share a file are made to take turns instead.
+        :param ambpath: Ambient file path
+        :return: A context manager
+        """
+        if os.name == 'nt':
+            return cache.lock(ambpath)
+        return contextlib.nullcontext(ambpath)
+
+    @staticmethod
+    def prewarm(projpath, oct, views, qual='high', illum=False, width=320, height=180, show_warnings=False):
+        """
+        Fill the managed ambient cache of an octree for a set of views ahead of the final renders by
+        rendering each view at a low resolution. The views are rendered concurrently into the same
+        ambient file, and a cache entry is only prewarmed by one worker at a time.
+        :param projpath: Root directory for the currently running project
+        :param oct: Octree file path
+        :param views: List of view file paths (relative)
+        :param qual: Rendering quality the cache is for ('high' or not 'high')
+        :param illum: Render irradiance (-i) instead of radiance
+        :param width: Prewarm image width
+        :param height: Prewarm image height
+        :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :return: The ambient file path.
+        """
+        params = sculpt.rpict_params(qual)
+        ambpath = cache.ambient_path(projpath, oct, params)
+        env = sculpt.get_env()
+        rpicts = []
+        for v, view in enumerate(views):
+            name = pathlib.Path(ambpath).stem
+            rpict = Rpict(None, os.path.join('results', 'imageBased', f'{name}_prewarm{v:02}.hdr'), oct, view)
+            rpict.options.update_from_string(params)
+            rpict.options.x = width
+            rpict.options.y = height
+            rpict.options.af = ambpath
+            if illum:
+                rpict.options.i = True
+            if not show_warnings:
+                rpict.options.w = show_warnings
+            rpicts.append(rpict)
+
+        with cache.lock(ambpath):
+            if os.name == 'nt':
+                for rpict in rpicts:
+                    sculpt.run_cmd(rpict, projpath, env)
+            else:
+                with ThreadPoolExecutor(max_workers=len(rpicts)) as pool:
+                    list(pool.map(lambda r: sculpt.run_cmd(r, projpath, env), rpicts))
+        for v in range(len(views)):
+            temp = os.path.join(projpath, 'results', 'imageBased', f'{pathlib.Path(ambpath).stem}_prewarm{v:02}.hdr')
+            if os.path.exists(temp):
+                os.remove(temp)
+        return ambpath
+
+    @staticmethod
+    def render_img(projpath, oct, view, name, width, height, qual='high', aa=True, illum=False, show_warnings=False,
+                   procs=1, ambient=True, stream=False, falsecolor=None, params=None):
+        """
+        Render an image with RPICT, optionally anti-aliasing the result with PFILT.
+        :param projpath: Root directory for the currently running project
+        :param oct: Octree file path
+        :param view: View file path (relative)
+        :param name: Name for the resulting image
+        :param width: Image width
+        :param height: Image height
+        :param qual: Rendering quality that drives parameter settings ('high' or not 'high')
+        :param aa: Run PFILT to anti-alias (and halve the size of) the image
+        :param illum: Render irradiance (-i) instead of radiance
+        :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :param procs: Number of RPICT processes. More than 1 splits the view into scanline bands that are
+                      rendered concurrently, sharing an ambient file (a copy each on Windows, where
+                      Radiance doesn't lock it), and then stitched back together.
+        :param ambient: Use the managed ambient cache of the octree (see cache.ambient_path), or the path of an
+                        ambient file shared by several renders
+        :param stream: Pipe the RPICT output straight through PFILT (and FALSECOLOR) so that only the final
+                       image is written to disk
+        :param falsecolor: [OPTIONAL] With stream, dict of to_falsecolor arguments (pal, scale, width, height)
+                           to pipe the image through FALSECOLOR, the result is then <name>_fc.hdr
+        :param params: [OPTIONAL] RPICT parameters to use instead of those of the quality setting
+        :return: The (relative) file path for the image.
+        """
+        if params is None:
+            params = sculpt.rpict_params(qual)
+
+        name = os.path.splitext(name)[0]
+        # temporary files are unique per call so that concurrent renders of the same name don't collide
+        temp = f'{name}_{os.getpid()}_{uuid.uuid4().hex[:8]}'
+        hdrpath = os.path.join('results', 'imageBased', f'{temp}_temp.hdr')
+        tiles = sculpt.tile_views(projpath, view, temp, width, height, procs) if procs > 1 else None
+        if procs > 1 and tiles is None:
+            print(f"View type of {view} can't be split into bands, rendering with a single process.")
+        if tiles is None:
+            tiles = [(view, width, height)]
 
-        # run the command
         env = sculpt.get_env()
-        rpict.run(env, cwd=projpath)
+        ambpath = os.path.join('results', 'imageBased', f'{temp}_bands.amb')
+        if isinstance(ambient, str):
+            ambpath = ambient
+        elif ambient:
+            ambpath = cache.ambient_path(projpath, oct, params)
+        rpicts = []
+        temps = [None if ambient else ambpath]
+        bandAmbs = []
+        for t, tile in enumerate(tiles):
+            tilepath = hdrpath if len(tiles) == 1 else os.path.join('results', 'imageBased', f'{temp}_band{t:02}.hdr')
+            if len(tiles) > 1:
+                temps.extend([tilepath, tile[0]])
+            rpict = Rpict(None, tilepath, oct, tile[0])
+            rpict.options.update_from_string(params)
+            rpict.options.x = tile[1]
+            rpict.options.y = tile[2]
+            rpict.options.t = 30
+            if illum:
+                rpict.options.i = True
+            if not show_warnings:
+                rpict.options.w = show_warnings
+            if len(tiles) > 1:
+                # bands are already at the view aspect, and share their indirect calculation
+                rpict.options.pa = 0
+            if len(tiles) > 1 and os.name == 'nt':
+                # Radiance doesn't lock ambient files on Windows, so each band starts from its own copy
+                # of the ambient file, and the copies are discarded afterwards
+                bandAmb = os.path.join('results', 'imageBased', f'{temp}_band{t:02}.amb')
+                with sculpt.ambient_lock(ambpath):
+                    if os.path.exists(os.path.join(projpath, ambpath)):
+                        shutil.copyfile(os.path.join(projpath, ambpath), os.path.join(projpath, bandAmb))
+                bandAmbs.append(bandAmb)
+                rpict.options.af = bandAmb
+            elif len(tiles) > 1 or ambient:
+                rpict.options.af = ambpath
+            rpicts.append(rpict)
 
+        # when streaming, the full size image is piped through pfilt (and falsecolor) to the final file
+        imgpath = os.path.join('results', 'imageBased', f'{name}.hdr')
+        pipe = None
+        if stream:
+            pipe = sculpt.pfilt_cmd(None, None) if aa else None
+            if falsecolor is not None:
+                imgpath = os.path.join('results', 'imageBased', f'{name}_fc.hdr')
+                fc = sculpt.falsecolor_cmd(None, None, **falsecolor)
+                if pipe is None:
+                    pipe = fc
+                else:
+                    pipe.pipe_to = fc
+            last = pipe
+            while last is not None and last.pipe_to is not None:
+                last = last.pipe_to
+            if last is not None:
+                last.output = imgpath
+            else:
+                stream = False
+
+        # run the command(s)
+        if len(rpicts) == 1:
+            if stream:
+                rpicts[0].output = None
+                rpicts[0].pipe_to = pipe
+            with sculpt.ambient_lock(ambpath):
+                sculpt.run_cmd(rpicts[0], projpath, env)
+        else:
+            # bands share the ambient file (except on Windows), so a prewarm of it has to wait for them
+            with contextlib.nullcontext(ambpath) if os.name == 'nt' else cache.lock(ambpath):
+                with ThreadPoolExecutor(max_workers=len(rpicts)) as pool:
+                    list(pool.map(lambda r: sculpt.run_cmd(r, projpath, env), rpicts))
+
+            # stitch the bands back together, top to bottom
+            pcompos = Pcompos(None, None if stream else hdrpath, temps[1::2])
+            pcompos.options.a = 1
+            if stream:
+                pcompos.pipe_to = pipe
+            sculpt.run_cmd(pcompos, projpath, env)
+            for t in temps + bandAmbs:
+                if t is not None and os.path.exists(os.path.join(projpath, t)):
+                    os.remove(os.path.join(projpath, t))
+
+        if stream:
+            return imgpath
         if aa:
             # run pfilt to perform anti-aliasing.
             aapath = os.path.join('results', 'imageBased', f'{name}.hdr')
@@ -332,7 +890,6 @@ class sculpt(object):
                 os.remove(hdrpath)
             return aapath
         else:
-            imgpath = os.path.join('results', 'imageBased', f'{name}.hdr')
             thing1 = os.path.join(projpath, hdrpath)
             thing2 = os.path.join(projpath, imgpath)
             if os.path.exists(thing2):
@@ -340,6 +897,263 @@ class sculpt(object):
             os.rename(thing1, thing2)
             return imgpath
 
+    @staticmethod
+    def progressive_passes(qual='high', reuse=True):
+        """
+        Get the passes of a progressive rendering, from a fast preview to the final quality. Each pass
+        is a resolution divisor and the RPICT parameters, and the ambient accuracy (-ad, -ar, -as, -aa)
+        increases with each pass. When the ambient cache is reused between passes, the passes after the
+        preview keep the final number of bounces (-ab), so the indirect irradiance they compute is valid
+        for the later passes that are seeded with it; the preview is only a single bounce and isn't kept.
+        :param qual: Quality of the final pass ('high' or not 'high')
+        :param reuse: Reuse the ambient cache between passes
+        :return: list of (divisor, parameters)
+        """
+        passes = [
+            (8, '-aa 0.3 -ab 1 -ad 256 -ar 16 -as 0 -dc 0.25 -dj 0.0 -dp 64 -dr 0 -ds 0.5 -dt 0.5 '
+                '-lr 4 -lw 0.05 -pj 0.0 -ps 16 -pt 0.2 -ss 0.0 -st 0.85'),
+            (4, sculpt.rpict_params('low')),
+            (2, '-aa 0.15 -ab 4 -ad 2048 -ar 64 -as 1024 -dc 0.5 -dj 0.5 -dp 256 -dr 1 -ds 0.2 -dt 0.3 '
+                '-lr 6 -lw 0.01 -pj 0.6 -ps 4 -pt 0.1 -ss 0.5 -st 0.5'),
+        ]
+        final = sculpt.rpict_params(qual)
+        if not qual.lower() == 'high':
+            passes = passes[:1]
+        if reuse:
+            bounces = cache.ambient_params(final).split()
+            bounces = bounces[bounces.index('-ab'):bounces.index('-ab') + 2] if '-ab' in bounces else []
+            passes = passes[:1] + [(d, " ".join(sculpt.strip_params(p, ['-ab']) + bounces)) for d, p in passes[1:]]
+        return passes + [(1, final)]
+
+    @staticmethod
+    def strip_params(params, options):
+        """
+        Remove options (and their values) from a Radiance parameter string.
+        :param params: Radiance parameters #type: str
+        :param options: Options to remove, ie ['-ab', '-ad']
+        :return: The remaining parameters as a list of strings
+        """
+        parts = params.split()
+        kept = []
+        i = 0
+        while i < len(parts):
+            if parts[i] in options:
+                i += 2
+                continue
+            kept.append(parts[i])
+            i += 1
+        return kept
+
+    @staticmethod
+    def render_progressive(projpath, oct, view, name, width, height, qual='high', illum=False, show_warnings=False,
+                           procs=1, reuse=True):
+        """
+        Render an image progressively, a fast low resolution preview followed by passes of increasing
+        resolution and accuracy. Each pass atomically replaces results/imageBased/<name>_preview.hdr so a
+        viewer can poll it; the final pass is also saved as <name>.hdr.
+        :param projpath: Root directory for the currently running project
+        :param oct: Octree file path
+        :param view: View file path (relative)
+        :param name: Name for the resulting image
+        :param width: Image width of the final pass (before anti-aliasing halves it)
+        :param height: Image height of the final pass (before anti-aliasing halves it)
+        :param qual: Quality of the final pass ('high' or not 'high')
+        :param illum: Render irradiance (-i) instead of radiance
+        :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :param procs: Number of RPICT processes per pass
+        :param reuse: Reuse the ambient cache between the passes
+        :return: The (relative) file path for the final image.
+        """
+        name = os.path.splitext(name)[0]
+        preview = os.path.join(projpath, 'results', 'imageBased', f'{name}_preview.hdr')
+        passes = sculpt.progressive_passes(qual, reuse)
+        # the passes after the preview share an ambient file of their own, so the values of the less accurate
+        # passes don't end up in the managed cache of the final parameters
+        shared = cache.ambient_path(projpath, oct, passes[-1][1]).replace('.amb', '_progressive.amb')
+        for p, (div, params) in enumerate(passes):
+            print(f"Pass {p + 1}/{len(passes)}: {width // div} x {height // div}")
+            ambient = shared if reuse and p > 0 else False
+            img = sculpt.render_img(projpath, oct, view, f'{name}_pass{p}', max(2, width // div), max(2, height // div),
+                                    qual, True, illum, show_warnings, procs, ambient=ambient, params=params)
+            imgpath = os.path.join(projpath, img)
+            if p == len(passes) - 1:
+                shutil.copyfile(imgpath, f'{preview}.tmp')
+                os.replace(f'{preview}.tmp', preview)
+                final = os.path.join('results', 'imageBased', f'{name}.hdr')
+                os.replace(imgpath, os.path.join(projpath, final))
+                return final
+            os.replace(imgpath, preview)
+
+
+    @staticmethod
+    def view_res(projpath, view, width, height):
+        """
+        Get the resolution VWRAYS (and RPICT) will use for a view, after fitting the view's aspect.
+        :param projpath: Root directory for the currently running project
+        :param view: View file path (relative)
+        :param width: Maximum image width
+        :param height: Maximum image height
+        :return: [width, height]
+        """
+        out = subprocess.run(f'vwrays -d -vf "{view}" -x {width} -y {height}', shell=True, cwd=projpath,
+                             env=sculpt.get_env(), capture_output=True, text=True).stdout.split()
+        return [int(out[out.index('-x') + 1]), int(out[out.index('-y') + 1])]
+
+    @staticmethod
+    def render_views(projpath, oct, views, names, width, height, qual='high', illum=False, show_warnings=False,
+                     procs=1, ambient=True):
+        """
+        Render several views of the same octree with a single RTRACE process. The rays of every view
+        are generated with VWRAYS and streamed into RTRACE one view after another, so the octree is
+        loaded once and all of the views share one ambient cache (and, with procs > 1, the -n worker
+        processes). The traced values are split back into one HDR image per view, anti-aliased
+        and exposed as PFILT would.
+        :param projpath: Root directory for the currently running project
+        :param oct: Octree file path
+        :param views: List of view file paths (relative)
+        :param names: Name for each resulting image
+        :param width: Image width (before anti-aliasing halves it)
+        :param height: Image height (before anti-aliasing halves it)
+        :param qual: Rendering quality ('high' or not 'high')
+        :param illum: Render irradiance (-i) instead of radiance
+        :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :param procs: Number of RTRACE processes (-n), not available on Windows
+        :param ambient: Use the managed ambient cache of the octree (see cache.ambient_path)
+        :return: The (relative) file paths for the images.
+        """
+        # the picture sampling options only apply to rpict
+        params = sculpt.rpict_params(qual)
+        rtrace = " ".join(['rtrace', '-ff', '-h'] + sculpt.strip_params(params, ['-ps', '-pt', '-pj', '-pa']))
+        if illum:
+            rtrace += ' -i'
+        if not show_warnings:
+            rtrace += ' -w'
+        if procs > 1 and os.name != 'nt':
+            rtrace += f' -n {procs}'
+        if ambient:
+            rtrace += f' -af "{cache.ambient_path(projpath, oct, params)}"'
+        rtrace += f' "{oct}"'
+
+        env = sculpt.get_env()
+        sizes = [sculpt.view_res(projpath, view, width, height) for view in views]
+        datpath = os.path.join(projpath, 'results', 'imageBased', f'views_{os.getpid()}_{uuid.uuid4().hex[:8]}.dat')
+        with open(datpath, 'wb') as datfile:
+            tracer = subprocess.Popen(rtrace, shell=True, cwd=projpath, env=env, stdin=subprocess.PIPE, stdout=datfile)
+            for view, (x, y) in zip(views, sizes):
+                subprocess.run(f'vwrays -ff -vf "{view}" -x {x} -y {y}', shell=True, cwd=projpath, env=env,
+                               stdout=tracer.stdin)
+            tracer.stdin.close()
+            tracer.wait()
+
+        images = []
+        values = np.fromfile(datpath, dtype=np.float32)
+        if values.size != sum(x * y * 3 for x, y in sizes):
+            os.remove(datpath)
+            raise RuntimeError(f"RTRACE returned {values.size // 3} of {sum(x * y for x, y in sizes)} values")
+        start = 0
+        for name, (x, y) in zip(names, sizes):
+            img = values[start:start + x * y * 3].reshape(y, x, 3)
+            start += x * y * 3
+            imgpath = os.path.join('results', 'imageBased', f'{os.path.splitext(name)[0]}.hdr')
+            # anti-aliased and exposed as pfilt would, the exposure is kept in the header
+            img, exposure = imgproc.expose(imgproc.downsample(img))
+            hdr.write(os.path.join(projpath, imgpath), img, header=[f'EXPOSURE={exposure:e}'])
+            images.append(imgpath)
+        del values
+        os.remove(datpath)
+        return images
+
+
+    @staticmethod
+    def render_split(projpath, scene, model, view, name, colors=None, width=2560, height=1440, qual='high',
+                     illum=False, show_warnings=False, procs=1):
+        """
+        Render the Spot and LGP parts of the luminaires as two independent passes that run at the
+        same time. Each pass prepares its own luminaires and octree and renders its own image, so the
+        wall time is about that of a single pass. The octrees are removed once their pass is rendered.
+        :param projpath: Root directory for the currently running project
+        :param scene: Name of the scene, prefix of IES profiles to select.
+        :param model: Base octree file path
+        :param view: View file path (relative)
+        :param name: Name for the images, the subtype is appended (ie name_Spot)
+        :param colors: dict of subtype ('Spot', 'LGP') to its (R,G,B) color, None renders both in neutral white
+        :param width: Image width
+        :param height: Image height
+        :param qual: Rendering quality ('high' or not 'high')
+        :param illum: Render irradiance (-i) instead of radiance
+        :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :param procs: Number of RPICT processes per pass
+        :return: [Spot image path, LGP image path]
+        """
+        def render_pass(subtype):
+            color = (1.0, 1.0, 1.0) if colors is None else colors[subtype]
+            lum_files = sculpt.process_ies(projpath, scene, color, subtype)
+            oct = sculpt.gen_octree(projpath, lum_files, f'simModel_{name}_{subtype}.oct', baseOct=model)
+            try:
+                return sculpt.render_img(projpath, oct, view, f'{name}_{subtype}', width, height, qual, False, illum,
+                                         show_warnings, procs)
+            finally:
+                # the ambient cache is keyed by the octree contents, so the octree isn't needed afterwards
+                if os.path.exists(oct):
+                    os.remove(oct)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            return list(pool.map(render_pass, ['Spot', 'LGP']))
+
+
+    @staticmethod
+    def neutral_split(projpath, scene, model, view, width, height, qual='high', illum=False, show_warnings=False,
+                      procs=1):
+        """
+        Get neutral white Spot and LGP images of a scene for a view. Color is only a per channel
+        multiplier of each part of the luminaire, so these images can be tinted to any pair of color
+        temperatures with comb_img instead of rendering again. The images are kept in results/imageBased
+        and only rendered when missing or older than the scene's scalars, sculpted IES files or the model.
+        :param projpath: Root directory for the currently running project
+        :param scene: Name of the scene, prefix of IES profiles to select.
+        :param model: Base octree file path
+        :param view: View file path (relative)
+        :param width: Image width
+        :param height: Image height
+        :param qual: Rendering quality ('high' or not 'high')
+        :param illum: Render irradiance (-i) instead of radiance
+        :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :param procs: Number of RPICT processes per pass
+        :return: [Spot image path, LGP image path]
+        """
+        mode = 'illum' if illum else 'lum'
+        name = f'white_{scene}_{pathlib.Path(model).stem}_{pathlib.Path(view).stem}_{width}x{height}_{mode}_{qual}'
+        hdrs = [os.path.join('results', 'imageBased', f'{name}_{subtype}.hdr') for subtype in ['Spot', 'LGP']]
+
+        sources = [os.path.join(projpath, model), os.path.join(projpath, 'scenarios', 'scalars', f'{scene}.csv')]
+        sculptPath = os.path.join(projpath, 'ies', 'sculpted')
+        if scene == 'unknown':
+            sources.append(os.path.join(sculptPath, 'unsculpted.ies'))
+        elif os.path.exists(sculptPath):
+            sources.extend([os.path.join(sculptPath, f) for f in os.listdir(sculptPath) if f.startswith(f'{scene}_')])
+        newest = max([os.path.getmtime(f) for f in sources if os.path.exists(f)], default=0)
+        if all(os.path.exists(os.path.join(projpath, h)) and os.path.getmtime(os.path.join(projpath, h)) >= newest
+               for h in hdrs):
+            print(f"Reusing the neutral renderings of {scene}")
+            return hdrs
+        return sculpt.render_split(projpath, scene, model, view, name, None, width, height, qual, illum,
+                                   show_warnings, procs)
+
+
+    @staticmethod
+    def pfilt_cmd(input, output):
+        """
+        Build the PFILT command used to anti-alias (and halve the size of) an image.
+        :param input: Image path, None when the image is piped in
+        :param output: Image path, None when the image is piped on
+        :return: The Pfilt command.
+        """
+        pfilt = Pfilt(None, output, input)
+        pfilt.options.x = '/2'
+        pfilt.options.y = '/2'
+        pfilt.options.r = 0.6
+        return pfilt
+
     @staticmethod
     def filter(projpath, input, output):
         """
@@ -350,11 +1164,8 @@ class sculpt(object):
         :return:
         """
         env = sculpt.get_env()
-        pfilt = Pfilt(None, output, input)
-        pfilt.options.x = '/2'
-        pfilt.options.y = '/2'
-        pfilt.options.r = 0.6
-        pfilt.run(env, cwd=projpath)
+        pfilt = sculpt.pfilt_cmd(input, output)
+        sculpt.run_cmd(pfilt, projpath, env)
         return output
 
     @staticmethod
@@ -368,12 +1179,12 @@ class sculpt(object):
         """
         ragif = Ra_GIF(None, gifpath, hdrpath)
         env = sculpt.get_env()
-        ragif.run(env, cwd=projpath)
+        sculpt.run_cmd(ragif, projpath, env)
         return gifpath
 
 
     @staticmethod
-    def comb_img(projpath, inputImgs, name, cond=False, aa=True):
+    def comb_img(projpath, inputImgs, name, cond=False, aa=True, colors=None):
         """
         Combine multiple images to composite one result. here used to combine
         multiple simulation passes using different CCT values for different parts
@@ -383,21 +1194,27 @@ class sculpt(object):
         :param name: Name for the resulting combined image.
         :param cond: Apply the -h flag for PCOND for mimicking 'human visual response'
         :param aa: Boolean for whether to apply anti-aliasing using PFILT after combining.
+        :param colors: [OPTIONAL] (R,G,B) multiplier per input image, ie to tint neutral white passes
         :return: The file path for the combined image.
         """
         comb = os.path.join(projpath, 'results', 'imageBased', f'{name}.hdr')
         if cond:
             comb = os.path.join(projpath, 'results', 'imageBased', f'{name}_comb.hdr')
-        pcomb = Pcomb(None, comb, inputImgs)
         env = sculpt.get_env()
+        if colors is None:
+            pcomb = Pcomb(None, comb, inputImgs)
+        else:
+            # HB Pcomb has no per input options, so the -c multipliers are written out directly
+            pcomb = 'pcomb ' + ' '.join(f'-c {c[0]} {c[1]} {c[2]} "{img}"' for img, c in zip(inputImgs, colors))
+            pcomb += f' > "{comb}"'
         #print(pcomb.to_radiance())
-        pcomb.run(env, cwd=projpath)
+        sculpt.run_cmd(pcomb, projpath, env)
         imgpath = comb
         if cond:
             condPath = os.path.join(projpath, 'results', 'imageBased', f'{name}.hdr')
             pcond = Pcond(None, condPath, comb)
             pcond.options.h = True
-            pcond.run(env, cwd=projpath)
+            sculpt.run_cmd(pcond, projpath, env)
             imgpath = condPath
         if aa:
             aapath = imgpath.replace('.hdr', '_aa.hdr')
@@ -406,17 +1223,16 @@ class sculpt(object):
 
 
     @staticmethod
-    def to_falsecolor(projpath, hdrpath, fcpath, pal, scale, width, height):
+    def falsecolor_cmd(hdrpath, fcpath, pal, scale, width, height):
         """
-        Run the Falsecolor command on a simulated image.
-        :param projpath: Root directory for the currently running project
-        :param hdrpath: Path to the HDR file to convert to falsecolor
-        :param fcpath: Path to the resulting falsecolor HDR image
+        Build the Falsecolor command for an illuminance image.
+        :param hdrpath: Path to the HDR file, None when the image is piped in
+        :param fcpath: Path to the resulting falsecolor HDR image, None when the image is piped on
         :param pal: Palette name ('def', 'pm3d', 'spec', 'hot')
         :param scale: Max legend value
         :param width: Width of the legend
         :param height: Height of the legend
-        :return: The file path to the falsecolor HDR file.
+        :return: The Falsecolor command.
         """
         fc = Falsecolor(None, fcpath, hdrpath)
         fc.options.pal = pal
@@ -427,14 +1243,30 @@ class sculpt(object):
         fc.options.pal = pal
         fc.options.lw = width
         fc.options.lh = height
+        return fc
+
+    @staticmethod
+    def to_falsecolor(projpath, hdrpath, fcpath, pal, scale, width, height):
+        """
+        Run the Falsecolor command on a simulated image.
+        :param projpath: Root directory for the currently running project
+        :param hdrpath: Path to the HDR file to convert to falsecolor
+        :param fcpath: Path to the resulting falsecolor HDR image
+        :param pal: Palette name ('def', 'pm3d', 'spec', 'hot')
+        :param scale: Max legend value
+        :param width: Width of the legend
+        :param height: Height of the legend
+        :return: The file path to the falsecolor HDR file.
+        """
+        fc = sculpt.falsecolor_cmd(hdrpath, fcpath, pal, scale, width, height)
         env = sculpt.get_env()
         #print(fc.to_radiance())
-        fc.run(env, cwd=projpath)
+        sculpt.run_cmd(fc, projpath, env)
         return fcpath
 
 
     @staticmethod
-    def sim_grid(projpath, oct, grid, name, qual='high', show_warnings=False):
+    def sim_grid(projpath, oct, grid, name, qual='high', show_warnings=False, ambient=True):
         """
         Perform a grid-based simulation with RTRACE
         :param projpath: Root directory for the currently running project
@@ -443,27 +1275,26 @@ class sculpt(object):
         :param name: Name for the simulation results
         :param qual: Simulation quality that drives parameter settings ('high' or not 'high')
         :param show_warnings: Warnings have been supressed by default, so to see warnings set to true
+        :param ambient: Use the managed ambient cache of the octree (see cache.ambient_path)
         :return: The file path for the simulation results.
         """
-
-
-        rtrace_low = '-I -h -aa 0.25 -ab 2 -ad 512 -ar 16 -as 128 -dc 0.25 -dj 0.0 -dp 64 -dr 0 -ds 0.5 -dt 0.5'\
-                    '-lr 4 -lw 0.05 -ss 0.0 -st 0.85'
-        rtrace_high = '-I -h -aa 0.1 -ab 6 -ad 4096 -ar 128 -as 4096 -dc 0.75 -dj 1.0 -dp 512 -dr 3 -ds 0.05 -dt 0.15'\
-                      '-lr 8 -lw 0.005 -ss 1.0 -st 0.15'
+        params = sculpt.rtrace_params(qual)
         name = os.path.splitext(name)[0]
         respath = os.path.join(projpath, 'results', 'gridBased', f'{name}.res')
         rtrace = Rtrace(None, respath, oct, grid)
-        if qual.lower() == 'high':
-            rtrace.options.update_from_string(rtrace_high)
-        else:
-            rtrace.options.update_from_string(rtrace_low)
+        rtrace.options.update_from_string(params)
         if not show_warnings:
             rtrace.options.w = show_warnings
 
         # run the command
         env = sculpt.get_env()
-        rtrace.run(env, cwd=projpath)
+        if ambient:
+            ambpath = cache.ambient_path(projpath, oct, params)
+            rtrace.options.af = ambpath
+            with sculpt.ambient_lock(ambpath):
+                sculpt.run_cmd(rtrace, projpath, env)
+        else:
+            sculpt.run_cmd(rtrace, projpath, env)
         return respath
 
 
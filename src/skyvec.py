@@ -0,0 +1,340 @@
+import os
+import numpy as np
+from cache import cache
+
+
+class skyvec(object):
+    """
+    Class full of static functions to generate skies for many hours at once with NumPy, rather than
+    one honeybee CIE object and sky file per date and time.
+
+    Sun positions use the same solar time, declination, altitude and azimuth formulas as GENSKY,
+    so the batch sky files and sky vectors agree with the point-in-time skies. Sky vectors use the
+    Reinhart/Tregenza patches of reinhartb.cal (bin 0 is the ground, then rows of patches from the
+    horizon up with the azimuth Atan2(Dx, -Dy), then the zenith cap), the same layout as GENDAYMTX and
+    the daylight coefficients of the daylight class, so they can be used in place of a GENDAYMTX sky
+    matrix. The diffuse sky follows one of the 15 CIE (ISO 15469) standard general skies, or the Perez
+    all-weather sky of each hour's irradiances (as GENDAYMTX and GENDAYLIT), scaled to the diffuse
+    horizontal irradiance, with the direct normal irradiance in the patch holding the sun.
+
+    Angles are in degrees, longitudes are east positive and time zones are hours from UTC, as for
+    sculpt.gen_cie_sky. Sky vectors are memoized in memory and in cache/skies by their inputs.
+    """
+
+    # a, b, c, d, e of the CIE standard general skies 1 - 15
+    CIE_PARAMS = np.array([
+        [4.0, -0.70, 0, -1.0, 0.00],
+        [4.0, -0.70, 2, -1.5, 0.15],
+        [1.1, -0.80, 0, -1.0, 0.00],
+        [1.1, -0.80, 2, -1.5, 0.15],
+        [0.0, -1.00, 0, -1.0, 0.00],
+        [0.0, -1.00, 2, -1.5, 0.15],
+        [0.0, -1.00, 5, -2.5, 0.30],
+        [0.0, -1.00, 10, -3.0, 0.45],
+        [-1.0, -0.55, 2, -1.5, 0.15],
+        [-1.0, -0.55, 5, -2.5, 0.30],
+        [-1.0, -0.55, 10, -3.0, 0.45],
+        [-1.0, -0.32, 10, -3.0, 0.45],
+        [-1.0, -0.32, 16, -3.0, 0.30],
+        [-1.0, -0.15, 16, -3.0, 0.30],
+        [-1.0, -0.15, 24, -2.8, 0.15]])
+
+    # Perez all-weather sky coefficients a, b, c, d, e (4 each) per sky clearness bin, as in GENDAYLIT
+    PEREZ_PARAMS = np.array([
+        [1.3525, -0.2576, -0.2690, -1.4366, -0.7670, 0.0007, 1.2734, -0.1233, 2.8000, 0.6004, 1.2375, 1.0000,
+         1.8734, 0.6297, 0.9738, 0.2809, 0.0356, -0.1246, -0.5718, 0.9938],
+        [-1.2219, -0.7730, 1.4148, 1.1016, -0.2054, 0.0367, -3.9128, 0.9156, 6.9750, 0.1774, 6.4477, -0.1239,
+         -1.5798, -0.5081, -1.7812, 0.1080, 0.2624, 0.0672, -0.2190, -0.4285],
+        [-1.1000, -0.2515, 0.8952, 0.0156, 0.2782, -0.1812, -4.5000, 1.1766, 24.7219, -13.0812, -37.7000, 34.8438,
+         -5.0000, 1.5218, 3.9229, -2.6204, -0.0156, 0.1597, 0.4199, -0.5562],
+        [-0.5484, -0.6654, -0.2672, 0.7117, 0.7234, -0.6219, -5.6812, 2.6297, 33.3389, -18.3000, -62.2500, 52.0781,
+         -3.5000, 0.0016, 1.1477, 0.1062, 0.4659, -0.3296, -0.0876, -0.0329],
+        [-0.6000, -0.3566, -2.5000, 2.3250, 0.2937, 0.0496, -5.6812, 1.8415, 21.0000, -4.7656, -21.5906, 7.2492,
+         -3.5000, -0.1554, 1.4062, 0.3988, 0.0032, 0.0766, -0.0656, -0.1294],
+        [-1.0156, -0.3670, 1.0078, 1.4051, 0.2875, -0.5328, -3.8500, 3.3750, 14.0000, -0.9999, -7.1406, 7.5469,
+         -3.4000, -0.1078, -1.0750, 1.5702, -0.0672, 0.4016, 0.3017, -0.4844],
+        [-1.0000, 0.0211, 0.5025, -0.5119, -0.3000, 0.1922, 0.7023, -1.6317, 19.0000, -5.0000, 1.2438, -1.9094,
+         -4.0000, 0.0250, 0.3844, 0.2656, 1.0468, -0.3788, -2.4517, 1.4656],
+        [-1.0500, 0.0289, 0.4260, 0.3590, -0.3250, 0.1156, 0.7781, 0.0025, 31.0625, -14.5000, -46.1148, 55.3750,
+         -7.2312, 0.4050, 13.3500, 0.6234, 1.5000, -0.6426, 1.8564, 0.5636]]).reshape(8, 5, 4)
+
+    # upper limits of the Perez sky clearness bins
+    PEREZ_CLEARNESS = np.array([1.065, 1.230, 1.500, 1.950, 2.800, 4.500, 6.200])
+
+    # solid angle of the sun, a 0.533 degree disc as GENSKY and GENDAYLIT use
+    SUN_OMEGA = 2 * np.pi * (1 - np.cos(np.radians(0.533 / 2)))
+
+    # GENSKY sky type flags for sculpt.gen_cie_sky sky types 0 - 5
+    GENSKY_TYPES = ['+s', '-s', '+i', '-i', '-c', '-u']
+
+    # patches per row of the Tregenza sky, from the horizon up
+    TNAZ = [30, 30, 24, 24, 18, 12, 6]
+
+    # first day of each month in the year
+    MONTH_DAYS = np.array([0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334])
+
+    # sky vectors by the hash of their inputs
+    _skies = {}
+
+    @staticmethod
+    def sun_positions(latitude, longitude, timezone, month, day, hour):
+        """
+        Get the sun position of every time, as GENSKY does.
+        :param latitude: Site latitude
+        :param longitude: Site longitude, east positive
+        :param timezone: Time zone offset in hours, ie -5
+        :param month: Array of months (1-12)
+        :param day: Array of days (1-31)
+        :param hour: Array of local standard times (0.0-23.99)
+        :return: [0] altitudes\n[1] azimuths (west of south)\n[2] (times x 3) sun directions
+        """
+        month = np.asarray(month, dtype=int)
+        jd = skyvec.MONTH_DAYS[month - 1] + np.asarray(day, dtype=float)
+        lat = np.radians(latitude)
+        # GENSKY works in radians with longitude and standard meridian west positive
+        stadj = 0.170 * np.sin((4 * np.pi / 373) * (jd - 80)) - 0.129 * np.sin((2 * np.pi / 355) * (jd - 8)) + \
+            12 / np.pi * (np.radians(-timezone * 15) - np.radians(-longitude))
+        st = np.asarray(hour, dtype=float) + stadj
+        sd = 0.4093 * np.sin((2 * np.pi / 368) * (jd - 81))
+        alt = np.arcsin(np.sin(lat) * np.sin(sd) - np.cos(lat) * np.cos(sd) * np.cos(st * (np.pi / 12)))
+        azi = -np.arctan2(np.cos(sd) * np.sin(st * (np.pi / 12)),
+                          -np.cos(lat) * np.sin(sd) - np.sin(lat) * np.cos(sd) * np.cos(st * (np.pi / 12)))
+        dirs = np.stack([-np.sin(azi) * np.cos(alt), -np.cos(azi) * np.cos(alt), np.sin(alt)], axis=-1)
+        return [np.degrees(alt), np.degrees(azi), dirs]
+
+    @staticmethod
+    def patches(mf=1):
+        """
+        Get the center directions and solid angles of the sky patches, ground first.
+        :param mf: Reinhart subdivision, 1 is the Tregenza sky
+        :return: [0] (patches x 3) directions\n[1] (patches) solid angles in steradians
+        """
+        alpha = np.radians(90 / (7 * mf + 0.5))
+        dirs = [(0.0, 0.0, -1.0)]
+        omega = [2 * np.pi]
+        for r in range(7 * mf):
+            naz = mf * skyvec.TNAZ[r // mf]
+            alt = (r + 0.5) * alpha
+            az = 2 * np.pi * np.arange(naz) / naz
+            dirs.extend(zip(np.sin(az) * np.cos(alt), -np.cos(az) * np.cos(alt), np.full(naz, np.sin(alt))))
+            omega.extend([2 * np.pi * (np.sin((r + 1) * alpha) - np.sin(r * alpha)) / naz] * naz)
+        dirs.append((0.0, 0.0, 1.0))
+        omega.append(2 * np.pi * (1 - np.sin(7 * mf * alpha)))
+        return [np.array(dirs), np.array(omega)]
+
+    @staticmethod
+    def patch_index(dirs, mf=1):
+        """
+        Get the patch each direction falls in, as reinhartb.cal's rbin.
+        :param dirs: (n x 3) unit directions
+        :param mf: Reinhart subdivision
+        :return: (n) patch indices, 0 for the ground
+        """
+        dirs = np.atleast_2d(dirs)
+        alpha = 90 / (7 * mf + 0.5)
+        alt = np.degrees(np.arcsin(np.clip(dirs[:, 2], -1, 1)))
+        azi = np.degrees(np.arctan2(dirs[:, 0], -dirs[:, 1])) % 360
+        naz = np.array([mf * skyvec.TNAZ[r // mf] for r in range(7 * mf)] + [1])
+        start = np.concatenate(([1], 1 + np.cumsum(naz)[:-1]))
+        row = np.minimum(np.floor(alt / alpha).astype(int), 7 * mf)
+        row = np.maximum(row, 0)
+        inc = np.floor(azi * naz[row] / 360 + 0.5).astype(int) % naz[row]
+        return np.where(dirs[:, 2] > 0, start[row] + inc, 0)
+
+    @staticmethod
+    def cie_distribution(skytype, sundirs, dirs):
+        """
+        Get the relative luminance of sky directions for a CIE standard general sky, 1 at the zenith.
+        :param skytype: CIE standard general sky (1 - 15)
+        :param sundirs: (times x 3) sun directions
+        :param dirs: (patches x 3) sky directions, above the horizon
+        :return: (times x patches) array
+        """
+        a, b, c, d, e = skyvec.CIE_PARAMS[skytype - 1]
+        cosz = np.clip(dirs[:, 2], 1e-6, 1)
+        cossz = np.clip(sundirs[:, 2], -1, 1)
+        chi = np.arccos(np.clip(sundirs @ dirs.T, -1, 1))
+        zs = np.arccos(cossz)
+
+        def f(x):
+            return 1 + c * (np.exp(d * x) - np.exp(d * np.pi / 2)) + e * np.cos(x) ** 2
+
+        phi = 1 + a * np.exp(b / cosz)
+        return f(chi) * phi / (f(zs)[:, None] * (1 + a * np.exp(b)))
+
+    @staticmethod
+    def perez_params(sundirs, dirnorm, difhor, month, day):
+        """
+        Get the Perez all-weather sky coefficients of every time from its irradiances, sky clearness and
+        brightness, as GENDAYLIT (-W) does.
+        :param sundirs: (times x 3) sun directions
+        :param dirnorm: Array of direct normal irradiances (W/m2)
+        :param difhor: Array of diffuse horizontal irradiances (W/m2)
+        :param month: Array of months
+        :param day: Array of days
+        :return: (times x 5) array of a, b, c, d, e
+        """
+        jd = skyvec.MONTH_DAYS[np.asarray(month, dtype=int) - 1] + np.asarray(day, dtype=float)
+        # the sun is kept at the horizon for the twilight hours
+        zenith = np.arccos(np.clip(sundirs[:, 2], 0, 1))
+        airmass = 1 / (np.cos(zenith) + 0.15 * (93.885 - np.degrees(zenith)) ** -1.253)
+        extra = 1367 * (1 + 0.033 * np.cos(2 * np.pi * jd / 365))
+        brightness = np.maximum(difhor * airmass / extra, 0.01)
+        clearness = np.divide(difhor + dirnorm, difhor, out=np.full_like(difhor, 1e6), where=difhor > 0)
+        clearness = (clearness + 1.041 * zenith ** 3) / (1 + 1.041 * zenith ** 3)
+        coeffs = skyvec.PEREZ_PARAMS[np.searchsorted(skyvec.PEREZ_CLEARNESS, clearness)]
+        params = coeffs[:, :, 0] + coeffs[:, :, 1] * zenith[:, None] + \
+            brightness[:, None] * (coeffs[:, :, 2] + coeffs[:, :, 3] * zenith[:, None])
+        # the overcast bin has its own c and d
+        first = clearness < skyvec.PEREZ_CLEARNESS[0]
+        c, d = coeffs[first, 2], coeffs[first, 3]
+        z, br = zenith[first], brightness[first]
+        params[first, 2] = np.exp((br * (c[:, 0] + c[:, 1] * z)) ** c[:, 2]) - c[:, 3]
+        params[first, 3] = -np.exp(br * (d[:, 0] + d[:, 1] * z)) + d[:, 2] + br * d[:, 3]
+        return params
+
+    @staticmethod
+    def perez_distribution(params, sundirs, dirs):
+        """
+        Get the relative luminance of sky directions for Perez all-weather skies.
+        :param params: (times x 5) coefficients from skyvec.perez_params
+        :param sundirs: (times x 3) sun directions
+        :param dirs: (patches x 3) sky directions, above the horizon
+        :return: (times x patches) array
+        """
+        a, b, c, d, e = [params[:, i, None] for i in range(5)]
+        cosz = np.clip(dirs[:, 2], 1e-6, 1)
+        cosg = np.clip(sundirs @ dirs.T, -1, 1)
+        with np.errstate(over='ignore'):
+            lum = (1 + a * np.exp(b / cosz)) * (1 + c * np.exp(d * np.arccos(cosg)) + e * cosg ** 2)
+        return np.nan_to_num(np.maximum(lum, 0), posinf=0.0)
+
+    @staticmethod
+    def sky_vectors(latitude, longitude, timezone, month, day, hour, dirnorm, difhor, skytype=12, mf=1,
+                    groundrefl=0.2, projpath=None):
+        """
+        Get the sky vectors of many times in the GENDAYMTX layout. The diffuse sky is scaled so that it
+        gives the diffuse horizontal irradiance, the sun's direct normal irradiance is spread over the
+        patch that holds it and the ground is uniform at the ground reflectance times the global horizontal
+        irradiance. Values are Radiance radiances, so 179 x irradiance is illuminance.
+        :param latitude: Site latitude
+        :param longitude: Site longitude, east positive
+        :param timezone: Time zone offset in hours
+        :param month: Array of months
+        :param day: Array of days
+        :param hour: Array of local standard times
+        :param dirnorm: Array of direct normal irradiances (W/m2)
+        :param difhor: Array of diffuse horizontal irradiances (W/m2)
+        :param skytype: CIE standard general sky (1 - 15), default 12 (CIE standard clear sky), or 'perez' for the
+                        Perez all-weather sky of each time's irradiances
+        :param mf: Reinhart subdivision, 1 is the Tregenza sky
+        :param groundrefl: Ground reflectance
+        :param projpath: [OPTIONAL] Root directory for the project, to keep the sky vectors in cache/skies
+        :return: (patches x times x 3) float32 array
+        """
+        inputs = [np.asarray(v, dtype=float) for v in (month, day, hour, dirnorm, difhor)]
+        key = cache.key(latitude, longitude, timezone, skytype, mf, groundrefl,
+                        *[v.tobytes().hex() for v in inputs])
+        if key in skyvec._skies:
+            return skyvec._skies[key]
+        smxPath = None
+        if projpath is not None:
+            smxPath = os.path.join(cache.get_dir(projpath, 'skies'), f'{key}.npy')
+            if os.path.exists(smxPath):
+                skyvec._skies[key] = np.load(smxPath)
+                return skyvec._skies[key]
+
+        month, day, hour, dirnorm, difhor = inputs
+        alt, azi, sundirs = skyvec.sun_positions(latitude, longitude, timezone, month, day, hour)
+        dirs, omega = skyvec.patches(mf)
+        up = dirs[1:, 2]
+
+        # diffuse sky, normalized to the diffuse horizontal irradiance
+        if skytype == 'perez':
+            rel = skyvec.perez_distribution(skyvec.perez_params(sundirs, dirnorm, difhor, month, day), sundirs,
+                                            dirs[1:])
+        else:
+            rel = skyvec.cie_distribution(skytype, sundirs, dirs[1:])
+        horiz = rel @ (up * omega[1:])
+        scale = np.divide(difhor, horiz, out=np.zeros_like(difhor), where=horiz > 0)
+        smx = np.zeros((len(dirs), len(hour)), dtype=np.float64)
+        smx[1:] = (rel * scale[:, None]).T
+
+        # sun, in the patch holding it
+        lit = (alt > 0) & (dirnorm > 0)
+        idx = skyvec.patch_index(sundirs[lit], mf)
+        np.add.at(smx, (idx, np.flatnonzero(lit)), dirnorm[lit] / omega[idx])
+
+        # ground
+        smx[0] = groundrefl * (difhor + dirnorm * np.maximum(sundirs[:, 2], 0)) / np.pi
+        smx = np.repeat(smx[:, :, None], 3, axis=2).astype(np.float32)
+
+        skyvec._skies[key] = smx
+        if smxPath is not None:
+            tmpPath = f"{smxPath}.{os.getpid()}.tmp.npy"
+            np.save(tmpPath, smx)
+            os.replace(tmpPath, smxPath)
+        return smx
+
+    @staticmethod
+    def sky_files(projpath, latitude, longitude, timezone, month, day, hour, skytype=0, north=0, groundrefl=0.2,
+                  dirnorm=None, difhor=None):
+        """
+        Write a sky file for each time, named as sculpt.gen_cie_sky names them. The GENSKY sky types are
+        written as GENSKY commands so they match sculpt.gen_cie_sky exactly. Perez all-weather skies are computed
+        here for all of the times at once and written as GENDAYLIT writes them, a sun source and perezlum.cal.
+        :param projpath: Root directory for the project
+        :param latitude: Site latitude
+        :param longitude: Site longitude, east positive
+        :param timezone: Time zone offset in hours
+        :param month: Array of months
+        :param day: Array of days
+        :param hour: Array of local standard times
+        :param skytype: 0 - Sunny w/Sun, 1 - Sunny w/o Sun, 2 - Intermediate w/Sun, 3 - Intermediate w/o Sun,
+                        4 - Cloudy, 5 - Uniform, 'perez' - Perez all-weather sky of dirnorm and difhor
+        :param north: north rotation if needed #type: float
+        :param groundrefl: default ground reflectance #type: float
+        :param dirnorm: [OPTIONAL] Array of direct normal irradiances (W/m2), for the Perez skies
+        :param difhor: [OPTIONAL] Array of diffuse horizontal irradiances (W/m2), for the Perez skies
+        :return: list of sky file paths (relative)
+        """
+        os.makedirs(os.path.join(projpath, 'skies'), exist_ok=True)
+        month, day, hour = [np.atleast_1d(v) for v in (month, day, hour)]
+        rotate = f" | xform -rz {north}" if north != 0 else ""
+        glow = "skyfunc glow sky_glow\n0\n0\n4 1 1 1 0\n\nsky_glow source sky\n0\n0\n4 0 0 1 180\n\n" \
+               "skyfunc glow ground_glow\n0\n0\n4 1 1 1 0\n\nground_glow source ground\n0\n0\n4 0 0 -1 180\n"
+        skies = []
+        if skytype == 'perez':
+            dirnorm, difhor = [np.atleast_1d(np.asarray(v, dtype=float)) for v in (dirnorm, difhor)]
+            alt, azi, sundirs = skyvec.sun_positions(latitude, longitude, timezone, month, day, hour)
+            params = skyvec.perez_params(sundirs, dirnorm, difhor, month, day)
+            # diffuse normalization over a fine patch grid, so the sky gives the diffuse horizontal irradiance
+            dirs, omega = skyvec.patches(4)
+            horiz = skyvec.perez_distribution(params, sundirs, dirs[1:]) @ (dirs[1:, 2] * omega[1:])
+            diffnorm = np.divide(difhor, horiz, out=np.zeros_like(difhor), where=horiz > 0)
+            ground = groundrefl * (difhor + dirnorm * np.maximum(sundirs[:, 2], 0)) / np.pi
+            rz = np.radians(north)
+            sundirs = sundirs @ np.array([[np.cos(rz), np.sin(rz), 0], [-np.sin(rz), np.cos(rz), 0], [0, 0, 1]])
+            for t in range(len(hour)):
+                sx, sy, sz = sundirs[t]
+                sky = ""
+                if alt[t] > 0 and dirnorm[t] > 0:
+                    sun = dirnorm[t] / skyvec.SUN_OMEGA
+                    sky += f"void light solar\n0\n0\n3 {sun:.6e} {sun:.6e} {sun:.6e}\n\n" \
+                           f"solar source sun\n0\n0\n4 {sx:.6f} {sy:.6f} {sz:.6f} 0.533\n\n"
+                a, b, c, d, e = params[t]
+                sky += f"void brightfunc skyfunc\n2 skybright perezlum.cal\n0\n10 {diffnorm[t]:.6e} {ground[t]:.6e} " \
+                       f"{a:.6f} {b:.6f} {c:.6f} {d:.6f} {e:.6f} {sx:.6f} {sy:.6f} {sz:.6f}\n\n{glow}"
+                skies.append(sky)
+        else:
+            for m, d, h in zip(month, day, hour):
+                skies.append(f"!gensky {int(m)} {int(d)} {h:.6f} {skyvec.GENSKY_TYPES[skytype]} -a {latitude:.6f} "
+                             f"-o {-longitude:.6f} -m {-timezone * 15:.1f} -g {groundrefl:.3f}{rotate}\n\n{glow}")
+        paths = []
+        for m, d, h, sky in zip(month, day, hour, skies):
+            hm = int(np.floor(h))
+            skypath = os.path.join('skies', f"{int(m):02}{int(d):02}_{hm:02}{int(round((h - hm) * 60)):02}.sky")
+            with open(os.path.join(projpath, skypath), 'w') as sfile:
+                sfile.write(sky)
+            paths.append(skypath)
+        return paths
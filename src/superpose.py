@@ -0,0 +1,212 @@
+import os
+import numpy as np
+from cache import cache
+from hdr import hdr
+from matrix import matrix
+from basis import basis
+from daylight import daylight
+
+
+class superpose(object):
+    """
+    Class full of static functions to combine stored daylight and electric lighting results without a new
+    simulation. Light transport is linear, so the results of the sky and of each sculpted scene, simulated on
+    their own, add up to the result of them together, and dimming a source scales its result.
+
+    A result is referenced by name, with an optional '@row' to select one hour or scene of it:
+
+        results/gridBased/<name>.res            grid results (gridSky, illumSimple, ...)
+        results/gridBased/<name>_annual.npy     annual daylight (gridSky -a), ie NYC@0621_1400
+        results/imageBased/<name>.hdr           renderings (lumSky, illumSky, lumSimple, ...)
+        scenarios/scalars/<name>.csv            sculpted scenes (optimize.py), predicted from the contribution
+                                                matrix for grids or from a basis (genBasis.py) for images
+
+    Grid results are (rows x sensors) arrays of lux and image results are (rows x height x width x 3) arrays of
+    radiance or irradiance. Results with several rows are matched by row name, and single row results are added
+    to every row. Files are read once, and kept in memory by their path and modification time.
+    """
+
+    # arrays by file path, modification time and size
+    _arrays = {}
+
+    @staticmethod
+    def read(path, loader):
+        """
+        Read a file once, keeping the result in memory until the file changes.
+        :param path: File path
+        :param loader: Function reading the file path
+        :return: The result of the loader.
+        """
+        stat = os.stat(path)
+        key = cache.key(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        if key not in superpose._arrays:
+            superpose._arrays[key] = loader(path)
+        return superpose._arrays[key]
+
+    @staticmethod
+    def find(projpath, ref):
+        """
+        Find the file of a result reference, with the row it selects.
+        :param projpath: Root directory for the project
+        :param ref: Result name or file path, optionally followed by @row
+        :return: [0] file path\n[1] row name or None
+        """
+        name, row = ref, None
+        for attempt in range(2):
+            candidates = [name, os.path.join(projpath, name),
+                          os.path.join(projpath, 'results', 'gridBased', f'{name}.res'),
+                          os.path.join(projpath, 'results', 'gridBased', f'{name}.npy'),
+                          os.path.join(projpath, 'results', 'gridBased', f'{name}_annual.npy'),
+                          os.path.join(projpath, 'results', 'imageBased', f'{name}.hdr'),
+                          os.path.join(projpath, 'scenarios', 'scalars', f'{name}.csv')]
+            for c in candidates:
+                if os.path.isfile(c):
+                    return [c, row]
+            # scene names can hold an '@', so the row is only split off when the whole name isn't found
+            if '@' not in ref:
+                break
+            name, row = ref.rsplit('@', 1)
+        raise ValueError(f"No result found for '{ref}'")
+
+    @staticmethod
+    def load(projpath, ref, mtxPath=None, basisName=None):
+        """
+        Load a result.
+        :param projpath: Root directory for the project
+        :param ref: Result name or file path, optionally followed by @row
+        :param mtxPath: [OPTIONAL] Contribution matrix CSV file, to predict the grids of scalars
+        :param basisName: [OPTIONAL] Name of a basis (genBasis.py), to predict the images of scalars
+        :return: [0] 'grid' or 'image'\n[1] row names, None for a single row\n[2] array of rows
+        """
+        path, row = superpose.find(projpath, ref)
+        ext = os.path.splitext(path)[1].lower()
+        if ext == '.res':
+            kind, names, values = 'grid', None, superpose.read(path, matrix.read_res)[None]
+        elif ext == '.npy':
+            kind = 'grid'
+            names, values = superpose.read(path, superpose.read_annual)
+        elif ext == '.hdr':
+            kind, names, values = 'image', None, superpose.read(path, hdr.read)[None]
+        elif ext == '.csv':
+            names, columns, scalars = superpose.read(path, matrix.load_scalars)
+            if basisName is not None:
+                info, stack = basis.load(projpath, basisName)
+                if columns != [str(c) for c in info['columns']]:
+                    raise ValueError(f"{path} does not match the controls of the basis {basisName}")
+                weights = basis.channel_scalars(info['incidence'], scalars)
+                if row is not None:
+                    weights = weights[superpose.row_index(names, row, path)][None]
+                    names, row = None, None
+                kind, values = 'image', np.stack([basis.combine(stack, w) for w in weights])
+            elif mtxPath is not None:
+                header, mtx = superpose.read(mtxPath, matrix.load)
+                if columns != header:
+                    raise ValueError(f"{path} does not match the controls of {mtxPath}")
+                kind, values = 'grid', (scalars @ mtx.T).astype(np.float32)
+            else:
+                raise ValueError(f"A contribution matrix or basis is needed for the scene '{ref}'")
+            if names is not None and len(names) == 1:
+                names = None
+        else:
+            raise ValueError(f"Unknown result type '{path}'")
+        if row is not None:
+            if names is None:
+                raise ValueError(f"'{ref}' has a single row, there is no row '{row}'")
+            values = values[superpose.row_index(names, row, path)][None]
+            names = None
+        return [kind, names, values]
+
+    @staticmethod
+    def read_annual(path):
+        """
+        Read annual results (daylight.save) with their hour names.
+        :param path: Path to the <name>_annual.npy file
+        :return: [0] hour names\n[1] (hours x sensors) array
+        """
+        with np.load(path.replace('.npy', '_info.npz')) as info:
+            names = [str(h) for h in info['hours']]
+        return [names, np.load(path, mmap_mode='r')]
+
+    @staticmethod
+    def row_index(names, row, path=''):
+        """
+        Get the index of a row name. Hours (MMDD_HHMM) that aren't a row match the nearest hour of the same day
+        within an hour, as weather file hours are usually at the half hour.
+        :param names: Row names
+        :param row: Row name
+        :param path: File path, for the error message
+        :return: #type: int
+        """
+        if row in names:
+            return names.index(row)
+
+        def minutes(name):
+            day, _, time = name.partition('_')
+            if len(day) != 4 or len(time) != 4 or not (day + time).isdigit():
+                return None
+            return int(time[:2]) * 60 + int(time[2:])
+
+        target = minutes(row)
+        if target is not None:
+            nearest = [(abs(minutes(n) - target), i) for i, n in enumerate(names)
+                       if minutes(n) is not None and n[:4] == row[:4]]
+            if len(nearest) > 0 and min(nearest)[0] <= 60:
+                return min(nearest)[1]
+        raise ValueError(f"{path} has no row '{row}'")
+
+    @staticmethod
+    def combine(results, weights):
+        """
+        Add up weighted results. Results with several rows are matched by row name, in the order of the first of
+        them, and single row results are added to every row.
+        :param results: List of results from superpose.load
+        :param weights: Weight of each result, ie 0.6 for a scene dimmed to 60%
+        :return: [0] 'grid' or 'image'\n[1] row names, None for a single row\n[2] float32 array of rows
+        """
+        kinds = set(r[0] for r in results)
+        if len(kinds) > 1:
+            raise ValueError("Grid and image results can't be combined")
+        shapes = set(r[2].shape[1:] for r in results)
+        if len(shapes) > 1:
+            raise ValueError(f"The results have different sizes: {', '.join(str(s) for s in shapes)}")
+        names = next((r[1] for r in results if r[1] is not None), None)
+        rows = 1 if names is None else len(names)
+        out = np.zeros((rows,) + results[0][2].shape[1:], dtype=np.float32)
+        for (kind, rnames, values), w in zip(results, weights):
+            if rnames is None:
+                out += np.float32(w) * values
+            elif rnames == names:
+                out += np.float32(w) * values
+            else:
+                index = {n: i for i, n in enumerate(rnames)}
+                missing = [n for n in names if n not in index]
+                if len(missing) > 0:
+                    raise ValueError(f"A result has no row '{missing[0]}'")
+                out += np.float32(w) * values[[index[n] for n in names]]
+        return [results[0][0], names, out]
+
+    @staticmethod
+    def save(projpath, name, result):
+        """
+        Save a combined result. A single grid is saved as a .res file of neutral irradiances, so it reads as any
+        other grid result, and several grids as annual results. Images are saved as one .hdr file per row.
+        :param projpath: Root directory for the project
+        :param name: Name for the results
+        :param result: Result from superpose.combine
+        :return: list of file paths
+        """
+        kind, names, values = result
+        if kind == 'grid':
+            if names is None:
+                root = os.path.join(projpath, 'results', 'gridBased')
+                os.makedirs(root, exist_ok=True)
+                resPath = os.path.join(root, f'{name}.res')
+                with open(resPath, 'w') as rfile:
+                    for v in values[0] / 179.0:
+                        rfile.write(f"{v:.6e}\t{v:.6e}\t{v:.6e}\n")
+                return [resPath]
+            return [daylight.save(projpath, name, names, values)]
+        root = os.path.join(projpath, 'results', 'imageBased')
+        if names is None:
+            return [hdr.write(os.path.join(root, f'{name}.hdr'), values[0])]
+        return [hdr.write(os.path.join(root, f'{name}_{n}.hdr'), img) for n, img in zip(names, values)]
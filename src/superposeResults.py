@@ -0,0 +1,123 @@
+import sys
+import os
+import pathlib
+from superpose import superpose
+from imgproc import imgproc
+from hdr import hdr
+from sculpt import sculpt
+
+
+"""
+Combine stored daylight and electric lighting results with weights, ie the daylight at 14:00 plus a sculpted scene
+dimmed to 60%, instead of building a combined octree and simulating again. See the superpose class for the results
+that can be combined.
+"""
+
+
+def check_args():
+    if len(sys.argv) <= 1:
+        return False
+    global _name
+    global _matrix
+    global _basis
+    global _pal
+    global _scale
+    global _gif
+    global _illum
+    for i in range(1, len(sys.argv)):
+        if sys.argv[i] == '-r':
+            # result and its weight
+            _results.append(sys.argv[i + 1])
+            _weights.append(float(sys.argv[i + 2]))
+            i += 2
+        if sys.argv[i] == '-n':
+            # name
+            _name = sys.argv[i + 1]
+            i += 1
+        if sys.argv[i] == '-m':
+            # contribution matrix, for the grids of scenes
+            mtx = os.path.splitext(sys.argv[i + 1])[0]
+            mtemp = os.path.join(_projPath, 'scenarios', f"{mtx}.csv")
+            if os.path.exists(mtemp):
+                _matrix = mtemp
+            else:
+                print('m path doesnt exist')
+            i += 1
+        if sys.argv[i] == '-b':
+            # basis name, for the images of scenes
+            _basis = sys.argv[i + 1]
+            i += 1
+        if sys.argv[i] == '-i':
+            _illum = True
+        if sys.argv[i] == '-gif':
+            _gif = True
+        if sys.argv[i] == '-fs':
+            _scale = float(sys.argv[i + 1])
+            i += 1
+        if sys.argv[i] == '-p':
+            # palette
+            valid_palettes = ['def', 'pm3d', 'tbo', 'spec', 'hot', 'eco']
+            pal = sys.argv[i + 1]
+            if pal in valid_palettes:
+                _pal = pal
+            i += 1
+    return len(_results) > 0 and _name != 'unknown'
+
+
+_name = 'unknown'
+_results = []
+_weights = []
+_matrix = None
+_basis = None
+_pal = 'def'
+_scale = 500
+_gif = False
+_illum = False
+_projPath = pathlib.Path(__file__).parent.parent.resolve()
+
+if check_args():
+    results = [superpose.load(_projPath, r, _matrix, _basis) for r in _results]
+    kind, names, values = superpose.combine(results, _weights)
+    paths = superpose.save(_projPath, _name, [kind, names, values])
+    if kind == 'grid':
+        for row, lux in zip(names if names is not None else [_name], values):
+            print(f'{row}: avg {lux.mean():.1f} lux, min {lux.min():.1f} lux, max {lux.max():.1f} lux, '
+                  f'uniformity {lux.min() / max(lux.mean(), 1e-9):.2f}')
+        print(paths[0])
+    else:
+        for hdrpath, img in zip(paths, values):
+            print(hdrpath)
+            if _illum:
+                fcpath = hdrpath.replace('.hdr', '_fc.hdr')
+                if _pal in imgproc.PALETTES:
+                    fc = imgproc.falsecolor(img, _scale, _pal, lw=img.shape[1] * 0.05, lh=img.shape[0] * 0.2)
+                    hdr.write(fcpath, fc)
+                else:
+                    sculpt.to_falsecolor(_projPath, hdrpath, fcpath, _pal, _scale, img.shape[1] * 0.05,
+                                         img.shape[0] * 0.2)
+                hdrpath = fcpath
+            if _gif:
+                imgproc.write_gif(hdrpath.replace('.hdr', '.gif'),
+                                  hdr.read(hdrpath) if _illum else imgproc.tonemap(img))
+else:
+    print('\nThis command will combine stored daylight and electric lighting results with weights, in place of a')
+    print('combined octree and a new simulation. Light is additive, so the result of the sky and of each scene')
+    print('simulated on their own add up to the result of them together, and a weight of 0.6 dims a result to 60%.')
+    print('Results are found by name in results\\gridBased (.res, annual .npy), results\\imageBased (.hdr) and')
+    print('scenarios\\scalars (scenes from optimize.py, with -m for grids or -b for images). Add @row to select one')
+    print('hour or scene of a result, ie NYC@0621_1400. Grids are saved as results\\gridBased\\<name>.res, or as')
+    print('<name>_annual.npy when every hour is combined, and images as results\\imageBased\\<name>.hdr.')
+    print('\n\tExample:')
+    print('\t\tpython superposeResults.py -n noon_300lux -r NYC@0621_1400 1.0 -r Scene_300Lux 0.6 -m ContributionMatrix')
+    print('\t\tpython superposeResults.py -n NYC_300lux -r NYC_annual 1.0 -r Scene_300Lux 0.6 -m ContributionMatrix')
+    print('\t\tpython superposeResults.py -n cam3 -r 0621_1230_cam3 1.0 -r Scene_300Lux 0.6 -b camera03_illum -i -gif')
+    print('\n\tArguments')
+    print('\t===============')
+    print('\n\t-n name\t\tName for the combined results')
+    print('\n\t-r result weight\tResult name (or file path) and its weight. Can be passed multiple times.')
+    print('\n\t-m matrix\tContribution matrix in the scenarios folder, for the grids of scenes [OPTIONAL]')
+    print('\n\t-b basis\tName of a basis rendered by genBasis.py, for the images of scenes [OPTIONAL]')
+    print('\n\t-i\t\tThe images are illuminance, convert them to falsecolor. [OPTIONAL]')
+    print('\n\t-p pal\t\tFalse color palette, default "def". [OPTIONAL]')
+    print('\n\t-fs scale\tMax legend value of the falsecolor image, default 500 [OPTIONAL]')
+    print('\n\t-gif\t\tExport the image(s) as a GIF. [OPTIONAL]')